@@ -35,6 +35,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework.authtoken',
     'core',
@@ -44,6 +45,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.CompressionMiddleware',
+    'core.middleware.ReplicaRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -82,9 +85,99 @@ DATABASES = {
         'NAME': os.environ.get('DB_NAME'),
         'USER': os.environ.get('DB_USER'),
         'PASSWORD': os.environ.get('DB_PASS'),
+        'PORT': os.environ.get('DB_PORT', ''),
+        # Seconds a worker keeps its connection open between requests, 0
+        # to close it after every request.
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+        # Check persistent connections still work before reusing them.
+        'CONN_HEALTH_CHECKS': os.environ.get('DB_CONN_HEALTH_CHECKS') != '0',
+        'OPTIONS': {
+            'connect_timeout': int(os.environ.get('DB_CONNECT_TIMEOUT', 5)),
+        },
     }
 }
 
+# Behind a transaction pooler such as PgBouncer (DB_POOL_MODE=transaction)
+# consecutive queries may run on different server connections, so named
+# cursors can't outlive a query. Exports then page by ID instead, see
+# recipe/exports.py.
+
+DB_POOL_MODE = os.environ.get('DB_POOL_MODE', '')
+if DB_POOL_MODE == 'transaction':
+    DATABASES['default']['DISABLE_SERVER_SIDE_CURSORS'] = True
+
+# Read replicas, see core/routers.py
+# DB_REPLICA_HOSTS lists hosts replicating the default database, added as
+# replica1, replica2 and so on. Reads of safe requests go to one of them,
+# unless the client wrote within DATABASE_REPLICA_PIN_SECONDS. Pins are kept
+# in the DATABASE_REPLICA_PIN_CACHE entry of CACHES, which has to be shared
+# for them to hold across workers. Locally DB_REPLICA_HOSTS=db adds a second
+# alias of the same database.
+
+DATABASE_REPLICAS = []
+for number, host in enumerate(
+        filter(None, os.environ.get('DB_REPLICA_HOSTS', '').split(',')), 1):
+    DATABASES[f'replica{number}'] = dict(
+        DATABASES['default'], HOST=host, TEST={'MIRROR': 'default'}
+    )
+    DATABASE_REPLICAS.append(f'replica{number}')
+
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+DATABASE_REPLICA_PIN_SECONDS = int(
+    os.environ.get('DB_REPLICA_PIN_SECONDS', 5)
+)
+DATABASE_REPLICA_PIN_CACHE = os.environ.get(
+    'DB_REPLICA_PIN_CACHE', 'default'
+)
+
+# Caches
+# https://docs.djangoproject.com/en/4.0/topics/cache/
+# Local memory by default, plus a shared Redis cache when one is configured.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+}
+
+if os.environ.get('SHARED_CACHE_URL'):
+    CACHES['shared'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ.get('SHARED_CACHE_URL'),
+    }
+
+# Tag and ingredient list response cache, see recipe/cache.py
+
+RESPONSE_CACHE_ALIAS = os.environ.get('RESPONSE_CACHE_ALIAS', 'default')
+RESPONSE_CACHE_TIMEOUT = int(os.environ.get('RESPONSE_CACHE_TIMEOUT', 300))
+
+# Token authentication cache, see user/authentication.py
+# TOKEN_AUTH_SHARED_CACHE names an entry in CACHES shared by the workers, which
+# every worker invalidates at once. Without one each process caches tokens on
+# its own, and the others accept a deleted token or deactivated user until
+# their entry expires, so the TTL is kept short. Run several workers with a
+# shared cache.
+
+TOKEN_AUTH_SHARED_CACHE = os.environ.get('TOKEN_AUTH_SHARED_CACHE')
+TOKEN_AUTH_CACHE_SIZE = int(os.environ.get('TOKEN_AUTH_CACHE_SIZE', 10000))
+TOKEN_AUTH_CACHE_TTL = int(os.environ.get(
+    'TOKEN_AUTH_CACHE_TTL', 60 if TOKEN_AUTH_SHARED_CACHE else 5
+))
+
+# JSON is encoded and decoded with orjson when installed, see core/renderers.py
+
+REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': [
+        'core.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'core.parsers.JSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/4.0/ref/settings/#auth-password-validators
 
@@ -123,6 +216,64 @@ MEDIA_URL = 'media/'
 STATIC_ROOT = '/vol/web/static/'
 MEDIA_ROOT = '/vol/web/media/'
 
+# Serving media, see core/views.py
+# 'django' streams files from the worker, using sendfile() where the server
+# supports it, 'x-accel-redirect' (nginx) and 'x-sendfile' (Apache,
+# lighttpd) hand downloads over to the web server and '' leaves MEDIA_URL
+# to the web server altogether.
+
+MEDIA_SERVER = os.environ.get('MEDIA_SERVER', 'django')
+MEDIA_ACCEL_REDIRECT_PREFIX = os.environ.get(
+    'MEDIA_ACCEL_REDIRECT_PREFIX', '/protected-media/'
+)
+MEDIA_CACHE_MAX_AGE = int(os.environ.get('MEDIA_CACHE_MAX_AGE', 3600))
+
+# Recipe image derivatives, see recipe/images.py
+# With IMAGE_WORKERS = 0 they are generated inline after the upload commits.
+
+IMAGE_DERIVATIVE_WIDTHS = (160, 480, 1024)
+IMAGE_WORKERS = int(os.environ.get('IMAGE_WORKERS', 2))
+
+# Recipe image uploads, see recipe/uploads.py
+
+IMAGE_UPLOAD_MAX_BYTES = int(
+    os.environ.get('IMAGE_UPLOAD_MAX_BYTES', 20 * 2 ** 20)
+)
+IMAGE_UPLOAD_MAX_PIXELS = int(
+    os.environ.get('IMAGE_UPLOAD_MAX_PIXELS', 40_000_000)
+)
+IMAGE_UPLOAD_MAX_DIMENSION = int(
+    os.environ.get('IMAGE_UPLOAD_MAX_DIMENSION', 12000)
+)
+IMAGE_UPLOAD_HEADER_BYTES = 256 * 2 ** 10
+
+# Recipe imports, see recipe/imports.py
+# The API imports within the request, which the server times out, so
+# larger bodies are refused with 413. The import_recipes management
+# command imports files of any size.
+
+RECIPE_IMPORT_MAX_BYTES = int(
+    os.environ.get('RECIPE_IMPORT_MAX_BYTES', 5 * 2 ** 20)
+)
+
+# Recipe search, see recipe/search.py
+
+RECIPE_SEARCH_CONFIG = os.environ.get('RECIPE_SEARCH_CONFIG', 'english')
+
+# Response compression, see core/middleware.py
+# Encodings in order of preference, br and zstd need the brotli and
+# zstandard packages.
+
+COMPRESSION_ENCODINGS = os.environ.get(
+    'COMPRESSION_ENCODINGS', 'zstd,br,gzip'
+).split(',')
+COMPRESSION_LEVELS = {
+    'gzip': int(os.environ.get('COMPRESSION_GZIP_LEVEL', 6)),
+    'br': int(os.environ.get('COMPRESSION_BROTLI_LEVEL', 4)),
+    'zstd': int(os.environ.get('COMPRESSION_ZSTD_LEVEL', 3)),
+}
+COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', 1024))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.0/ref/settings/#default-auto-field
 
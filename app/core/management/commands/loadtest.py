@@ -0,0 +1,207 @@
+import http.client
+import itertools
+import random
+import statistics
+import threading
+import time
+from urllib.parse import urlsplit
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+from rest_framework.authtoken.models import Token
+
+from core.models import Recipe
+from recipe.imports import import_recipes
+
+EMAIL = 'loadtest@example.com'
+# Paths requested of each endpoint, given the IDs of the recipes.
+ENDPOINTS = {
+    'tags': lambda ids: [reverse('recipe:tag-list')],
+    'ingredients': lambda ids: [reverse('recipe:ingredient-list')],
+    'recipes': lambda ids: [reverse('recipe:recipe-list')],
+    'recipe': lambda ids: [reverse('recipe:recipe-detail', args=[pk])
+                           for pk in ids],
+    'me': lambda ids: [reverse('user:me')],
+}
+
+
+def recipe_records(start, stop):
+    """Yield the import records of load test recipes start to stop."""
+    for i in range(start, stop):
+        yield i + 1, {
+            'title': f'Load test recipe {i}',
+            'time_minutes': 5 + i % 60,
+            'price': f'{i % 50}.50',
+            'tag_names': [f'Tag {i % 10}', f'Tag {i * 3 % 7}'],
+            'ingredient_names': [f'Ingredient {i * k % 40}'
+                                 for k in (1, 3, 7)],
+        }, None
+
+
+class Command(BaseCommand):
+    """Django command to load test the main endpoints of a running server.
+
+    A load test user with a fixed recipe book is created on the first run,
+    so runs against the same database are comparable. Each endpoint is
+    requested by concurrent clients over keep-alive connections, first
+    unmeasured to warm up and then for a fixed time. Clients visit recipe
+    details in a seeded random order.
+    """
+    help = 'Report requests per second and latency percentiles of the API.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--url', default='http://localhost:8000',
+            help='Base URL of the server to load.',
+        )
+        parser.add_argument(
+            '--endpoint', action='append', dest='endpoints',
+            choices=ENDPOINTS, help='Endpoint to load, may be repeated. '
+                                    'Defaults to all of them.',
+        )
+        parser.add_argument(
+            '--concurrency', type=int, default=8,
+            help='Number of concurrent clients.',
+        )
+        parser.add_argument(
+            '--duration', type=float, default=10,
+            help='Seconds to load each endpoint for.',
+        )
+        parser.add_argument(
+            '--warmup', type=float, default=2,
+            help='Seconds to load each endpoint for before measuring.',
+        )
+        parser.add_argument(
+            '--recipes', type=int, default=200,
+            help='Number of recipes of the load test user.',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        url = urlsplit(options['url'])
+        self.connection_class = (http.client.HTTPSConnection
+                                 if url.scheme == 'https'
+                                 else http.client.HTTPConnection)
+        self.netloc = url.netloc
+        self.prefix = url.path.rstrip('/')
+        self.headers = {
+            'Authorization': f'Token {self.setup_user(options["recipes"])}',
+        }
+        self.ids = list(Recipe.objects.filter(
+            user__email=EMAIL
+        ).order_by('id').values_list('id', flat=True))
+        self.check_server()
+
+        self.stdout.write(
+            f'{"endpoint":<12} {"requests":>8} {"errors":>6} {"req/s":>9} '
+            f'{"p50 ms":>8} {"p90 ms":>8} {"p99 ms":>8} {"max ms":>8}'
+        )
+        for name in options['endpoints'] or ENDPOINTS:
+            paths = ENDPOINTS[name](self.ids)
+            if options['warmup'] > 0:
+                self.load(paths, options, options['warmup'])
+            latencies, errors, elapsed = self.load(
+                paths, options, options['duration']
+            )
+            self.report(name, latencies, errors, elapsed)
+
+    def setup_user(self, count):
+        """Create the load test user and its recipes, returning its token."""
+        user = get_user_model().objects.filter(email=EMAIL).first() or \
+            get_user_model().objects.create_user(EMAIL)
+        existing = Recipe.objects.filter(user=user).count()
+        if existing < count:
+            self.stdout.write(f'Creating {count - existing} recipes...')
+            import_recipes(user, recipe_records(existing, count))
+
+        token, _created = Token.objects.get_or_create(user=user)
+        return token.key
+
+    def check_server(self):
+        """Raise CommandError unless the server answers requests."""
+        connection = self.connection_class(self.netloc, timeout=10)
+        try:
+            connection.request('GET', self.prefix + reverse('user:me'),
+                               headers=self.headers)
+            response = connection.getresponse()
+            response.read()
+        except (OSError, http.client.HTTPException) as exc:
+            raise CommandError(f'Server at {self.netloc} unavailable: {exc}')
+        finally:
+            connection.close()
+        if response.status != 200:
+            raise CommandError(
+                f'Server at {self.netloc} answered {response.status}.'
+            )
+
+    def load(self, paths, options, duration):
+        """Request paths from concurrent clients for duration seconds.
+
+        Returns the latencies of successful requests, the number of failed
+        ones and the time taken.
+        """
+        results = []
+        start = time.perf_counter()
+        deadline = start + duration
+        clients = [
+            threading.Thread(target=self.client, args=(
+                paths, random.Random(options['seed'] + number), deadline,
+                results,
+            ))
+            for number in range(options['concurrency'])
+        ]
+        for client in clients:
+            client.start()
+        for client in clients:
+            client.join()
+        elapsed = time.perf_counter() - start
+
+        latencies = [latency for client_latencies, _errors in results
+                     for latency in client_latencies]
+        return latencies, sum(errors for _latencies, errors in results), \
+            elapsed
+
+    def client(self, paths, rng, deadline, results):
+        """Request paths in random order over a connection until deadline."""
+        paths = list(paths)
+        rng.shuffle(paths)
+        connection = self.connection_class(self.netloc, timeout=30)
+        latencies, errors = [], 0
+        try:
+            for path in itertools.cycle(paths):
+                start = time.perf_counter()
+                if start >= deadline:
+                    break
+                try:
+                    connection.request('GET', self.prefix + path,
+                                       headers=self.headers)
+                    response = connection.getresponse()
+                    response.read()
+                    ok = response.status == 200
+                except (OSError, http.client.HTTPException):
+                    # Reconnects on the next request.
+                    connection.close()
+                    ok = False
+                if ok:
+                    latencies.append(time.perf_counter() - start)
+                else:
+                    errors += 1
+        finally:
+            connection.close()
+            results.append((latencies, errors))
+
+    def report(self, name, latencies, errors, elapsed):
+        """Write the throughput and latency percentiles of an endpoint."""
+        if len(latencies) > 1:
+            percentiles = statistics.quantiles(latencies, n=100)
+            p50, p90, p99 = percentiles[49], percentiles[89], percentiles[98]
+        else:
+            p50 = p90 = p99 = latencies[0] if latencies else 0
+        self.stdout.write(
+            f'{name:<12} {len(latencies):>8} {errors:>6} '
+            f'{len(latencies) / elapsed:>9.1f} {p50 * 1000:>8.2f} '
+            f'{p90 * 1000:>8.2f} {p99 * 1000:>8.2f} '
+            f'{max(latencies, default=0) * 1000:>8.2f}'
+        )
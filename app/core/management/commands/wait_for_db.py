@@ -1,21 +1,93 @@
+import random
 import time
 
 from django.db import connections
 from django.db.utils import OperationalError
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 
 
 class Command(BaseCommand):
-    """Django command to pause execution until database is available"""
+    """Django command to pause execution until databases are available.
+
+    A database is available once a connection to it is opened and runs a
+    query. Failed attempts are retried after exponentially growing delays
+    with full jitter, so startup waits as little as the database allows
+    without hammering it, until the overall timeout runs out.
+    """
+    help = 'Wait until the databases accept connections and queries.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database', action='append', dest='databases',
+            help='Database alias to wait for, may be repeated. Defaults to '
+                 'every configured database.',
+        )
+        parser.add_argument(
+            '--timeout', type=float, default=60,
+            help='Give up after this many seconds in total.',
+        )
+        parser.add_argument(
+            '--initial-delay', type=float, default=0.1,
+            help='Longest delay in seconds before the first retry.',
+        )
+        parser.add_argument(
+            '--max-delay', type=float, default=5,
+            help='Longest delay in seconds between retries.',
+        )
 
     def handle(self, *args, **options):
-        self.stdout.write('Waiting for database...')
-        db_conn = None
-        while not db_conn:
+        self.start = time.monotonic()
+        self.deadline = self.start + options['timeout']
+        self.initial_delay = options['initial_delay']
+        self.max_delay = options['max_delay']
+
+        for alias in options['databases'] or list(connections):
+            self.wait_for(alias)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Databases available after '
+            f'{time.monotonic() - self.start:.2f} s.'
+        ))
+
+    def check(self, alias):
+        """Open a connection to the database and run a trivial query."""
+        connection = connections[alias]
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+        except OperationalError:
+            # Don't reuse a connection that may be half open.
+            connection.close()
+            raise
+
+    def wait_for(self, alias):
+        """Retry checking a database until it is available or time is up."""
+        self.stdout.write(f'Waiting for database {alias!r}...')
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            attempt += 1
             try:
-                db_conn = connections['default']
-            except OperationalError:
-                self.stdout.write('Database unavailable, waiting 1 second...')
-                time.sleep(1)
+                self.check(alias)
+                break
+            except OperationalError as exc:
+                remaining = self.deadline - time.monotonic()
+                if remaining <= 0:
+                    raise CommandError(
+                        f'Database {alias!r} unavailable after {attempt} '
+                        f'attempts: {exc}'
+                    )
+                backoff = self.initial_delay * 2 ** min(attempt - 1, 32)
+                delay = min(
+                    random.uniform(0, min(self.max_delay, backoff)), remaining
+                )
+                self.stdout.write(
+                    f'Database {alias!r} unavailable, retrying in '
+                    f'{delay:.2f} s...'
+                )
+                time.sleep(delay)
 
-        self.stdout.write(self.style.SUCCESS('Database available!'))
+        self.stdout.write(
+            f'Database {alias!r} available after '
+            f'{time.monotonic() - started:.2f} s ({attempt} attempts).'
+        )
@@ -0,0 +1,218 @@
+import re
+import zlib
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+
+from core.routers import SAFE_METHODS, choose_read_alias, pin_to_primary, \
+    reads_from, routing_stats
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Content that is compressed already, so not worth compressing again.
+COMPRESSED_TYPE_RE = re.compile(
+    r'^(image/(?!svg)|video/|audio/|font/woff|'
+    r'application/(zip|gzip|x-gzip|zstd|x-brotli|pdf)\b)'
+)
+
+
+class GzipStream:
+    """gzip compressor."""
+
+    def __init__(self, level):
+        self.compressor = zlib.compressobj(
+            level, zlib.DEFLATED, 16 + zlib.MAX_WBITS
+        )
+
+    def compress(self, data):
+        return self.compressor.compress(data)
+
+    def flush(self):
+        return self.compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self.compressor.flush()
+
+
+class BrotliStream:
+    """Brotli compressor, level being the quality from 0 to 11."""
+
+    def __init__(self, level):
+        self.compressor = brotli.Compressor(quality=level)
+
+    def compress(self, data):
+        return self.compressor.process(data)
+
+    def flush(self):
+        return self.compressor.flush()
+
+    def finish(self):
+        return self.compressor.finish()
+
+
+class ZstdStream:
+    """Zstandard compressor."""
+
+    def __init__(self, level):
+        self.compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data):
+        return self.compressor.compress(data)
+
+    def flush(self):
+        return self.compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self):
+        return self.compressor.flush(zstandard.COMPRESSOBJ_FLUSH_FINISH)
+
+
+# Encodings by their Accept-Encoding name, if their module is installed.
+STREAMS = {
+    'gzip': GzipStream,
+    'br': BrotliStream if brotli is not None else None,
+    'zstd': ZstdStream if zstandard is not None else None,
+}
+
+
+def parse_accept_encoding(header):
+    """Return the quality of each encoding in an Accept-Encoding header."""
+    qualities = {}
+    for item in header.split(','):
+        name, *params = item.split(';')
+        name = name.strip().lower()
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition('=')
+            if key.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if name:
+            qualities[name] = quality
+
+    return qualities
+
+
+def negotiate_encoding(header, encodings):
+    """Return the one of encodings the client accepts most, or None.
+
+    Ties go to the earliest of encodings.
+    """
+    qualities = parse_accept_encoding(header)
+    chosen, best = None, 0.0
+    for encoding in encodings:
+        quality = qualities.get(encoding, qualities.get('*', 0.0))
+        if quality > best:
+            chosen, best = encoding, quality
+
+    return chosen
+
+
+class CompressionMiddleware:
+    """Compress responses with gzip, Brotli or Zstandard.
+
+    The encoding is negotiated from Accept-Encoding, preferring the
+    earliest installed one of COMPRESSION_ENCODINGS, at the level set by
+    COMPRESSION_LEVELS. Responses smaller than COMPRESSION_MIN_SIZE,
+    partial or already encoded responses and compressed content such as
+    images are sent as they are. Streaming responses are compressed a
+    chunk at a time, flushing after each one, so they are never held in
+    memory whole and clients get every chunk as soon as it's produced.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.encodings = [
+            encoding for encoding in settings.COMPRESSION_ENCODINGS
+            if STREAMS.get(encoding) is not None
+        ]
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if not self.encodings:
+            return response
+
+        if response.status_code != 200 or response.has_header(
+                'Content-Encoding'):
+            return response
+        if COMPRESSED_TYPE_RE.match(response.get('Content-Type', '')):
+            return response
+        if 'no-transform' in response.get('Cache-Control', ''):
+            return response
+        if response.streaming:
+            length = response.get('Content-Length')
+            if length is not None and \
+                    int(length) < settings.COMPRESSION_MIN_SIZE:
+                return response
+        elif len(response.content) < settings.COMPRESSION_MIN_SIZE:
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = negotiate_encoding(
+            request.META.get('HTTP_ACCEPT_ENCODING', ''), self.encodings
+        )
+        if encoding is None:
+            return response
+        stream = STREAMS[encoding](settings.COMPRESSION_LEVELS[encoding])
+
+        if response.streaming:
+            response.streaming_content = self.compress_sequence(
+                stream, response.streaming_content
+            )
+            del response['Content-Length']
+        else:
+            compressed = stream.compress(response.content) + stream.finish()
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response['Content-Length'] = str(len(compressed))
+
+        # The encoded body isn't byte for byte the one the ETag was for.
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = encoding
+
+        return response
+
+    @staticmethod
+    def compress_sequence(stream, chunks):
+        """Yield the compressed chunks, flushed one by one."""
+        for chunk in chunks:
+            data = stream.compress(chunk)
+            # Empty chunks would otherwise flush an empty block.
+            if chunk:
+                data += stream.flush()
+            if data:
+                yield data
+        yield stream.finish()
+
+
+class ReplicaRoutingMiddleware:
+    """Route the reads of each request, see core/routers.py.
+
+    One database is chosen per request, so its reads see a consistent
+    state. Successful unsafe requests pin their client to the primary.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        alias, reason = choose_read_alias(request)
+        routing_stats.count('requests', reason)
+        with reads_from(alias):
+            response = self.get_response(request)
+
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            pin_to_primary(request)
+        return response
@@ -0,0 +1,28 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """Index the M2M tables from the tag/ingredient side.
+
+    The auto-created through tables only carry a unique (recipe, target)
+    index, which serves EXISTS lookups from a recipe. Matching all of a
+    set of tags or ingredients groups the rows by recipe from the target
+    side, so it needs (target, recipe) to stay an index-only scan.
+    """
+
+    dependencies = [
+        ('core', '0006_recipe_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            'CREATE INDEX core_recipe_tags_tag_recipe_idx '
+            'ON core_recipe_tags (tag_id, recipe_id);',
+            'DROP INDEX core_recipe_tags_tag_recipe_idx;',
+        ),
+        migrations.RunSQL(
+            'CREATE INDEX core_recipe_ingr_ingr_recipe_idx '
+            'ON core_recipe_ingredients (ingredient_id, recipe_id);',
+            'DROP INDEX core_recipe_ingr_ingr_recipe_idx;',
+        ),
+    ]
@@ -0,0 +1,41 @@
+from django.db import migrations
+from django.db.models import Count, Min
+
+
+def merge_duplicate_names(apps, schema_editor):
+    """Merge tags and ingredients sharing a user and name into one."""
+    Recipe = apps.get_model('core', 'Recipe')
+    for field, model_name in (('tags', 'Tag'), ('ingredients', 'Ingredient')):
+        model = apps.get_model('core', model_name)
+        through = getattr(Recipe, field).through
+        target = f'{model_name.lower()}_id'
+        duplicates = model.objects.values('user', 'name').annotate(
+            count=Count('id'), keep=Min('id')
+        ).filter(count__gt=1)
+        for duplicate in duplicates:
+            others = model.objects.filter(
+                user=duplicate['user'], name=duplicate['name']
+            ).exclude(id=duplicate['keep'])
+            linked = set(through.objects.filter(
+                **{target: duplicate['keep']}
+            ).values_list('recipe_id', flat=True))
+            for link in through.objects.filter(**{f'{target}__in': others.values('id')}):
+                if link.recipe_id in linked:
+                    link.delete()
+                else:
+                    setattr(link, target, duplicate['keep'])
+                    link.save()
+                    linked.add(link.recipe_id)
+            others.delete()
+
+
+class Migration(migrations.Migration):
+    """Merge duplicates ahead of the unique (user, name) constraints."""
+
+    dependencies = [
+        ('core', '0007_recipe_m2m_reverse_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_names, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 4.1 on 2026-10-17 07:21
+
+import core.models
+import core.storage
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def count_image_references(apps, schema_editor):
+    """Create reference counts for the images recipes already have."""
+    Recipe = apps.get_model('core', 'Recipe')
+    ImageBlob = apps.get_model('core', 'ImageBlob')
+    references = Recipe.objects.exclude(image__isnull=True).exclude(
+        image=''
+    ).values('image').annotate(count=Count('id')).order_by()
+    blobs = []
+    for ref in references.iterator():
+        blobs.append(ImageBlob(name=ref['image'], ref_count=ref['count']))
+        if len(blobs) == 1000:
+            ImageBlob.objects.bulk_create(blobs)
+            blobs = []
+    ImageBlob.objects.bulk_create(blobs)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_recipe_image_derivatives'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('ref_count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='recipe',
+            name='image',
+            field=models.ImageField(null=True, storage=core.storage.ContentAddressedStorage(), upload_to=core.models.recipe_image_file_path),
+        ),
+        migrations.AddIndex(
+            model_name='imageblob',
+            index=models.Index(fields=['ref_count', 'updated_at'], name='core_imageblob_unused_idx'),
+        ),
+        migrations.RunPython(count_image_references, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 4.1 on 2026-10-17 07:33
+
+import django.contrib.postgres.search
+from django.conf import settings
+from django.db import migrations
+
+NAMES = ('coalesce((SELECT string_agg(a.name, \' \') FROM core_{model} a '
+         'JOIN core_recipe_{table} ra ON ra.{model}_id = a.id '
+         'WHERE ra.recipe_id = r.id), \'\')')
+
+
+def create_search_indexes(apps, schema_editor):
+    """Index and fill in search vectors, which only PostgreSQL supports."""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    config = settings.RECIPE_SEARCH_CONFIG
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm;')
+    schema_editor.execute(
+        'CREATE INDEX core_recipe_search_idx '
+        'ON core_recipe USING gin (search_vector);'
+    )
+    schema_editor.execute(
+        'CREATE INDEX core_recipe_title_trgm_idx '
+        'ON core_recipe USING gin (title gin_trgm_ops);'
+    )
+    schema_editor.execute(
+        'UPDATE core_recipe r SET search_vector = '
+        'setweight(to_tsvector(%s::regconfig, r.title), \'A\') || '
+        f'setweight(to_tsvector(%s::regconfig, '
+        f'{NAMES.format(model="tag", table="tags")}), \'B\') || '
+        f'setweight(to_tsvector(%s::regconfig, '
+        f'{NAMES.format(model="ingredient", table="ingredients")}), \'B\');',
+        (config, config, config),
+    )
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX core_recipe_title_trgm_idx;')
+    schema_editor.execute('DROP INDEX core_recipe_search_idx;')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_recipe_image_blobs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
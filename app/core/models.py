@@ -2,9 +2,20 @@ import uuid
 import os
 
 from django.db import models
+from django.db.models import F
+from django.db.models.functions import Now
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, \
     PermissionsMixin
 from django.conf import settings
+from django.contrib.postgres.search import SearchVectorField
+
+from core.storage import recipe_image_storage
+
+RECIPE_IMAGE_DIR = 'uploads/recipe/'
+# Names of the collections versioned by CollectionVersion.
+RECIPES = 'recipes'
+TAGS = 'tags'
+INGREDIENTS = 'ingredients'
 
 
 def recipe_image_file_path(instance, filename):
@@ -12,7 +23,7 @@ def recipe_image_file_path(instance, filename):
     ext = filename.split('.')[-1]
     filename = f'{uuid.uuid4()}.{ext}'
 
-    return os.path.join('uploads/recipe/', filename)
+    return os.path.join(RECIPE_IMAGE_DIR, filename)
 
 
 class UserManager(BaseUserManager):
@@ -49,6 +60,28 @@ class User(AbstractBaseUser, PermissionsMixin):
     USERNAME_FIELD = 'email'
 
 
+class RecipeAttrManager(models.Manager):
+
+    def get_or_create_by_names(self, user, names):
+        """Return the user's objects named names, creating missing ones.
+
+        Concurrent requests creating the same name are safe thanks to the
+        unique (user, name) constraint.
+        """
+        names = set(names)
+        objects = list(self.filter(user=user, name__in=names))
+        missing = names - {obj.name for obj in objects}
+        if missing:
+            self.bulk_create(
+                [self.model(user=user, name=name) for name in missing],
+                ignore_conflicts=True,
+            )
+            objects += self.filter(user=user, name__in=missing)
+            CollectionVersion.objects.bump(user.pk, self.model.collection)
+
+        return objects
+
+
 class Tag(models.Model):
     """Tag to be used for a recipe."""
     name = models.CharField(max_length=255)
@@ -57,6 +90,24 @@ class Tag(models.Model):
         on_delete=models.CASCADE,
     )
 
+    objects = RecipeAttrManager()
+    # Collection bumped when the user's tags change.
+    collection = TAGS
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['user', '-name', '-id'],
+                name='core_tag_user_name_id_idx',
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'name'],
+                name='core_tag_unique_user_name',
+            ),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -69,6 +120,24 @@ class Ingredient(models.Model):
         on_delete=models.CASCADE,
     )
 
+    objects = RecipeAttrManager()
+    # Collection bumped when the user's ingredients change.
+    collection = INGREDIENTS
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['user', '-name', '-id'],
+                name='core_ingr_user_name_id_idx',
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'name'],
+                name='core_ingr_unique_user_name',
+            ),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -85,7 +154,136 @@ class Recipe(models.Model):
     link = models.CharField(max_length=255, blank=True)
     ingredients = models.ManyToManyField('Ingredient')
     tags = models.ManyToManyField('Tag')
-    image = models.ImageField(null=True, upload_to=recipe_image_file_path)
+    image = models.ImageField(
+        null=True,
+        upload_to=recipe_image_file_path,
+        storage=recipe_image_storage,
+    )
+    image_derivatives = models.JSONField(default=dict, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    # Kept up to date by recipe.search, GIN indexed on PostgreSQL only.
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    # Name of the image as stored, None if it wasn't loaded.
+    _loaded_image = ''
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['user', '-id'],
+                name='core_recipe_user_id_idx',
+            ),
+            models.Index(
+                fields=['user', 'time_minutes', 'id'],
+                name='core_recipe_user_time_idx',
+            ),
+            models.Index(
+                fields=['user', 'price', 'id'],
+                name='core_recipe_user_price_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.title
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        image = instance.__dict__.get('image')
+        instance._loaded_image = getattr(image, 'name', image)
+
+        return instance
+
+
+class CollectionVersionManager(models.Manager):
+
+    def bump(self, user_id, collection):
+        """Increment the version of one of a user's collections."""
+        versions = self.filter(user_id=user_id, collection=collection)
+        if not versions.update(version=F('version') + 1, updated_at=Now()):
+            self.bulk_create(
+                [self.model(user_id=user_id, collection=collection)],
+                ignore_conflicts=True,
+            )
+            versions.update(version=F('version') + 1, updated_at=Now())
+
+    def get_version(self, user_id, collection):
+        """Return the version of a user's collection.
+
+        Collections never bumped have no row, only bump creates them, so
+        reading doesn't write. They get an unsaved version 0 with no
+        updated_at.
+        """
+        version = self.filter(user_id=user_id, collection=collection).first()
+        if version is None:
+            version = self.model(user_id=user_id, collection=collection,
+                                 version=0)
+
+        return version
+
+
+class CollectionVersion(models.Model):
+    """Counter bumped whenever one of a user's collections changes.
+
+    Collections are named by RECIPES, TAGS and INGREDIENTS.
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+    )
+    collection = models.CharField(max_length=50)
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = CollectionVersionManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'collection'],
+                name='core_collection_version_unique',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.collection} v{self.version}'
+
+
+class ImageBlobManager(models.Manager):
+
+    def acquire(self, name):
+        """Count a new reference to a stored image."""
+        blobs = self.filter(name=name)
+        if not blobs.update(ref_count=F('ref_count') + 1, updated_at=Now()):
+            self.bulk_create([self.model(name=name)], ignore_conflicts=True)
+            blobs.update(ref_count=F('ref_count') + 1, updated_at=Now())
+
+    def release(self, name):
+        """Drop a reference to a stored image."""
+        self.filter(name=name, ref_count__gt=0).update(
+            ref_count=F('ref_count') - 1, updated_at=Now()
+        )
+
+
+class ImageBlob(models.Model):
+    """Reference count of an image file shared between recipes.
+
+    Files nothing refers to are deleted by the gc_recipe_images command
+    once they have been unreferenced for a while.
+    """
+    name = models.CharField(max_length=255, unique=True)
+    ref_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = ImageBlobManager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['ref_count', 'updated_at'],
+                name='core_imageblob_unused_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.name} ({self.ref_count})'
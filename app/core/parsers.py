@@ -0,0 +1,54 @@
+from django.conf import settings
+from rest_framework import parsers
+from rest_framework.exceptions import ParseError
+from rest_framework.utils import json
+
+from core.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# orjson reads integers over 64 bits as floats, json as integers. Bodies
+# are checked for runs of 19 digits by mapping every digit to 0, which is
+# much faster than a regular expression.
+DIGITS = bytes.maketrans(b'123456789', b'000000000')
+LONG_NUMBER = b'0' * 19
+
+
+def loads(data):
+    """Return the JSON document in the bytes data, as json decodes it.
+
+    orjson is used when installed, unless data may hold integers over 64
+    bits or orjson rejects it. Raises ValueError for invalid JSON,
+    including out of range floats.
+    """
+    if orjson is not None and LONG_NUMBER not in data.translate(DIGITS):
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            pass
+
+    return json.loads(data)
+
+
+class JSONParser(parsers.JSONParser):
+    """JSON parser decoding with orjson when it is installed.
+
+    Bodies that aren't UTF-8 are parsed by DRF's parser.
+    """
+    renderer_class = JSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        """Parse the incoming bytestream as JSON and return the data."""
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        if orjson is None or not self.strict or \
+                encoding.lower().replace('_', '-') not in ('utf-8', 'utf8'):
+            return super().parse(stream, media_type, parser_context)
+
+        try:
+            return loads(stream.read())
+        except ValueError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
@@ -0,0 +1,87 @@
+import math
+
+from rest_framework import renderers
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if orjson is not None:
+    # Dates and dataclasses go through the encoder below, as with json.
+    OPTIONS = (orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+               | orjson.OPT_PASSTHROUGH_DATACLASS)
+
+# Values that hold no floats, skipped without a call when looking for them.
+SCALAR_TYPES = frozenset((str, int, bool, type(None)))
+
+
+def has_non_finite(value):
+    """Return whether value is or holds a NaN or infinite float."""
+    if isinstance(value, dict):
+        items = value.values()
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        items = value
+    elif isinstance(value, float):
+        return not math.isfinite(value)
+    else:
+        return False
+
+    for item in items:
+        if type(item) not in SCALAR_TYPES and has_non_finite(item):
+            return True
+    return False
+
+
+class JSONRenderer(renderers.JSONRenderer):
+    """JSON renderer encoding with orjson when it is installed.
+
+    Anything orjson doesn't encode itself, such as Decimal, dates and lazy
+    strings, is converted by DRF's JSONEncoder, so the output is the same
+    as DRF's renderer. Only floats differ, in spelling exponents ('1e16'
+    rather than '1e+16'). orjson renders NaN and infinity as null, so data
+    holding them, only looked for when the output has a null, is rendered
+    by DRF's renderer, which rejects it with ValueError. Pretty
+    printing other than indent=2, non-default UNICODE_JSON or COMPACT_JSON
+    settings and data orjson rejects, such as integers over 64 bits, are
+    rendered by DRF's renderer.
+    """
+    encoder_default = JSONEncoder().default
+
+    def default(self, obj):
+        """Convert obj as DRF's JSONEncoder does, rejecting NaN and infinity.
+
+        Decimals are converted to floats, which orjson would render as null.
+        """
+        value = self.encoder_default(obj)
+        if isinstance(value, float) and not math.isfinite(value):
+            raise ValueError('Out of range float values are not JSON '
+                             'compliant')
+        return value
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        """Render data into JSON, returning a bytestring."""
+        if orjson is None or self.ensure_ascii or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b''
+
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if indent not in (None, 2):
+            return super().render(data, accepted_media_type, renderer_context)
+        options = OPTIONS if indent is None else OPTIONS | orjson.OPT_INDENT_2
+
+        try:
+            ret = orjson.dumps(data, default=self.default, option=options)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        if b'null' in ret and has_non_finite(data):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Keep the output a JavaScript subset, as DRF's renderer does.
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(
+                b'\xe2\x80\xa9', b'\\u2029'
+            )
+        return ret
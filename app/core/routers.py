@@ -0,0 +1,139 @@
+import hashlib
+import random
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+# Database the reads of the current request go to, None outside requests.
+_read_alias = ContextVar('read_alias', default=None)
+
+
+class RoutingStats:
+    """Per-process counts of database routing decisions.
+
+    Requests are counted by why their reads went where they did, reads
+    and writes by database alias.
+    """
+
+    def __init__(self):
+        self._counts = Counter()
+        self._lock = threading.Lock()
+
+    def count(self, kind, name):
+        """Count a decision of kind requests, reads, writes or pins."""
+        with self._lock:
+            self._counts[kind, name] += 1
+
+    def stats(self):
+        """Return the counts of this process by kind."""
+        with self._lock:
+            counts = dict(self._counts)
+        stats = {'requests': {}, 'reads': {}, 'writes': {}, 'pins': 0}
+        for (kind, name), count in counts.items():
+            if kind == 'pins':
+                stats['pins'] += count
+            else:
+                stats[kind][name] = count
+
+        return stats
+
+    def reset_stats(self):
+        """Zero the counts."""
+        with self._lock:
+            self._counts.clear()
+
+
+routing_stats = RoutingStats()
+
+
+def _pin_key(request):
+    """Return the cache key pinning the client of request to the primary.
+
+    Users are only authenticated in the views, after the database of the
+    request is chosen, so clients are told apart by their credentials,
+    the Authorization header or session cookie. Returns None for
+    anonymous clients.
+    """
+    credentials = request.META.get('HTTP_AUTHORIZATION') or \
+        request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    if not credentials:
+        return None
+
+    return 'replica-pin:' + hashlib.md5(credentials.encode()).hexdigest()
+
+
+def choose_read_alias(request):
+    """Return the database alias reads of request go to, and why.
+
+    Reads of safe requests go to a random one of DATABASE_REPLICAS,
+    unless the client wrote within DATABASE_REPLICA_PIN_SECONDS, so that
+    it reads its own writes. Requests that write read from the primary
+    too, which their writes go to.
+    """
+    if not settings.DATABASE_REPLICAS:
+        return DEFAULT_DB_ALIAS, 'no replicas'
+    if request.method not in SAFE_METHODS:
+        return DEFAULT_DB_ALIAS, 'write'
+    key = _pin_key(request)
+    if key and caches[settings.DATABASE_REPLICA_PIN_CACHE].get(key):
+        return DEFAULT_DB_ALIAS, 'pinned'
+
+    return random.choice(settings.DATABASE_REPLICAS), 'replica'
+
+
+def pin_to_primary(request):
+    """Send the reads of the client of request to the primary for a while."""
+    key = _pin_key(request)
+    if key and settings.DATABASE_REPLICAS:
+        caches[settings.DATABASE_REPLICA_PIN_CACHE].set(
+            key, True, settings.DATABASE_REPLICA_PIN_SECONDS
+        )
+        routing_stats.count('pins', 'set')
+
+
+def read_alias():
+    """Return the database alias reads currently go to."""
+    return _read_alias.get() or DEFAULT_DB_ALIAS
+
+
+@contextmanager
+def reads_from(alias):
+    """Send reads within the block to the database alias."""
+    token = _read_alias.set(alias)
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
+
+
+class ReplicaRouter:
+    """Route reads to the database of the request, writes to the primary.
+
+    Reads outside requests, such as in management commands, background
+    workers and streamed responses, go to the primary. Replicas hold a
+    copy of the primary, so relations are allowed across them and they
+    are never migrated.
+    """
+
+    def db_for_read(self, model, **hints):
+        alias = read_alias()
+        routing_stats.count('reads', alias)
+        return alias
+
+    def db_for_write(self, model, **hints):
+        routing_stats.count('writes', DEFAULT_DB_ALIAS)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
@@ -0,0 +1,47 @@
+import hashlib
+import os
+
+from django.core.files.storage import FileSystemStorage
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """File system storage naming files after a hash of their content.
+
+    Files are stored as <directory>/<ab>/<sha256><ext>, keeping only the
+    directory and extension of the requested name. Saving content that is
+    already stored returns the existing name without writing it again, so
+    identical uploads share one file. Shared files mustn't be deleted when
+    one user lets go of them; references are counted by ImageBlob rows and
+    unreferenced files removed by the gc_recipe_images command.
+    """
+
+    def content_name(self, name, content):
+        """Return the name content is stored under."""
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        hexdigest = digest.hexdigest()
+        directory = os.path.dirname(name)
+        ext = os.path.splitext(name)[1].lower()
+
+        return os.path.join(directory, hexdigest[:2], hexdigest + ext)
+
+    def _save(self, name, content):
+        name = self.content_name(name, content)
+        try:
+            # Mark the file used so a running garbage collection keeps it.
+            os.utime(self.path(name))
+            return name
+        except FileNotFoundError:
+            pass
+
+        saved = super()._save(name, content)
+        if saved != name:
+            # A concurrent upload of the same content got there first.
+            self.delete(saved)
+
+        return name
+
+
+recipe_image_storage = ContentAddressedStorage()
@@ -0,0 +1,37 @@
+import os
+import sys
+import time
+from unittest import skipUnless
+
+
+def benchmark(variable):
+    """Skip a benchmark test class unless the variable is set.
+
+    Benchmarks build large data sets and take a while, so they run only
+    when asked to; the environment variable sets their size, see size().
+    """
+    return skipUnless(os.environ.get(variable),
+                      f'Set {variable} to run the benchmark.')
+
+
+def size(variable, default=None):
+    """Return the size a benchmark was asked to run with."""
+    return int(os.environ.get(variable, default))
+
+
+def best_time(func, *args, repeat=3):
+    """Return the shortest wall clock time of a few calls of func."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        times.append(time.perf_counter() - start)
+
+    return min(times)
+
+
+def report(test, *lines):
+    """Write the figures a benchmark measured, passing or not."""
+    sys.stderr.write(f'\n{test.id()}\n')
+    for line in lines:
+        sys.stderr.write(f'    {line}\n')
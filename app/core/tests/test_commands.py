@@ -1,22 +1,103 @@
+from io import StringIO
 from unittest.mock import patch
 from django.core.management import call_command
+from django.core.management.base import CommandError
 from django.db.utils import OperationalError
-from django.test import TestCase
+from django.test import LiveServerTestCase, TestCase
 
+from core.models import Recipe
 
+ENSURE_CONNECTION = \
+    'django.db.backends.base.base.BaseDatabaseWrapper.ensure_connection'
+
+
+@patch('core.management.commands.wait_for_db.time.sleep')
 class CommandTests(TestCase):
 
-    def test_wait_for_db_ready(self):
-        """Test waiting for db whdn db is available."""
-        with patch('django.db.utils.ConnectionHandler.__getitem__') as gi:
-            gi.return_value = True
-            call_command('wait_for_db')
-            self.assertEqual(gi.call_count, 1)
+    def test_wait_for_db_ready(self, ts):
+        """Test waiting for db when db is available."""
+        out = StringIO()
+
+        call_command('wait_for_db', stdout=out)
+
+        ts.assert_not_called()
+        self.assertIn("Database 'default' available", out.getvalue())
+
+    def test_wait_for_db_runs_query(self, ts):
+        """Test the database has to answer a query to be available."""
+        with patch('django.db.backends.utils.CursorWrapper.execute') as ex:
+            ex.side_effect = [OperationalError] * 2 + [None]
+            call_command('wait_for_db', stdout=StringIO())
+
+        self.assertEqual(ex.call_count, 3)
+        ex.assert_called_with('SELECT 1')
 
-    @patch('time.sleep', return_value=True)
     def test_wait_for_db(self, ts):
         """Test wait for db"""
-        with patch('django.db.utils.ConnectionHandler.__getitem__') as gi:
-            gi.side_effect = [OperationalError] * 5 + [True]
-            call_command('wait_for_db')
-            self.assertEqual(gi.call_count, 6)
+        with patch(ENSURE_CONNECTION) as ec:
+            ec.side_effect = [OperationalError] * 5 + [None]
+            call_command('wait_for_db', stdout=StringIO())
+
+        self.assertEqual(ec.call_count, 6)
+        self.assertEqual(ts.call_count, 5)
+
+    def test_wait_for_db_backoff(self, ts):
+        """Test retries back off exponentially, with jitter, up to a cap."""
+        with patch(ENSURE_CONNECTION) as ec, \
+                patch('random.uniform', side_effect=lambda a, b: b) as ru:
+            ec.side_effect = [OperationalError] * 6 + [None]
+            call_command('wait_for_db', initial_delay=0.5, max_delay=4,
+                         stdout=StringIO())
+
+        self.assertEqual([call.args for call in ru.call_args_list],
+                         [(0, 0.5), (0, 1), (0, 2), (0, 4), (0, 4), (0, 4)])
+        self.assertEqual([call.args[0] for call in ts.call_args_list],
+                         [0.5, 1, 2, 4, 4, 4])
+
+    def test_wait_for_db_timeout(self, ts):
+        """Test waiting gives up once the timeout is reached."""
+        with patch(ENSURE_CONNECTION, side_effect=OperationalError), \
+                patch('core.management.commands.wait_for_db.time.monotonic',
+                      side_effect=range(100)):
+            with self.assertRaises(CommandError):
+                call_command('wait_for_db', timeout=3, stdout=StringIO())
+
+        self.assertLessEqual(sum(call.args[0] for call in ts.call_args_list),
+                             3)
+
+    def test_wait_for_db_aliases(self, ts):
+        """Test every database given is waited for."""
+        out = StringIO()
+
+        call_command('wait_for_db', database=['default', 'default'],
+                     stdout=out)
+
+        self.assertEqual(
+            out.getvalue().count("Database 'default' available"), 2
+        )
+
+
+class LoadTestCommandTests(LiveServerTestCase):
+    """Test the loadtest command against a live server."""
+
+    def test_loadtest(self):
+        out = StringIO()
+
+        call_command('loadtest', url=self.live_server_url, recipes=20,
+                     concurrency=2, duration=0.2, warmup=0, stdout=out)
+
+        self.assertEqual(
+            Recipe.objects.filter(user__email='loadtest@example.com').count(),
+            20,
+        )
+        rows = [line.split() for line in out.getvalue().splitlines()[2:]]
+        self.assertEqual([row[0] for row in rows],
+                         ['tags', 'ingredients', 'recipes', 'recipe', 'me'])
+        for row in rows:
+            self.assertGreater(int(row[1]), 0)
+            self.assertEqual(row[2], '0')
+
+    def test_server_unavailable(self):
+        with self.assertRaises(CommandError):
+            call_command('loadtest', url='http://127.0.0.1:9', recipes=0,
+                         stdout=StringIO())
@@ -0,0 +1,132 @@
+import io
+import statistics
+import threading
+import time
+from unittest import skipUnless
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.handlers.wsgi import WSGIHandler
+from django.db import connection, connections
+from django.db.backends.signals import connection_created
+from django.test import TransactionTestCase
+from django.urls import reverse
+
+from rest_framework.authtoken.models import Token
+
+from core.models import Tag
+from core.tests.benchmarks import benchmark, report, size
+
+TAGS_URL = reverse('recipe:tag-list')
+
+
+@skipUnless(connection.vendor == 'postgresql',
+            'Connection setup is only measured on PostgreSQL.')
+@benchmark('CONNECTION_BENCHMARK_REQUESTS')
+class PersistentConnectionBenchmarkTests(TransactionTestCase):
+    """Load test listing tags with and without persistent connections.
+
+    Requests go through the WSGI handler, which closes connections older
+    than CONN_MAX_AGE before and after every request, from concurrent
+    clients. CONNECTION_BENCHMARK_REQUESTS sets the number of requests and
+    CONNECTION_BENCHMARK_CLIENTS the number of clients.
+    """
+
+    def setUp(self):
+        user = get_user_model().objects.create_user(
+            'test@test.com',
+            'nakki'
+        )
+        Tag.objects.bulk_create(
+            Tag(user=user, name=f'Tag {i}') for i in range(20)
+        )
+        token = Token.objects.create(user=user)
+        self.environ = {
+            'REQUEST_METHOD': 'GET',
+            'PATH_INFO': TAGS_URL,
+            'SERVER_NAME': 'testserver',
+            'SERVER_PORT': '80',
+            'wsgi.url_scheme': 'http',
+            'HTTP_AUTHORIZATION': f'Token {token.key}',
+        }
+        self.handler = WSGIHandler()
+        self.requests = size('CONNECTION_BENCHMARK_REQUESTS')
+        self.clients = size('CONNECTION_BENCHMARK_CLIENTS', 8)
+
+    def request(self):
+        """Make a request, returning its status and how long it took."""
+        statuses = []
+        environ = dict(self.environ, **{'wsgi.input': io.BytesIO()})
+
+        start = time.perf_counter()
+        response = self.handler(
+            environ, lambda status, headers: statuses.append(status)
+        )
+        b''.join(response)
+        response.close()
+
+        return statuses[0], time.perf_counter() - start
+
+    def load(self, max_age):
+        """Make the requests with CONN_MAX_AGE max_age.
+
+        Returns the response statuses, latencies and the number of
+        connections opened.
+        """
+        statuses, latencies, opened = [], [], []
+
+        def client(count):
+            try:
+                for _ in range(count):
+                    status, latency = self.request()
+                    statuses.append(status)
+                    latencies.append(latency)
+            finally:
+                connections.close_all()
+
+        def created(sender, connection, **kwargs):
+            opened.append(connection.alias)
+
+        connection_created.connect(created)
+        try:
+            with patch.dict(connections.settings['default'],
+                            {'CONN_MAX_AGE': max_age}):
+                threads = [
+                    threading.Thread(
+                        target=client, args=(self.requests // self.clients,)
+                    )
+                    for _ in range(self.clients)
+                ]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+        finally:
+            connection_created.disconnect(created)
+
+        return statuses, latencies, len(opened)
+
+    def test_persistent_connections(self):
+        """Test reusing connections opens fewer and cuts median and p99."""
+        self.load(60)
+        opened, percentiles = {}, {}
+        for name, max_age in (('per request', 0), ('persistent', 60)):
+            statuses, latencies, opened[name] = self.load(max_age)
+            self.assertEqual(set(statuses), {'200 OK'})
+            cuts = statistics.quantiles(latencies, n=100)
+            percentiles[name] = {'p50': cuts[49], 'p99': cuts[98]}
+
+        report(self, f'{self.requests} requests, {self.clients} clients', *(
+            f'{name}: {opened[name]} connections opened, ' + ', '.join(
+                f'{percentile} {latency * 1000:.2f} ms'
+                for percentile, latency in percentiles[name].items()
+            )
+            for name in percentiles
+        ))
+
+        self.assertGreaterEqual(opened['per request'], self.requests // 2)
+        self.assertLessEqual(opened['persistent'], self.clients)
+        for percentile in ('p50', 'p99'):
+            self.assertLess(percentiles['persistent'][percentile],
+                            percentiles['per request'][percentile],
+                            percentile)
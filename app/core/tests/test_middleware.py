@@ -0,0 +1,213 @@
+import gzip
+import time
+import zlib
+
+from django.contrib.auth import get_user_model
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core.middleware import STREAMS, CompressionMiddleware, \
+    negotiate_encoding
+from core.models import Recipe, Tag
+from core.tests.benchmarks import benchmark, report, size
+
+BODY = b'{"id":1,"title":"Kebab ranarit","tags":[1,2,3]}' * 100
+
+
+def respond(response, **headers):
+    """Return response after passing through the middleware."""
+    request = RequestFactory().get('/', **headers)
+    return CompressionMiddleware(lambda request: response)(request)
+
+
+@override_settings(COMPRESSION_ENCODINGS=['zstd', 'br', 'gzip'],
+                   COMPRESSION_MIN_SIZE=1024)
+class CompressionMiddlewareTests(TestCase):
+    """Test responses are compressed when worthwhile."""
+
+    def json_response(self, body=BODY, **kwargs):
+        return HttpResponse(body, content_type='application/json', **kwargs)
+
+    def test_negotiate_encoding(self):
+        """Test the accepted encoding listed first wins ties."""
+        encodings = ['zstd', 'br', 'gzip']
+        for header, expected in (
+            ('gzip, deflate, br', 'br'),
+            ('gzip;q=1.0, br;q=0.5', 'gzip'),
+            ('*', 'zstd'),
+            ('*, zstd;q=0', 'br'),
+            ('br;q=0, gzip;q=0', None),
+            ('identity', None),
+            ('', None),
+            ('GZIP;q=bad, gzip', 'gzip'),
+        ):
+            self.assertEqual(negotiate_encoding(header, encodings), expected)
+
+    def test_gzip(self):
+        res = respond(self.json_response(headers={'ETag': '"abc"'}),
+                      HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(res.content), BODY)
+        self.assertEqual(res['Content-Length'], str(len(res.content)))
+        self.assertEqual(res['Vary'], 'Accept-Encoding')
+        self.assertEqual(res['ETag'], 'W/"abc"')
+
+    def test_not_accepted(self):
+        res = respond(self.json_response())
+
+        self.assertFalse(res.has_header('Content-Encoding'))
+        self.assertEqual(res.content, BODY)
+        self.assertEqual(res['Vary'], 'Accept-Encoding')
+
+    def test_small_response(self):
+        res = respond(self.json_response(BODY[:1000]),
+                      HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertFalse(res.has_header('Content-Encoding'))
+        self.assertFalse(res.has_header('Vary'))
+
+    def test_skipped_responses(self):
+        """Test images, partial and already encoded content isn't touched."""
+        responses = (
+            HttpResponse(BODY, content_type='image/jpeg'),
+            HttpResponse(BODY, content_type='image/webp'),
+            self.json_response(status=206),
+            self.json_response(headers={'Content-Encoding': 'br'}),
+            self.json_response(headers={'Cache-Control': 'no-transform'}),
+        )
+        for response in responses:
+            res = respond(response, HTTP_ACCEPT_ENCODING='gzip')
+
+            self.assertEqual(res.content, BODY)
+            self.assertNotEqual(res.get('Content-Encoding'), 'gzip')
+
+    def test_svg_compressed(self):
+        res = respond(HttpResponse(BODY, content_type='image/svg+xml'),
+                      HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+
+    @override_settings(COMPRESSION_LEVELS={'gzip': 1})
+    def test_level(self):
+        res = respond(self.json_response(), HTTP_ACCEPT_ENCODING='gzip')
+
+        stream = STREAMS['gzip'](1)
+        self.assertEqual(res.content, stream.compress(BODY) + stream.finish())
+
+    def test_streaming(self):
+        """Test each chunk is compressed and sent as it's produced."""
+        produced = []
+
+        def chunks():
+            for i in range(3):
+                produced.append(i)
+                yield BODY
+
+        res = respond(StreamingHttpResponse(chunks()),
+                      HTTP_ACCEPT_ENCODING='gzip')
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        body = b''
+        for chunk in res.streaming_content:
+            body += decompressor.decompress(chunk)
+            self.assertEqual(body, BODY * len(produced))
+
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+        self.assertFalse(res.has_header('Content-Length'))
+        self.assertEqual(body, BODY * 3)
+        self.assertTrue(decompressor.eof)
+
+    def test_streaming_small_content_length(self):
+        response = StreamingHttpResponse([BODY[:10]])
+        response['Content-Length'] = '10'
+
+        res = respond(response, HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertFalse(res.has_header('Content-Encoding'))
+
+
+def recipe_list_body():
+    """Return the body of a full page of a recipe list."""
+    user = get_user_model().objects.create_user('test@test.com', 'nakki')
+    tags = [Tag.objects.create(user=user, name=f'Tag {i}') for i in range(10)]
+    recipes = Recipe.objects.bulk_create(
+        Recipe(user=user, title=f'Recipe {i}', time_minutes=i % 90,
+               price=f'{i % 50}.90', link=f'https://example.com/{i}')
+        for i in range(200)
+    )
+    Recipe.tags.through.objects.bulk_create(
+        Recipe.tags.through(recipe=recipe, tag=tag)
+        for i, recipe in enumerate(recipes) for tag in tags[i % 7:]
+    )
+    client = APIClient()
+    client.force_authenticate(user)
+
+    return client.get(
+        reverse('recipe:recipe-list'), {'page_size': 200}
+    ).content
+
+
+def compress(encoding, level, body):
+    """Return body compressed whole with encoding at level."""
+    stream = STREAMS[encoding](level)
+    return stream.compress(body) + stream.finish()
+
+
+# Levels worth comparing of each encoding: fastest, default and smallest.
+LEVELS = (('gzip', (1, 6, 9)), ('br', (1, 4, 11)), ('zstd', (1, 3, 19)))
+
+
+class CompressionSizeTests(TestCase):
+    """Test the bytes saved compressing recipe lists."""
+
+    def setUp(self):
+        self.body = recipe_list_body()
+
+    def test_compressed_size(self):
+        """Test every installed encoding shrinks a list to under a quarter."""
+        for encoding, levels in LEVELS:
+            if STREAMS[encoding] is None:
+                continue
+            for level in levels:
+                size = len(compress(encoding, level, self.body))
+                self.assertLess(
+                    size, len(self.body) / 4,
+                    f'{encoding} {level}: {size} of {len(self.body)} bytes',
+                )
+
+
+@benchmark('COMPRESSION_BENCHMARK_RESPONSES')
+class CompressionBenchmarkTests(TestCase):
+    """Benchmark the CPU time compressing recipe lists costs.
+
+    Each encoding and level compresses a full page of a recipe list
+    COMPRESSION_BENCHMARK_RESPONSES times.
+    """
+
+    def setUp(self):
+        self.body = recipe_list_body()
+        self.responses = size('COMPRESSION_BENCHMARK_RESPONSES')
+
+    def test_cpu_time_against_bytes_saved(self):
+        """Test the CPU time per response and bytes saved of each level."""
+        lines = []
+        for encoding, levels in LEVELS:
+            if STREAMS[encoding] is None:
+                lines.append(f'{encoding}: not installed')
+                continue
+            for level in levels:
+                start = time.process_time()
+                for _ in range(self.responses):
+                    compressed = compress(encoding, level, self.body)
+                cpu = (time.process_time() - start) / self.responses
+                saved = len(self.body) - len(compressed)
+                lines.append(
+                    f'{encoding} {level}: {cpu * 1000:.2f} ms CPU per '
+                    f'response, {saved} of {len(self.body)} bytes saved '
+                    f'({saved / len(self.body):.0%})'
+                )
+                self.assertGreater(saved, 0, lines[-1])
+
+        report(self, *lines)
@@ -1,6 +1,11 @@
+import hashlib
+import os
+import shutil
+import tempfile
 from unittest.mock import patch
 
-from django.test import TestCase
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
 from django.contrib.auth import get_user_model
 
 from core import models
@@ -59,6 +64,32 @@ class ModelTest(TestCase):
 
         self.assertEqual(str(tag), tag.name)
 
+    def test_get_or_create_by_names(self):
+        """Test existing names are reused and missing ones created."""
+        user = sample_user()
+        existing = models.Tag.objects.create(user=user, name='Vegan')
+
+        tags = models.Tag.objects.get_or_create_by_names(
+            user, ['Vegan', 'Dessert', 'Dessert']
+        )
+
+        self.assertEqual(
+            sorted(tag.name for tag in tags), ['Dessert', 'Vegan']
+        )
+        self.assertIn(existing, tags)
+        self.assertEqual(models.Tag.objects.count(), 2)
+
+    def test_get_or_create_by_names_bumps_collection(self):
+        """Test creating names bumps the collection of their model."""
+        user = sample_user()
+        for model, collection in ((models.Tag, models.TAGS),
+                                  (models.Ingredient, models.INGREDIENTS)):
+            model.objects.get_or_create_by_names(user, ['Vegan'])
+
+            self.assertTrue(models.CollectionVersion.objects.filter(
+                user=user, collection=collection
+            ).exists())
+
     def test_ingredient_str(self):
         """Test the ingredient string representation."""
         ingredient = models.Ingredient.objects.create(
@@ -89,3 +120,83 @@ class ModelTest(TestCase):
         exp_path = f'uploads/recipe/{uuid}.jpg'
 
         self.assertEqual(file_path, exp_path)
+
+
+class RecipeImageStorageTests(TestCase):
+    """Test content addressed recipe image storage."""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.addCleanup(shutil.rmtree, self.media_root)
+        self.user = sample_user()
+
+    def sample_recipe(self, content=b'image'):
+        """Create a recipe with content as its image."""
+        recipe = models.Recipe.objects.create(
+            user=self.user, title='Makkaraperunat', time_minutes=5, price=5
+        )
+        recipe.image.save('photo.JPG', ContentFile(content))
+
+        return recipe
+
+    def ref_count(self, name):
+        """Return the number of references to a stored image."""
+        return models.ImageBlob.objects.get(name=name).ref_count
+
+    def test_image_named_by_content(self):
+        """Test images are stored under the hash of their content."""
+        recipe = self.sample_recipe()
+
+        digest = hashlib.sha256(b'image').hexdigest()
+        self.assertEqual(
+            recipe.image.name, f'uploads/recipe/{digest[:2]}/{digest}.jpg'
+        )
+        self.assertEqual(recipe.image.read(), b'image')
+
+    def test_identical_images_stored_once(self):
+        """Test uploading the same image twice shares one file."""
+        recipe1 = self.sample_recipe()
+        recipe2 = self.sample_recipe()
+
+        self.assertEqual(recipe1.image.name, recipe2.image.name)
+        self.assertEqual(len(os.listdir(os.path.dirname(recipe1.image.path))),
+                         1)
+        self.assertEqual(self.ref_count(recipe1.image.name), 2)
+
+    def test_replacing_image_releases_old_one(self):
+        """Test replacing an image moves the reference to the new one."""
+        recipe = self.sample_recipe(b'old')
+        old_name = recipe.image.name
+
+        recipe = models.Recipe.objects.get(pk=recipe.pk)
+        recipe.image.save('photo.jpg', ContentFile(b'new'))
+
+        self.assertEqual(self.ref_count(old_name), 0)
+        self.assertEqual(self.ref_count(recipe.image.name), 1)
+        self.assertTrue(os.path.exists(recipe.image.path))
+
+    def test_saving_recipe_keeps_reference(self):
+        """Test saving other fields doesn't count the image again."""
+        recipe = self.sample_recipe()
+
+        recipe = models.Recipe.objects.get(pk=recipe.pk)
+        recipe.title = 'Nakit'
+        recipe.save()
+        models.Recipe.objects.only('title').get(pk=recipe.pk).save()
+
+        self.assertEqual(self.ref_count(recipe.image.name), 1)
+
+    def test_deleting_recipe_releases_image(self):
+        """Test deleting a recipe drops its reference but keeps the file."""
+        recipe1 = self.sample_recipe()
+        recipe2 = self.sample_recipe()
+
+        recipe1.delete()
+        self.assertEqual(self.ref_count(recipe2.image.name), 1)
+        models.Recipe.objects.filter(pk=recipe2.pk).delete()
+
+        self.assertEqual(self.ref_count(recipe2.image.name), 0)
+        self.assertTrue(os.path.exists(recipe2.image.path))
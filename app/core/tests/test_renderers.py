@@ -0,0 +1,171 @@
+import datetime
+import io
+import uuid
+from decimal import Decimal
+from unittest import skipUnless
+
+from django.test import TestCase
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework import parsers, renderers
+from rest_framework.exceptions import ErrorDetail, ParseError
+
+from core.parsers import JSONParser
+from core.renderers import JSONRenderer, orjson
+from core.tests.benchmarks import benchmark, best_time, report, size
+
+DATA = {
+    'id': 9007199254740993,
+    'title': 'Kebab ranarit ä  ',
+    'price': Decimal('12.50'),
+    'created': datetime.datetime(2022, 5, 1, 12, 30, 15, 123456,
+                                 tzinfo=datetime.timezone.utc),
+    'local': timezone.make_aware(datetime.datetime(2022, 5, 1, 12, 30)),
+    'day': datetime.date(2022, 5, 1),
+    'at': datetime.time(12, 30),
+    'took': datetime.timedelta(minutes=90),
+    'uuid': uuid.UUID(int=1),
+    'lazy': gettext_lazy('This field is required.'),
+    'errors': [ErrorDetail('Invalid.', code='invalid')],
+    'tags': (1, 2),
+    'set': {3},
+    'bytes': b'abc',
+    'empty': {},
+    'ratio': 0.5,
+    'nested': [{'images': {160: None, '480': [True, False]}}],
+}
+
+
+def recipes(count):
+    """Return a recipe list response body of count recipes."""
+    return {
+        'next': 'http://testserver/api/recipe/recipes/?cursor=cD0xMjM%3D',
+        'previous': None,
+        'results': [{
+            'id': i,
+            'title': f'Recipe {i}',
+            'ingredients': list(range(i, i + 8)),
+            'tags': list(range(i, i + 4)),
+            'time_minutes': i % 90,
+            'price': f'{i % 100}.50',
+            'link': f'https://example.com/recipes/{i}',
+            'thumbnail': {
+                'jpg': f'http://testserver/media/derivatives/{i}-160.jpg',
+                'webp': f'http://testserver/media/derivatives/{i}-160.webp',
+            },
+        } for i in range(count)],
+    }
+
+
+class JSONRendererTests(TestCase):
+    """Test JSON is rendered the same as by DRF's renderer."""
+
+    def assertRenderedSame(self, data, media_type=None):
+        self.assertEqual(
+            JSONRenderer().render(data, media_type),
+            renderers.JSONRenderer().render(data, media_type),
+        )
+
+    def test_same_output(self):
+        """Test decimals, dates, lazy strings and the rest are encoded."""
+        for media_type in (None, 'application/json; indent=2',
+                           'application/json; indent=4'):
+            self.assertRenderedSame(DATA, media_type)
+
+    def test_none(self):
+        self.assertEqual(JSONRenderer().render(None), b'')
+
+    def test_unsupported_by_orjson(self):
+        """Test data orjson rejects is rendered by DRF's renderer."""
+        self.assertRenderedSame({'big': 2 ** 70})
+
+    def test_non_finite_rejected(self):
+        """Test NaN and infinity raise as with DRF's renderer."""
+        for value in (float('nan'), float('inf'), -float('inf'),
+                      Decimal('NaN'), Decimal('Infinity')):
+            data = {'results': [{'ratio': value, 'link': None}]}
+            with self.assertRaises(ValueError):
+                renderers.JSONRenderer().render(data)
+            with self.assertRaises(ValueError):
+                JSONRenderer().render(data)
+
+    def test_none_with_finite_floats(self):
+        self.assertRenderedSame({'ratio': 0.5, 'link': None, 'items': [1.25]})
+
+    def test_unencodable(self):
+        """Test data json can't encode fails the same way."""
+        with self.assertRaises(TypeError):
+            JSONRenderer().render({'object': object()})
+
+
+class JSONParserTests(TestCase):
+    """Test JSON is parsed the same as by DRF's parser."""
+
+    def parse(self, parser, body, encoding='utf-8'):
+        return parser.parse(io.BytesIO(body), None, {'encoding': encoding})
+
+    def assertParsedSame(self, body, encoding='utf-8'):
+        parsed = self.parse(JSONParser(), body, encoding)
+        expected = self.parse(parsers.JSONParser(), body, encoding)
+
+        self.assertEqual(parsed, expected)
+        self.assertEqual(repr(parsed), repr(expected))
+
+    def test_same_output(self):
+        self.assertParsedSame(JSONRenderer().render(DATA))
+        self.assertParsedSame(
+            b'[1.5, 1e400, "\\ud83d\\ude00", 12345678901234567890123]'
+        )
+
+    def test_other_encodings(self):
+        self.assertParsedSame('{"title": "ä"}'.encode('utf-16'), 'utf-16')
+
+    def error(self, parser, body):
+        """Return the message of the error parsing body."""
+        with self.assertRaises(ParseError) as context:
+            self.parse(parser, body)
+
+        return str(context.exception)
+
+    def test_invalid(self):
+        """Test invalid JSON and out of range floats are rejected."""
+        for body in (b'{"title": ', b'[NaN]', b'[Infinity]', b''):
+            self.assertEqual(self.error(JSONParser(), body),
+                             self.error(parsers.JSONParser(), body))
+
+
+@skipUnless(orjson, 'orjson is not installed')
+@benchmark('JSON_BENCHMARK_SIZE')
+class JSONBenchmarkTests(TestCase):
+    """Benchmark rendering and parsing JSON_BENCHMARK_SIZE recipes."""
+
+    def setUp(self):
+        self.data = recipes(size('JSON_BENCHMARK_SIZE'))
+        self.body = renderers.JSONRenderer().render(self.data)
+
+    def compare(self, action, stdlib, fast):
+        """Report the time json and orjson took, then check orjson won."""
+        figures = (f'{action} {len(self.body)} bytes: json '
+                   f'{stdlib * 1000:.1f} ms, orjson {fast * 1000:.1f} ms, '
+                   f'{stdlib / fast:.1f}x')
+        report(self, figures)
+        self.assertLess(fast, stdlib, figures)
+
+    def test_render_time(self):
+        """Test rendering with orjson is faster than with json."""
+        self.compare(
+            'Render',
+            best_time(renderers.JSONRenderer().render, self.data),
+            best_time(JSONRenderer().render, self.data),
+        )
+
+    def test_parse_time(self):
+        """Test parsing with orjson is faster than with json."""
+        def parse(parser):
+            parser.parse(io.BytesIO(self.body), None, {'encoding': 'utf-8'})
+
+        self.compare(
+            'Parse',
+            best_time(parse, parsers.JSONParser()),
+            best_time(parse, JSONParser()),
+        )
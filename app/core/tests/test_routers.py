@@ -0,0 +1,212 @@
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connections
+from django.db.models import QuerySet
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.models import Tag
+from core.routers import ReplicaRouter, reads_from, routing_stats
+
+TAGS_URL = reverse('recipe:tag-list')
+ROUTING_STATS_URL = reverse('recipe:routing-stats')
+
+
+def lagging_replica(*models):
+    """Hide the rows of models from lookups off the primary database.
+
+    Stands in for a replica that hasn't caught up with their writes yet.
+    """
+    get = QuerySet.get
+
+    def replica_get(queryset, *args, **kwargs):
+        if queryset.db != 'default' and queryset.model in models:
+            raise queryset.model.DoesNotExist
+        return get(queryset, *args, **kwargs)
+
+    return patch.object(QuerySet, 'get', replica_get)
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'])
+class ReplicaRouterTests(TestCase):
+    """Test the router sends reads where the request's reads go."""
+
+    def setUp(self):
+        self.router = ReplicaRouter()
+
+    def test_reads_outside_requests_from_primary(self):
+        self.assertEqual(self.router.db_for_read(Tag), 'default')
+
+    def test_reads_from_request_database(self):
+        with reads_from('replica1'):
+            self.assertEqual(self.router.db_for_read(Tag), 'replica1')
+
+        self.assertEqual(self.router.db_for_read(Tag), 'default')
+
+    def test_writes_to_primary(self):
+        with reads_from('replica1'):
+            self.assertEqual(self.router.db_for_write(Tag), 'default')
+
+    def test_replicas_not_migrated(self):
+        self.assertFalse(self.router.allow_migrate('replica1', 'core'))
+        self.assertIsNone(self.router.allow_migrate('default', 'core'))
+
+
+# The replica is the default database, so the decisions are told apart by
+# the reasons counted for them.
+@override_settings(DATABASE_REPLICAS=['default'])
+class ReplicaRoutingMiddlewareTests(TestCase):
+    """Test requests are routed and clients pinned after writing."""
+
+    def setUp(self):
+        cache.clear()
+        routing_stats.reset_stats()
+        self.user = get_user_model().objects.create_user(
+            'test@test.com',
+            'nakki'
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_reads_from_replica(self):
+        self.client.get(TAGS_URL)
+
+        self.assertEqual(routing_stats.stats()['requests'], {'replica': 1})
+
+    def test_write_pins_client(self):
+        """Test a client reads from the primary for a while after a write."""
+        res = self.client.post(TAGS_URL, {'name': 'Vegan'})
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+        res = self.client.get(TAGS_URL)
+
+        self.assertEqual(res.data['results'][0]['name'], 'Vegan')
+        stats = routing_stats.stats()
+        self.assertEqual(stats['requests'], {'write': 1, 'pinned': 1})
+        self.assertEqual(stats['pins'], 1)
+
+    def test_pin_expires(self):
+        self.client.post(TAGS_URL, {'name': 'Vegan'})
+
+        with patch('django.core.cache.backends.locmem.time.time',
+                   return_value=2 ** 40):
+            self.client.get(TAGS_URL)
+
+        self.assertEqual(routing_stats.stats()['requests'],
+                         {'write': 1, 'replica': 1})
+
+    def test_failed_write_not_pinned(self):
+        self.client.post(TAGS_URL, {'name': ''})
+        self.client.get(TAGS_URL)
+
+        self.assertEqual(routing_stats.stats()['pins'], 0)
+        self.assertEqual(routing_stats.stats()['requests']['replica'], 1)
+
+    def test_pins_per_client(self):
+        other = get_user_model().objects.create_user('o@test.com', 'nakki')
+        client = APIClient()
+        client.credentials(
+            HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=other)}'
+        )
+
+        self.client.post(TAGS_URL, {'name': 'Vegan'})
+        client.get(TAGS_URL)
+
+        self.assertEqual(routing_stats.stats()['requests'],
+                         {'write': 1, 'replica': 1})
+
+    def test_no_replicas(self):
+        with self.settings(DATABASE_REPLICAS=[]):
+            self.client.post(TAGS_URL, {'name': 'Vegan'})
+            self.client.get(TAGS_URL)
+
+        stats = routing_stats.stats()
+        self.assertEqual(stats['requests'], {'no replicas': 2})
+        self.assertEqual(stats['pins'], 0)
+
+    def test_routing_stats_admin_only(self):
+        res = self.client.get(ROUTING_STATS_URL)
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.user.is_staff = True
+        self.user.save()
+        res = self.client.get(ROUTING_STATS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['requests']['replica'], 2)
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'])
+class ReplicaRoutingTwoDatabaseTests(TransactionTestCase):
+    """Test routing with a second alias of the test database as a replica.
+
+    Both aliases reach the same data, so reads from either see the
+    committed writes. The alias is added after the test databases are set
+    up, as the test runner only knows the configured ones.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        settings_dict = connections['default'].settings_dict
+        patcher = patch.dict(connections.settings, {'replica1': dict(
+            settings_dict, TEST=dict(settings_dict['TEST'], MIRROR='default')
+        )})
+        patcher.start()
+        cls.addClassCleanup(patcher.stop)
+        cls.addClassCleanup(connections.__delitem__, 'replica1')
+        cls.addClassCleanup(connections['replica1'].close)
+
+    def setUp(self):
+        cache.clear()
+        routing_stats.reset_stats()
+        user = get_user_model().objects.create_user('test@test.com', 'nakki')
+        Tag.objects.create(user=user, name='Vegan')
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=user)}'
+        )
+
+    def test_reads_from_replica_until_write(self):
+        res = self.client.get(TAGS_URL)
+        self.assertEqual([tag['name'] for tag in res.data['results']],
+                         ['Vegan'])
+        self.assertIn('replica1', routing_stats.stats()['reads'])
+
+        routing_stats.reset_stats()
+        self.client.post(TAGS_URL, {'name': 'Dessert'})
+        res = self.client.get(TAGS_URL)
+
+        self.assertEqual(len(res.data['results']), 2)
+        self.assertEqual(set(routing_stats.stats()['reads']), {'default'})
+
+    def test_new_token_accepted_by_lagging_replica(self):
+        """Test a token the replica doesn't have yet is accepted."""
+        client = APIClient()
+        credentials = {'email': 'new@test.com', 'password': 'nakki123'}
+        client.post(reverse('user:create'), dict(credentials, name='New'))
+        token = client.post(reverse('user:token'), credentials).data['token']
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token}')
+
+        routing_stats.reset_stats()
+        with lagging_replica(Token):
+            res = client.get(reverse('user:me'))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['email'], 'new@test.com')
+        self.assertEqual(routing_stats.stats()['requests'], {'replica': 1})
+
+    def test_unknown_token_rejected_by_primary_too(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Token unknown')
+
+        res = self.client.get(TAGS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertIn('default', routing_stats.stats()['reads'])
@@ -0,0 +1,174 @@
+import hashlib
+import os
+import shutil
+import tempfile
+
+from django.test import RequestFactory, TestCase, override_settings
+
+from core.views import parse_range, serve_media
+
+CONTENT = bytes(range(256)) * 4
+DIGEST = hashlib.sha256(CONTENT).hexdigest()
+IMAGE_PATH = f'uploads/recipe/{DIGEST[:2]}/{DIGEST}.jpg'
+
+
+@override_settings(MEDIA_SERVER='django')
+class ServeMediaTests(TestCase):
+    """Test serving uploaded files."""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.addCleanup(shutil.rmtree, self.media_root)
+
+        for name in (IMAGE_PATH, 'uploads/recipe/legacy.jpg'):
+            path = os.path.join(self.media_root, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as file:
+                file.write(CONTENT)
+
+    def get(self, name=IMAGE_PATH, **headers):
+        """Request a file from MEDIA_URL."""
+        return self.client.get(f'/media/{name}', **headers)
+
+    def serve(self, **headers):
+        """Call the view directly, as the test client wraps the stream."""
+        request = RequestFactory().get(f'/media/{IMAGE_PATH}', **headers)
+        res = serve_media(request, IMAGE_PATH)
+        self.addCleanup(res.close)
+
+        return res
+
+    def test_serve_file(self):
+        """Test a file is streamed whole."""
+        res = self.get()
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(b''.join(res.streaming_content), CONTENT)
+        self.assertEqual(res['Content-Type'], 'image/jpeg')
+        self.assertEqual(res['Content-Length'], str(len(CONTENT)))
+        self.assertEqual(res['Accept-Ranges'], 'bytes')
+
+    def test_file_handed_to_file_wrapper(self):
+        """Test the open file is left for the server to sendfile()."""
+        res = self.serve()
+
+        self.assertEqual(res.file_to_stream.name,
+                         os.path.join(self.media_root, IMAGE_PATH))
+
+    def test_content_addressed_file_cached_for_good(self):
+        """Test files named by their content are immutable."""
+        res = self.get()
+
+        self.assertEqual(res['ETag'], f'"{DIGEST}"')
+        self.assertIn('immutable', res['Cache-Control'])
+        self.assertIn('max-age=31536000', res['Cache-Control'])
+
+    @override_settings(MEDIA_CACHE_MAX_AGE=60)
+    def test_other_file_cached_briefly(self):
+        """Test other files get the configured max age."""
+        res = self.get('uploads/recipe/legacy.jpg')
+
+        self.assertEqual(res.status_code, 200)
+        self.assertNotIn('immutable', res['Cache-Control'])
+        self.assertIn('max-age=60', res['Cache-Control'])
+
+    def test_not_modified(self):
+        """Test a cached copy is revalidated without sending the file."""
+        etag = self.get()['ETag']
+
+        res = self.get(HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, 304)
+        self.assertEqual(res['ETag'], etag)
+
+    def test_range(self):
+        """Test a byte range is sent as partial content."""
+        res = self.get(HTTP_RANGE='bytes=100-199')
+
+        self.assertEqual(res.status_code, 206)
+        self.assertEqual(b''.join(res.streaming_content), CONTENT[100:200])
+        self.assertEqual(res['Content-Length'], '100')
+        self.assertEqual(res['Content-Range'], f'bytes 100-199/{len(CONTENT)}')
+
+    def test_range_starts_at_offset_for_sendfile(self):
+        """Test the file descriptor is positioned at the range."""
+        res = self.serve(HTTP_RANGE='bytes=-24')
+
+        fileno = res.file_to_stream.fileno()
+        self.assertEqual(os.lseek(fileno, 0, os.SEEK_CUR), len(CONTENT) - 24)
+        self.assertEqual(res['Content-Length'], '24')
+        self.assertEqual(b''.join(res.streaming_content), CONTENT[-24:])
+
+    def test_range_not_satisfiable(self):
+        """Test a range past the end of the file is refused."""
+        res = self.get(HTTP_RANGE=f'bytes={len(CONTENT)}-')
+
+        self.assertEqual(res.status_code, 416)
+        self.assertEqual(res['Content-Range'], f'bytes */{len(CONTENT)}')
+
+    def test_stale_if_range_sends_whole_file(self):
+        """Test a range of an outdated copy gets the whole file."""
+        res = self.get(HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"stale"')
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(b''.join(res.streaming_content), CONTENT)
+
+    def test_missing_file(self):
+        """Test missing files, directories and paths outside are 404."""
+        for name in ('uploads/recipe/missing.jpg', 'uploads/recipe/',
+                     '../etc/passwd'):
+            self.assertEqual(self.get(name).status_code, 404)
+
+    def test_post_not_allowed(self):
+        """Test files can only be read."""
+        res = self.client.post(f'/media/{IMAGE_PATH}')
+
+        self.assertEqual(res.status_code, 405)
+
+    @override_settings(MEDIA_SERVER='x-accel-redirect')
+    def test_x_accel_redirect(self):
+        """Test nginx is told to send the file."""
+        res = self.get()
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res['X-Accel-Redirect'],
+                         f'/protected-media/{IMAGE_PATH}')
+        self.assertEqual(res['Content-Type'], 'image/jpeg')
+        self.assertIn('immutable', res['Cache-Control'])
+        self.assertEqual(res.content, b'')
+
+    @override_settings(MEDIA_SERVER='x-sendfile')
+    def test_x_sendfile(self):
+        """Test the web server is given the path of the file."""
+        res = self.get()
+
+        self.assertEqual(res['X-Sendfile'],
+                         os.path.join(self.media_root, IMAGE_PATH))
+        self.assertEqual(res.content, b'')
+
+
+class ParseRangeTests(TestCase):
+    """Test parsing Range headers."""
+
+    def test_ranges(self):
+        """Test the supported forms of a single byte range."""
+        self.assertEqual(parse_range('bytes=0-9', 100), (0, 10))
+        self.assertEqual(parse_range('bytes=90-', 100), (90, 10))
+        self.assertEqual(parse_range('bytes=90-200', 100), (90, 10))
+        self.assertEqual(parse_range('bytes=-10', 100), (90, 10))
+        self.assertEqual(parse_range('bytes=-200', 100), (0, 100))
+
+    def test_whole_file(self):
+        """Test unsupported or invalid ranges send the whole file."""
+        for header in ('bytes=0-9,20-29', 'bytes=9-0', 'bytes=-',
+                       'items=0-9'):
+            self.assertIsNone(parse_range(header, 100))
+
+    def test_not_satisfiable(self):
+        """Test ranges past the end of the file are refused."""
+        for header in ('bytes=100-', 'bytes=-0'):
+            with self.assertRaises(ValueError):
+                parse_range(header, 100)
@@ -0,0 +1,178 @@
+import mimetypes
+import os
+import re
+import stat
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.http import require_safe
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+# Files named after a hash of their content, see core/storage.py.
+CONTENT_ADDRESSED_RE = re.compile(r'^([0-9a-f]{64})\.\w+$')
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+
+class FileRange:
+    """Part of an open file, read like a whole file.
+
+    The file descriptor is exposed and positioned at the start of the
+    range, so WSGI servers with a file wrapper, such as gunicorn, still
+    send the range with sendfile() up to the Content-Length.
+    """
+
+    def __init__(self, file, start, length):
+        file.seek(start)
+        self.file = file
+        self.remaining = length
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def parse_range(header, size):
+    """Return (start, length) of the single byte range in a Range header.
+
+    Returns None when the whole file should be sent instead, which is
+    allowed for multiple ranges, and raises ValueError if the range is
+    past the end of the file.
+    """
+    match = RANGE_RE.match(header.strip())
+    if not match or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+
+    if not first:
+        length = min(int(last), size)
+        if not length:
+            raise ValueError('Range not satisfiable.')
+        return size - length, length
+
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size:
+        raise ValueError('Range not satisfiable.')
+    if end < start:
+        return None
+
+    return start, end - start + 1
+
+
+def _handoff(path, full_path, content_type):
+    """Return a response telling the web server to send the file."""
+    response = HttpResponse(content_type=content_type)
+    if settings.MEDIA_SERVER == 'x-accel-redirect':
+        response['X-Accel-Redirect'] = \
+            settings.MEDIA_ACCEL_REDIRECT_PREFIX + quote(path)
+    else:
+        response['X-Sendfile'] = full_path
+
+    return response
+
+
+def _file_response(request, full_path, size, content_type, validators):
+    """Return a streaming response of the file or the range asked for."""
+    byte_range = None
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if 'HTTP_RANGE' in request.META and (
+            if_range is None or if_range in validators):
+        try:
+            byte_range = parse_range(request.META['HTTP_RANGE'], size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+    file = open(full_path, 'rb')
+    if byte_range is None:
+        response = FileResponse(file, content_type=content_type)
+    else:
+        start, length = byte_range
+        response = FileResponse(
+            FileRange(file, start, length),
+            status=206,
+            content_type=content_type,
+        )
+        response['Content-Length'] = length
+        response['Content-Range'] = \
+            f'bytes {start}-{start + length - 1}/{size}'
+    response['Accept-Ranges'] = 'bytes'
+
+    return response
+
+
+@require_safe
+def serve_media(request, path):
+    """Serve an uploaded file from MEDIA_ROOT.
+
+    With MEDIA_SERVER set to 'x-accel-redirect' (nginx) or 'x-sendfile'
+    (Apache, lighttpd) the web server is told to send the file, so no
+    worker is held up by a slow download. nginx needs an internal location
+    for the prefix, e.g.
+
+        location /protected-media/ {
+            internal;
+            alias /vol/web/media/;
+        }
+
+    Otherwise the file is streamed as a FileResponse, which WSGI servers
+    send with sendfile(), with support for byte ranges. Files named after
+    their content never change, so may be cached for good.
+    """
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+        file_stat = os.stat(full_path)
+    except (SuspiciousFileOperation, OSError):
+        raise Http404('File not found.')
+    if not stat.S_ISREG(file_stat.st_mode):
+        raise Http404('File not found.')
+
+    content_addressed = CONTENT_ADDRESSED_RE.match(os.path.basename(path))
+    if content_addressed:
+        etag = quote_etag(content_addressed.group(1))
+    else:
+        etag = quote_etag(f'{file_stat.st_size:x}-{file_stat.st_mtime_ns:x}')
+    last_modified = int(file_stat.st_mtime)
+
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified
+    )
+    if response is None:
+        content_type = mimetypes.guess_type(full_path)[0] or \
+            'application/octet-stream'
+        if settings.MEDIA_SERVER in ('x-accel-redirect', 'x-sendfile'):
+            response = _handoff(path, full_path, content_type)
+        else:
+            response = _file_response(
+                request, full_path, file_stat.st_size, content_type,
+                (etag, http_date(last_modified)),
+            )
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    if content_addressed:
+        patch_cache_control(
+            response, public=True, max_age=IMMUTABLE_MAX_AGE, immutable=True
+        )
+    else:
+        patch_cache_control(
+            response, public=True, max_age=settings.MEDIA_CACHE_MAX_AGE
+        )
+
+    return response
@@ -0,0 +1,30 @@
+from django.apps import apps
+from django.conf import settings
+from django.urls import get_resolver
+from django.utils import translation
+
+from core.parsers import loads
+from core.renderers import JSONRenderer
+from recipe.serializers import IngredientSerializer, RecipeDetailSerializer, \
+    RecipeSerializer, TagSerializer
+from user.serializers import UserSerializer
+
+SERIALIZERS = (RecipeSerializer, RecipeDetailSerializer, TagSerializer,
+               IngredientSerializer, UserSerializer)
+
+
+def warm_up():
+    """Load what the first requests would otherwise load lazily.
+
+    Run in the server's master process after the app is preloaded, so
+    every worker forked from it starts warm and shares the memory. Nothing
+    here touches the database or starts threads, which don't survive a
+    fork.
+    """
+    for model in apps.get_models():
+        model._meta.get_fields()
+    get_resolver().reverse_dict
+    translation.activate(settings.LANGUAGE_CODE)
+    for serializer_class in SERIALIZERS:
+        serializer_class().fields
+    loads(JSONRenderer().render({'id': 1, 'title': 'Warm up'}))
@@ -0,0 +1,75 @@
+"""gunicorn settings for serving the app in production.
+
+gunicorn reads this file when run from this directory. Settings come from
+the environment:
+
+GUNICORN_WORKERS processes, by default two per CPU plus one, each running
+GUNICORN_THREADS threads. Every thread keeps its own database connection
+open, see DB_CONN_MAX_AGE in app/settings.py, so the database or pooler has
+to allow workers * threads connections per container.
+
+GUNICORN_WORKER_CLASS gthread serves app/wsgi.py; a uvicorn worker class
+such as uvicorn.workers.UvicornWorker serves app/asgi.py instead, if
+uvicorn is installed.
+
+On SIGTERM workers stop accepting connections and get GUNICORN_GRACEFUL_TIMEOUT
+seconds to finish the requests and image derivatives they have started.
+"""
+import gc
+import multiprocessing
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get(
+    'GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1
+))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+wsgi_app = ('app.asgi:application' if worker_class.startswith('uvicorn')
+            else 'app.wsgi:application')
+
+# The app is imported and warmed up once in the master process and shared
+# by the workers forked from it, see when_ready.
+preload_app = True
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+# Restart workers after this many requests, with jitter so they don't all
+# restart at once. 0 never restarts them.
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 0))
+max_requests_jitter = max_requests // 10
+# Worker heartbeats are written here, in memory rather than on the
+# container's overlay filesystem, which can stall them.
+worker_tmp_dir = '/dev/shm' if os.path.isdir('/dev/shm') else None
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG') or None
+
+
+def when_ready(server):
+    """Warm up the preloaded app before the workers are forked.
+
+    Freezing the garbage collector afterwards moves everything loaded so
+    far out of its reach, so collections in the workers don't write to
+    the shared pages and copy them.
+    """
+    from core.warmup import warm_up
+
+    warm_up()
+    gc.collect()
+    gc.freeze()
+    server.log.info('App warmed up')
+
+
+def pre_fork(server, worker):
+    """Don't let workers inherit database connections of the master."""
+    from django.db import connections
+
+    connections.close_all()
+
+
+def worker_exit(server, worker):
+    """Finish generating scheduled image derivatives before exiting."""
+    from django.db import connections
+    from recipe.images import shutdown_executor
+
+    shutdown_executor()
+    connections.close_all()
@@ -0,0 +1,204 @@
+from django.db import transaction
+from django.utils import timezone
+
+from rest_framework import status
+from rest_framework.exceptions import ValidationError
+
+from core.models import Tag, Ingredient, Recipe
+from recipe.search import update_search_vectors
+from recipe.serializers import RecipeBulkItemSerializer
+from recipe.signals import RECIPES, TAGS, INGREDIENTS, bump, \
+    deferred_bumps
+
+RELATIONS = (('tags', Tag), ('ingredients', Ingredient))
+COLLECTIONS = {'tags': TAGS, 'ingredients': INGREDIENTS}
+NAME_RELATIONS = (('tags', 'tag_names', Tag),
+                  ('ingredients', 'ingredient_names', Ingredient))
+NON_MODEL_FIELDS = ('id', 'tags', 'ingredients', 'tag_names',
+                    'ingredient_names')
+
+
+def _error(index, errors, code=status.HTTP_400_BAD_REQUEST):
+    """Return the result entry for an item that failed."""
+    return {'index': index, 'status': code, 'errors': errors}
+
+
+def validate_items(user, items, partial):
+    """Validate items, checking their related IDs in one query each.
+
+    Nothing is written, names are resolved by resolve_names() once the items
+    to write are known. Returns the validated data of the valid items keyed
+    by their index and the error results of the rest.
+    """
+    valid, results = {}, {}
+    # One serializer validates every item, as a ListSerializer's child
+    # does, so its fields are only built once.
+    serializer = RecipeBulkItemSerializer(partial=partial)
+    for index, item in enumerate(items):
+        try:
+            valid[index] = serializer.run_validation(item)
+        except ValidationError as exc:
+            results[index] = _error(index, exc.detail)
+
+    for field, model in RELATIONS:
+        requested = {
+            pk for data in valid.values() for pk in data.get(field, ())
+        }
+        owned = set(model.objects.filter(
+            user=user, id__in=requested
+        ).values_list('id', flat=True))
+        for index, data in list(valid.items()):
+            missing = sorted(set(data.get(field, ())) - owned)
+            if missing:
+                del valid[index]
+                results[index] = _error(index, {field: [
+                    f'Invalid pk "{pk}" - object does not exist.'
+                    for pk in missing
+                ]})
+
+    return valid, results
+
+
+def resolve_names(user, items):
+    """Add the objects named in the data of items to their relations.
+
+    Names are looked up with one query per relation, creating missing ones,
+    so call this only for the items being written.
+    """
+    for field, names_field, model in NAME_RELATIONS:
+        requested = {
+            name for data in items for name in data.get(names_field, ())
+        }
+        if not requested:
+            continue
+        ids = {obj.name: obj.id for obj in
+               model.objects.get_or_create_by_names(user, requested)}
+        for data in items:
+            if names_field in data:
+                data[field] = list(data.get(field, ())) + [
+                    ids[name] for name in data[names_field]
+                ]
+
+
+def _set_relations(user, recipes):
+    """Replace the tags and ingredients of (recipe, data) pairs in bulk."""
+    for field, model in RELATIONS:
+        through = getattr(Recipe, field).through
+        target = f'{model._meta.model_name}_id'
+        changed = {recipe.id: set(data[field])
+                   for recipe, data in recipes if field in data}
+        if not changed:
+            continue
+        through.objects.filter(recipe_id__in=changed).delete()
+        through.objects.bulk_create(
+            through(recipe_id=recipe_id, **{target: pk})
+            for recipe_id, ids in changed.items() for pk in ids
+        )
+        bump(user.id, COLLECTIONS[field])
+
+
+def _sorted(results):
+    """Return result entries ordered by item index."""
+    return [results[index] for index in sorted(results)]
+
+
+def bulk_create(user, items):
+    """Create the valid recipes in items, returning per item results."""
+    valid, results = validate_items(user, items, partial=False)
+    recipes = []
+    for index, data in valid.items():
+        fields = {key: value for key, value in data.items()
+                  if key not in NON_MODEL_FIELDS}
+        recipes.append((index, Recipe(user=user, **fields), data))
+
+    with transaction.atomic():
+        resolve_names(user, [data for _i, _r, data in recipes])
+        Recipe.objects.bulk_create(recipe for _i, recipe, _d in recipes)
+        _set_relations(user, [(recipe, data) for _i, recipe, data in recipes])
+        if recipes:
+            update_search_vectors(Recipe.objects.filter(
+                pk__in=[recipe.id for _i, recipe, _d in recipes]
+            ))
+            bump(user.id, RECIPES)
+
+    for index, recipe, _data in recipes:
+        results[index] = {
+            'index': index, 'status': status.HTTP_201_CREATED, 'id': recipe.id
+        }
+
+    return _sorted(results)
+
+
+def bulk_update(user, items):
+    """Update the recipes identified in items, returning per item results."""
+    valid, results = validate_items(user, items, partial=True)
+    for index, data in list(valid.items()):
+        if 'id' not in data:
+            del valid[index]
+            results[index] = _error(index, {'id': ['This field is required.']})
+
+    existing = Recipe.objects.filter(
+        user=user, id__in=[data['id'] for data in valid.values()]
+    ).in_bulk()
+    updated, fields = [], {'updated_at'}
+    now = timezone.now()
+    for index, data in valid.items():
+        recipe = existing.get(data['id'])
+        if recipe is None:
+            results[index] = _error(
+                index, {'id': ['Not found.']}, status.HTTP_404_NOT_FOUND
+            )
+            continue
+        for key, value in data.items():
+            if key not in NON_MODEL_FIELDS:
+                setattr(recipe, key, value)
+                fields.add(key)
+        recipe.updated_at = now
+        updated.append((recipe, data))
+        results[index] = {
+            'index': index, 'status': status.HTTP_200_OK, 'id': recipe.id
+        }
+
+    with transaction.atomic():
+        if updated:
+            Recipe.objects.bulk_update(
+                list({recipe.id: recipe for recipe, _d in updated}.values()),
+                sorted(fields)
+            )
+            resolve_names(user, [data for _r, data in updated])
+            _set_relations(user, updated)
+            update_search_vectors(Recipe.objects.filter(
+                pk__in=[recipe.id for recipe, _d in updated]
+            ))
+            bump(user.id, RECIPES)
+
+    return _sorted(results)
+
+
+def bulk_delete(user, items):
+    """Delete the recipes with the given IDs, returning per item results."""
+    ids, results = {}, {}
+    for index, item in enumerate(items):
+        if isinstance(item, int) and not isinstance(item, bool):
+            ids[index] = item
+        else:
+            results[index] = _error(index, ['A valid integer is required.'])
+
+    existing = set(Recipe.objects.filter(
+        user=user, id__in=ids.values()
+    ).values_list('id', flat=True))
+    if existing:
+        with deferred_bumps():
+            Recipe.objects.filter(id__in=existing).delete()
+
+    for index, pk in ids.items():
+        if pk in existing:
+            results[index] = {
+                'index': index, 'status': status.HTTP_204_NO_CONTENT, 'id': pk
+            }
+        else:
+            results[index] = _error(
+                index, ['Not found.'], status.HTTP_404_NOT_FOUND
+            )
+
+    return _sorted(results)
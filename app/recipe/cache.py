@@ -0,0 +1,74 @@
+import hashlib
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import caches
+
+from core.models import CollectionVersion
+
+
+class ResponseCache:
+    """Per-user cache of list response data.
+
+    Keys include the version of the collection being listed, so any change
+    to it, from any process, makes the old entries unreachable. This keeps
+    the default per-process local memory backend correct; a shared backend
+    only adds hits across workers.
+    """
+
+    def __init__(self, alias, timeout):
+        self.alias = alias
+        self.timeout = timeout
+        self._counts = Counter()
+        self._lock = threading.Lock()
+
+    @property
+    def backend(self):
+        """Return the Django cache entries are stored in."""
+        return caches[self.alias]
+
+    def key(self, request, view_name, collection):
+        """Return the cache key of a list request."""
+        version = CollectionVersion.objects.get_version(
+            request.user.pk, collection
+        ).version
+        variant = hashlib.md5(
+            request.build_absolute_uri().encode()
+        ).hexdigest()
+        return f'response:{view_name}:{request.user.pk}:{version}:{variant}'
+
+    def get(self, key, view_name):
+        """Return the cached data for key, or None, counting hits."""
+        data = self.backend.get(key)
+        kind = 'misses' if data is None else 'hits'
+        with self._lock:
+            self._counts[view_name, kind] += 1
+
+        return data
+
+    def set(self, key, data):
+        """Cache response data under key."""
+        self.backend.set(key, data, self.timeout)
+
+    def stats(self):
+        """Return hit and miss counts of this process by view."""
+        with self._lock:
+            counts = dict(self._counts)
+        stats = {}
+        for (view_name, kind), count in counts.items():
+            stats.setdefault(view_name, {'hits': 0, 'misses': 0})
+            stats[view_name][kind] = count
+
+        return stats
+
+    def reset_stats(self):
+        """Zero the hit and miss counts."""
+        with self._lock:
+            self._counts.clear()
+
+
+response_cache = ResponseCache(
+    alias=getattr(settings, 'RESPONSE_CACHE_ALIAS', 'default'),
+    timeout=getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 300),
+)
@@ -0,0 +1,58 @@
+import hashlib
+
+from core.models import CollectionVersion, Recipe
+from recipe.signals import RECIPES
+
+
+def _variant(request):
+    """Return a digest of what the response depends on besides the data."""
+    variant = f'{request.accepted_media_type}|{request.get_full_path()}'
+    return hashlib.md5(variant.encode()).hexdigest()[:16]
+
+
+def _recipes_version(request):
+    """Return the user's recipe collection version, once per request."""
+    if not hasattr(request, '_recipes_version'):
+        request._recipes_version = CollectionVersion.objects.get_version(
+            request.user.pk, RECIPES
+        )
+
+    return request._recipes_version
+
+
+def _recipe_updated_at(request, pk):
+    """Return when the user's recipe pk last changed, once per request."""
+    if not hasattr(request, '_recipe_updated_at'):
+        try:
+            request._recipe_updated_at = Recipe.objects.filter(
+                pk=pk, user=request.user
+            ).values_list('updated_at', flat=True).first()
+        except (TypeError, ValueError):
+            request._recipe_updated_at = None
+
+    return request._recipe_updated_at
+
+
+def recipe_list_etag(request, *args, **kwargs):
+    """Return the ETag of the user's recipe list."""
+    version = _recipes_version(request)
+    return f'{request.user.pk}-{version.version}-{_variant(request)}'
+
+
+def recipe_list_last_modified(request, *args, **kwargs):
+    """Return when the user's recipe list last changed."""
+    return _recipes_version(request).updated_at
+
+
+def recipe_detail_etag(request, pk=None, *args, **kwargs):
+    """Return the ETag of a recipe, or None if the user doesn't own it."""
+    updated_at = _recipe_updated_at(request, pk)
+    if updated_at is None:
+        return None
+
+    return f'{pk}-{updated_at.timestamp()}-{_variant(request)}'
+
+
+def recipe_detail_last_modified(request, pk=None, *args, **kwargs):
+    """Return when a recipe last changed."""
+    return _recipe_updated_at(request, pk)
@@ -0,0 +1,168 @@
+import csv
+import io
+import re
+
+from django.db import connections
+
+from core.models import Tag, Ingredient, Recipe
+from core.renderers import JSONRenderer
+from recipe.serializers import RecipeSerializer
+
+CHUNK_SIZE = 2000
+RECIPE_FIELDS = ('id', 'title', 'time_minutes', 'price', 'link')
+NAME_RELATIONS = (('tags', 'tag_names'), ('ingredients', 'ingredient_names'))
+# Separates tag and ingredient names within a CSV column, see join_names.
+CSV_NAME_SEPARATOR = ';'
+CSV_NAME_RE = re.compile(
+    r'(?:\\.|[^\\%s])+' % re.escape(CSV_NAME_SEPARATOR), re.DOTALL
+)
+
+
+def join_names(names):
+    """Join names into a CSV cell.
+
+    Separators and backslashes within names are escaped by a backslash,
+    so split_names() returns the names as they were.
+    """
+    return CSV_NAME_SEPARATOR.join(
+        name.replace('\\', '\\\\').replace(
+            CSV_NAME_SEPARATOR, '\\' + CSV_NAME_SEPARATOR
+        )
+        for name in names
+    )
+
+
+def split_names(cell):
+    """Return the names joined into a CSV cell by join_names()."""
+    return [re.sub(r'\\(.)', r'\1', name, flags=re.DOTALL)
+            for name in CSV_NAME_RE.findall(cell)]
+
+
+def batched(iterable, size):
+    """Yield lists of up to size items from iterable."""
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _rows(queryset, fields, chunk_size):
+    """Yield batches of rows of queryset, read from a server-side cursor.
+
+    Rows are fetched chunk_size at a time, on PostgreSQL from a named
+    cursor, so memory use doesn't grow with the number of rows. Without
+    server-side cursors the whole result would be fetched at once, so
+    rows are read a page at a time instead.
+    """
+    settings_dict = connections[queryset.db].settings_dict
+    if settings_dict.get('DISABLE_SERVER_SIDE_CURSORS'):
+        return _pages(queryset, fields, chunk_size)
+
+    return batched(
+        queryset.values_list(*fields).iterator(chunk_size=chunk_size),
+        chunk_size,
+    )
+
+
+def _pages(queryset, fields, chunk_size):
+    """Yield pages of rows of queryset ordered by ID, a query per page.
+
+    fields must start with id.
+    """
+    page = queryset
+    while True:
+        rows = list(page.values_list(*fields)[:chunk_size])
+        if rows:
+            yield rows
+        if len(rows) < chunk_size:
+            return
+        page = queryset.filter(id__gt=rows[-1][0])
+
+
+def _names(recipe_ids):
+    """Return the tag and ingredient names of each recipe by relation."""
+    names = {}
+    for field, names_field in NAME_RELATIONS:
+        m2m_field = Recipe._meta.get_field(field)
+        target = m2m_field.m2m_reverse_field_name()
+        links = m2m_field.remote_field.through.objects.filter(
+            recipe_id__in=recipe_ids
+        ).order_by(f'{target}_id')
+        names[names_field] = by_recipe = {pk: [] for pk in recipe_ids}
+        for recipe_id, name in links.values_list(
+                'recipe_id', f'{target}__name'):
+            by_recipe[recipe_id].append(name)
+
+    return names
+
+
+def recipe_batches(user, chunk_size=CHUNK_SIZE):
+    """Yield the user's recipes in batches of chunk_size dicts.
+
+    Tags and ingredients are listed by name, as the API accepts them in
+    tag_names and ingredient_names.
+    """
+    price = RecipeSerializer().fields['price'].to_representation
+    recipes = Recipe.objects.filter(user=user).order_by('id')
+    for rows in _rows(recipes, RECIPE_FIELDS, chunk_size):
+        names = _names([row[0] for row in rows])
+        batch = []
+        for row in rows:
+            recipe = dict(zip(RECIPE_FIELDS, row))
+            recipe['price'] = price(recipe['price'])
+            for names_field, by_recipe in names.items():
+                recipe[names_field] = by_recipe[recipe['id']]
+            batch.append(recipe)
+        yield batch
+
+
+def export_ndjson(user, chunk_size=CHUNK_SIZE):
+    """Yield the user's tags, ingredients and recipes as NDJSON.
+
+    Every line is an object with a type of tag, ingredient or recipe.
+    Tags and ingredients come first, so that unused ones are kept too.
+    Each yielded chunk holds up to chunk_size lines.
+    """
+    render = JSONRenderer().render
+    for type_, model in (('tag', Tag), ('ingredient', Ingredient)):
+        queryset = model.objects.filter(user=user).order_by('id')
+        for rows in _rows(queryset, ('id', 'name'), chunk_size):
+            yield b''.join(
+                render({'type': type_, 'id': pk, 'name': name}) + b'\n'
+                for pk, name in rows
+            )
+
+    for batch in recipe_batches(user, chunk_size):
+        yield b''.join(
+            render({'type': 'recipe', **recipe}) + b'\n' for recipe in batch
+        )
+
+
+def export_csv(user, chunk_size=CHUNK_SIZE):
+    """Yield the user's recipes as CSV with a header row.
+
+    Tag and ingredient names are joined by join_names(). Each
+    yielded chunk holds up to chunk_size rows.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    columns = RECIPE_FIELDS + tuple(field for _, field in NAME_RELATIONS)
+    writer.writerow(columns)
+
+    for batch in recipe_batches(user, chunk_size):
+        for recipe in batch:
+            writer.writerow([
+                join_names(recipe[column])
+                if isinstance(recipe[column], list) else recipe[column]
+                for column in columns
+            ])
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue().encode()
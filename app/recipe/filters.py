@@ -0,0 +1,27 @@
+from django.db.models import Count, Exists, OuterRef
+
+MATCH_ANY = 'any'
+MATCH_ALL = 'all'
+MATCH_MODES = (MATCH_ANY, MATCH_ALL)
+
+
+def filter_related(queryset, field, ids, mode=MATCH_ANY):
+    """Filter queryset to objects linked through an M2M field to ids.
+
+    Matching goes through the M2M table in a subquery rather than a join,
+    so every object is returned once however many of the ids it has.
+    """
+    m2m_field = queryset.model._meta.get_field(field)
+    through = m2m_field.remote_field.through
+    source = m2m_field.m2m_field_name()
+    target = m2m_field.m2m_reverse_field_name()
+    ids = set(ids)
+    links = through.objects.filter(**{f'{target}__in': ids})
+
+    if mode == MATCH_ALL:
+        matching = links.values(source).annotate(
+            matched=Count(target)
+        ).filter(matched=len(ids)).values(source)
+        return queryset.filter(pk__in=matching)
+
+    return queryset.filter(Exists(links.filter(**{source: OuterRef('pk')})))
@@ -0,0 +1,207 @@
+import io
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image, ImageOps, features
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from django.db.models.signals import pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from core.models import Recipe
+from recipe.signals import RECIPES, bump
+
+logger = logging.getLogger(__name__)
+
+DERIVATIVE_DIR = 'uploads/recipe/derivatives/'
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def derivative_formats():
+    """Return (format, extension, save options) of each derivative format."""
+    formats = [('JPEG', 'jpg', {'quality': 82, 'optimize': True,
+                                'progressive': True})]
+    if features.check('webp'):
+        formats.insert(0, ('WEBP', 'webp', {'quality': 80, 'method': 4}))
+
+    return formats
+
+
+def derivative_widths():
+    """Return the widths to resize recipe images to, smallest first."""
+    return sorted(settings.IMAGE_DERIVATIVE_WIDTHS)
+
+
+def _resize(image, width):
+    """Return image scaled down to width, keeping its aspect ratio."""
+    if image.width <= width:
+        return image
+    height = max(1, round(image.height * width / image.width))
+
+    return image.resize((width, height), Image.LANCZOS)
+
+
+def generate_derivatives(recipe_id, image_name, stale=None):
+    """Write resized copies of a recipe image and record them on the recipe.
+
+    Widths larger than the original are skipped, except that the smallest
+    one is always written so there is a thumbnail. Files in stale, the
+    derivatives of a previous image, are removed once the new ones are
+    recorded.
+    """
+    widths = derivative_widths()
+    stem = os.path.splitext(os.path.basename(image_name))[0]
+    derivatives, written = {}, []
+
+    storage = Recipe._meta.get_field('image').storage
+    try:
+        with storage.open(image_name) as file, Image.open(file) as image:
+            # Let JPEG decode straight at a reduced scale when it can.
+            image.draft('RGB', (widths[-1], widths[-1]))
+            image = ImageOps.exif_transpose(image).convert('RGB')
+            for width in reversed(widths):
+                if width > image.width and width != widths[0]:
+                    continue
+                image = _resize(image, width)
+                for fmt, ext, options in derivative_formats():
+                    buffer = io.BytesIO()
+                    image.save(buffer, fmt, **options)
+                    name = default_storage.save(
+                        f'{DERIVATIVE_DIR}{stem}-{width}.{ext}',
+                        ContentFile(buffer.getvalue())
+                    )
+                    written.append(name)
+                    derivatives.setdefault(str(width), {})[ext] = name
+    except Exception:
+        delete_derivatives(written)
+        raise
+
+    recipes = Recipe.objects.filter(pk=recipe_id, image=image_name)
+    recipe = recipes.values('user_id').first()
+    if recipe is None or not recipes.update(
+            image_derivatives=derivatives, updated_at=timezone.now()):
+        # The image was replaced or removed while we were working.
+        stale = written
+    else:
+        bump(recipe['user_id'], RECIPES)
+
+    delete_derivatives(stale or ())
+
+    return derivatives
+
+
+def derivative_names(derivatives):
+    """Return the stored names of a recipe's image_derivatives."""
+    return [name for formats in derivatives.values()
+            for name in formats.values()]
+
+
+def delete_derivatives(names):
+    """Delete the stored derivatives named."""
+    for name in names:
+        default_storage.delete(name)
+
+
+def _get_executor():
+    """Return the worker pool, starting it on first use."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.IMAGE_WORKERS,
+                thread_name_prefix='recipe-images',
+            )
+
+    return _executor
+
+
+def shutdown_executor():
+    """Wait for scheduled derivatives to be generated and stop the pool."""
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=True)
+
+
+def _run(recipe_id, image_name, stale):
+    """Generate derivatives, logging any failure.
+
+    The stale derivatives are deleted even so, as the recipe no longer
+    refers to them.
+    """
+    try:
+        generate_derivatives(recipe_id, image_name, stale)
+    except Exception:
+        logger.exception('Generating derivatives of %s failed', image_name)
+        delete_derivatives(stale)
+
+
+def _run_in_worker(recipe_id, image_name, stale):
+    """Generate derivatives in a worker thread, closing its connections."""
+    try:
+        _run(recipe_id, image_name, stale)
+    finally:
+        connections.close_all()
+
+
+def schedule_derivatives(recipe, stale=None):
+    """Generate derivatives of the recipe's image once the upload commits.
+
+    They are generated by a pool of IMAGE_WORKERS threads so the upload
+    request isn't held up, or inline after commit if IMAGE_WORKERS is 0.
+    If the image was cleared, the stale derivatives are only deleted.
+    """
+    recipe_id, image_name = recipe.id, recipe.image.name
+    stale = derivative_names(stale or {})
+
+    if not image_name:
+        transaction.on_commit(lambda: delete_derivatives(stale))
+    elif not settings.IMAGE_WORKERS:
+        transaction.on_commit(lambda: _run(recipe_id, image_name, stale))
+    else:
+        transaction.on_commit(lambda: _get_executor().submit(
+            _run_in_worker, recipe_id, image_name, stale
+        ))
+
+
+@receiver(pre_delete, sender=Recipe)
+def recipe_derivatives_deleted(sender, instance, **kwargs):
+    """Delete the derivatives of a deleted recipe once the delete commits."""
+    names = derivative_names(instance.image_derivatives)
+    if names:
+        transaction.on_commit(lambda: delete_derivatives(names))
+
+
+def derivative_urls(derivatives, request=None):
+    """Return the URLs of a recipe's derivatives by width and format.
+
+    derivatives is the recipe's image_derivatives.
+    """
+    urls = {}
+    for width, formats in derivatives.items():
+        urls[width] = {}
+        for ext, name in formats.items():
+            url = default_storage.url(name)
+            urls[width][ext] = (
+                request.build_absolute_uri(url) if request else url
+            )
+
+    return urls
+
+
+def thumbnail_urls(derivatives, request=None):
+    """Return the URLs of the smallest derivative by format, or None."""
+    urls = derivative_urls(derivatives, request)
+    if not urls:
+        return None
+
+    return urls[min(urls, key=int)]
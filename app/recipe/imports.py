@@ -0,0 +1,186 @@
+import codecs
+import csv
+import io
+import time
+
+from django.db import connections, transaction
+
+from core.models import Tag, Ingredient, Recipe
+from core.parsers import loads
+from recipe.bulk import NON_MODEL_FIELDS, RELATIONS, COLLECTIONS, \
+    resolve_names, validate_items
+from recipe.exports import NAME_RELATIONS, batched, split_names
+from recipe.search import update_search_vectors
+from recipe.signals import RECIPES, bump
+
+BATCH_SIZE = 1000
+# Fields of recipe records that are imported, others such as the ID of
+# the recipe it was exported from are ignored.
+IMPORT_FIELDS = ('title', 'time_minutes', 'price', 'link', 'tag_names',
+                 'ingredient_names')
+NAME_TYPES = {'tag': Tag, 'ingredient': Ingredient}
+# Errors listed in the summary, later ones are only counted.
+MAX_ERRORS = 100
+
+
+def read_ndjson(stream):
+    """Yield (line number, record, error) of each line of NDJSON.
+
+    stream is a binary file-like object read a line at a time. Records
+    are objects with a type of recipe, tag or ingredient, recipe if it's
+    missing, as exported by recipe.exports.export_ndjson.
+    """
+    for line_number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            record = loads(line)
+        except ValueError as exc:
+            yield line_number, None, [f'Invalid JSON: {exc}']
+            continue
+        if isinstance(record, dict):
+            yield line_number, record, None
+        else:
+            yield line_number, None, ['Expected an object.']
+
+
+def read_csv(stream):
+    """Yield (line number, record, error) of each recipe row of CSV.
+
+    The first row names the columns, as exported by
+    recipe.exports.export_csv.
+    """
+    reader = csv.DictReader(codecs.iterdecode(stream, 'utf-8-sig'))
+    try:
+        for row in reader:
+            record = {key: value for key, value in row.items()
+                      if key is not None}
+            for _field, names_field in NAME_RELATIONS:
+                if names_field in record:
+                    record[names_field] = split_names(
+                        record[names_field] or ''
+                    )
+            yield reader.line_num, record, None
+    except (csv.Error, UnicodeDecodeError) as exc:
+        yield reader.line_num, None, [f'Invalid CSV: {exc}']
+
+
+def _insert_links(through, target, links):
+    """Insert (recipe ID, target ID) rows into an M2M table.
+
+    PostgreSQL loads them with COPY, other databases with bulk_create.
+    """
+    connection = connections[through.objects.db]
+    if connection.vendor != 'postgresql':
+        through.objects.bulk_create(
+            through(recipe_id=recipe_id, **{target: pk})
+            for recipe_id, pk in links
+        )
+        return
+
+    quote = connection.ops.quote_name
+    data = io.StringIO(''.join(f'{recipe_id}\t{pk}\n'
+                               for recipe_id, pk in links))
+    with connection.cursor() as cursor:
+        cursor.copy_expert(
+            f'COPY {quote(through._meta.db_table)} '
+            f'({quote("recipe_id")}, {quote(target)}) FROM STDIN',
+            data,
+        )
+
+
+def _import_batch(user, batch):
+    """Import a batch of records in one transaction.
+
+    Tags and ingredients are resolved by name for the whole batch at once,
+    creating missing ones. Returns the number of recipes created and the
+    errors of the records that weren't imported.
+    """
+    names = {model: set() for model in NAME_TYPES.values()}
+    items, lines, errors = [], [], []
+    for line, record, error in batch:
+        if error is not None:
+            errors.append({'line': line, 'errors': error})
+            continue
+        type_ = record.get('type', 'recipe')
+        if type_ == 'recipe':
+            items.append({key: record[key] for key in IMPORT_FIELDS
+                          if key in record})
+            lines.append(line)
+        elif type_ in NAME_TYPES:
+            name = record.get('name')
+            if isinstance(name, str) and 0 < len(name) <= 255:
+                names[NAME_TYPES[type_]].add(name)
+            else:
+                errors.append({'line': line, 'errors': {'name': [
+                    'A name of 1 to 255 characters is required.'
+                ]}})
+        else:
+            errors.append({'line': line, 'errors': {'type': [
+                f'Must be one of: recipe, {", ".join(NAME_TYPES)}.'
+            ]}})
+
+    with transaction.atomic():
+        for model, model_names in names.items():
+            if model_names:
+                model.objects.get_or_create_by_names(user, model_names)
+
+        valid, results = validate_items(user, items, partial=False)
+        resolve_names(user, list(valid.values()))
+        errors += [{'line': lines[index], 'errors': result['errors']}
+                   for index, result in results.items()]
+        recipes = [
+            Recipe(user=user, **{key: value for key, value in data.items()
+                                 if key not in NON_MODEL_FIELDS})
+            for data in valid.values()
+        ]
+        if recipes:
+            Recipe.objects.bulk_create(recipes)
+            for field, model in RELATIONS:
+                links = [
+                    (recipe.id, pk)
+                    for recipe, data in zip(recipes, valid.values())
+                    for pk in dict.fromkeys(data.get(field, ()))
+                ]
+                if links:
+                    _insert_links(
+                        getattr(Recipe, field).through,
+                        f'{model._meta.model_name}_id',
+                        links,
+                    )
+                    bump(user.id, COLLECTIONS[field])
+            update_search_vectors(Recipe.objects.filter(
+                pk__in=[recipe.id for recipe in recipes]
+            ))
+            bump(user.id, RECIPES)
+
+    return len(recipes), sorted(errors, key=lambda error: error['line'])
+
+
+def import_recipes(user, records, batch_size=BATCH_SIZE, progress=None):
+    """Import records read by read_ndjson or read_csv for user.
+
+    Records are imported batch_size at a time, each batch in its own
+    transaction, so input of any size is never held in memory whole and
+    batches imported before a failure are kept. progress is called with
+    the summary so far after every batch. Returns a summary of the
+    number of recipes created, the number of records that failed, the
+    first MAX_ERRORS errors by line, the time taken and the throughput.
+    """
+    summary = {'created': 0, 'failed': 0, 'errors': [], 'seconds': 0.0,
+               'recipes_per_second': 0.0}
+    start = time.monotonic()
+    for batch in batched(records, batch_size):
+        created, errors = _import_batch(user, batch)
+        summary['created'] += created
+        summary['failed'] += len(errors)
+        summary['errors'] += errors[:MAX_ERRORS - len(summary['errors'])]
+        summary['seconds'] = round(time.monotonic() - start, 3)
+        if summary['seconds']:
+            summary['recipes_per_second'] = round(
+                summary['created'] / summary['seconds'], 1
+            )
+        if progress is not None:
+            progress(summary)
+
+    return summary
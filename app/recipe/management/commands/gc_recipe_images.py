@@ -0,0 +1,128 @@
+import os
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.models import RECIPE_IMAGE_DIR, ImageBlob, Recipe
+from recipe.exports import batched
+from recipe.images import DERIVATIVE_DIR
+
+
+class Command(BaseCommand):
+    """Django command to delete recipe images nothing refers to.
+
+    Images whose reference count dropped to zero are deleted first, then
+    the image directory is swept for files without a reference count,
+    left behind by failed uploads. Both passes work in batches so memory
+    use doesn't grow with the number of files. Files touched within the
+    grace period are kept, as an upload may be about to refer to them.
+    """
+    help = 'Delete recipe image files no recipe refers to.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace', type=int, default=3600,
+            help='Keep files used within this many seconds.',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Number of files to check per query.',
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Report what would be deleted without deleting it.',
+        )
+
+    def handle(self, *args, **options):
+        self.storage = Recipe._meta.get_field('image').storage
+        self.grace = options['grace']
+        self.cutoff = time.time() - self.grace
+        self.batch_size = options['batch_size']
+        self.dry_run = options['dry_run']
+
+        unreferenced = self.collect_unreferenced()
+        orphaned = self.collect_orphaned()
+
+        verb = 'Would delete' if self.dry_run else 'Deleted'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {unreferenced} unreferenced and {orphaned} orphaned '
+            f'recipe images.'
+        ))
+
+    def delete_file(self, name):
+        """Delete a stored file unless it was used within the grace period."""
+        try:
+            if os.stat(self.storage.path(name)).st_mtime >= self.cutoff:
+                return False
+        except FileNotFoundError:
+            return False
+        if not self.dry_run:
+            self.storage.delete(name)
+
+        return True
+
+    def collect_unreferenced(self):
+        """Delete the images whose reference count has dropped to zero."""
+        unused = ImageBlob.objects.filter(
+            ref_count=0,
+            updated_at__lt=timezone.now() - timedelta(seconds=self.grace),
+        ).order_by('pk')
+        deleted, last_pk = 0, 0
+
+        while True:
+            blobs = dict(unused.filter(pk__gt=last_pk).values_list(
+                'pk', 'name'
+            )[:self.batch_size])
+            if not blobs:
+                return deleted
+            last_pk = max(blobs)
+            if self.dry_run:
+                kept = set()
+            else:
+                # Rows referenced again since they were read survive this.
+                ImageBlob.objects.filter(pk__in=blobs, ref_count=0).delete()
+                kept = set(ImageBlob.objects.filter(
+                    pk__in=blobs
+                ).values_list('pk', flat=True))
+            deleted += sum(
+                self.delete_file(name)
+                for pk, name in blobs.items() if pk not in kept
+            )
+
+    def walk(self, directory):
+        """Yield the name of every stored file under directory."""
+        directories = [directory]
+        while directories:
+            path = directories.pop()
+            if not os.path.isdir(self.storage.path(path)):
+                continue
+            with os.scandir(self.storage.path(path)) as entries:
+                for entry in entries:
+                    name = os.path.join(path, entry.name)
+                    if entry.is_dir():
+                        # Derivatives are deleted with their recipes and
+                        # as they're replaced.
+                        if name != DERIVATIVE_DIR.rstrip('/'):
+                            directories.append(name)
+                    else:
+                        yield name
+
+    def collect_orphaned(self):
+        """Delete image files that have no reference count at all.
+
+        Every image a recipe refers to has one, counted as recipes are
+        saved and for earlier images by migration 0012, so the unindexed
+        image column of recipes isn't searched.
+        """
+        deleted = 0
+        for names in batched(self.walk(RECIPE_IMAGE_DIR), self.batch_size):
+            known = set(ImageBlob.objects.filter(
+                name__in=names
+            ).values_list('name', flat=True))
+            deleted += sum(
+                self.delete_file(name) for name in names if name not in known
+            )
+
+        return deleted
@@ -0,0 +1,67 @@
+import sys
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from recipe.imports import BATCH_SIZE, import_recipes, read_csv, \
+    read_ndjson
+
+READERS = {'ndjson': read_ndjson, 'csv': read_csv}
+
+
+class Command(BaseCommand):
+    """Django command to import a recipe book exported as NDJSON or CSV.
+
+    The file is read a batch at a time, so files of any size can be
+    imported. Progress is reported after every batch.
+    """
+    help = 'Import recipes, tags and ingredients for a user.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('email', help='Email of the user to import for.')
+        parser.add_argument('path', help='File to import, - for stdin.')
+        parser.add_argument(
+            '--format', choices=READERS,
+            help='Format of the file, by default from its extension.',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=BATCH_SIZE,
+            help='Number of records to import per transaction.',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            user = get_user_model().objects.get(email=options['email'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f'No user with email {options["email"]}.')
+
+        path = options['path']
+        file_format = options['format'] or (
+            'csv' if path.lower().endswith('.csv') else 'ndjson'
+        )
+        if path == '-':
+            summary = self.run(user, sys.stdin.buffer, file_format, options)
+        else:
+            with open(path, 'rb') as stream:
+                summary = self.run(user, stream, file_format, options)
+
+        for error in summary['errors']:
+            self.stderr.write(f'Line {error["line"]}: {error["errors"]}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {summary["created"]} recipes in '
+            f'{summary["seconds"]:.1f} s, {summary["failed"]} records failed.'
+        ))
+
+    def run(self, user, stream, file_format, options):
+        """Import the records in stream, reporting progress."""
+        return import_recipes(
+            user, READERS[file_format](stream),
+            batch_size=options['batch_size'], progress=self.report,
+        )
+
+    def report(self, summary):
+        """Write the progress of the import so far."""
+        self.stdout.write(
+            f'{summary["created"]} recipes imported, {summary["failed"]} '
+            f'failed, {summary["recipes_per_second"]:.0f} recipes/s'
+        )
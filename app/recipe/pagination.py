@@ -0,0 +1,129 @@
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+def reverse_ordering(ordering):
+    """Return ordering with the direction of every field flipped."""
+    return tuple(
+        field[1:] if field.startswith('-') else f'-{field}'
+        for field in ordering
+    )
+
+
+class BaseCursorPagination(CursorPagination):
+    """Keyset pagination, so deep pages cost the same as the first one.
+
+    DRF cursors hold the value of the first ordering field only and skip
+    ties with an offset, which grows with the number of ties. Here the
+    cursor holds the value of every ordering field, so an ordering ending
+    in a unique field gives each row its own position and pages are found
+    by comparing keys alone.
+    """
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        reverse = self.cursor is not None and self.cursor.reverse
+        position = self.cursor and self.cursor.position
+
+        ordering = reverse_ordering(self.ordering) if reverse \
+            else self.ordering
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            try:
+                queryset = queryset.filter(self.following(ordering, position))
+            except (TypeError, ValueError, ValidationError):
+                raise NotFound(self.invalid_cursor_message)
+
+        # An extra row tells whether there is a page after this one.
+        results = list(queryset[:self.page_size + 1])
+        self.page = results[:self.page_size]
+        following = self._get_position_from_instance(
+            results[-1], self.ordering
+        ) if len(results) > len(self.page) else None
+
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.next_position = position is not None, position
+            self.has_previous = following is not None
+            self.previous_position = following
+        else:
+            self.has_next, self.next_position = following is not None, \
+                following
+            self.has_previous = position is not None
+            self.previous_position = position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+
+        return self.page
+
+    def following(self, ordering, position):
+        """Return a filter of the rows after position in ordering.
+
+        The first field is also bounded on its own, so an index on the
+        ordering fields is scanned from the position on.
+        """
+        try:
+            values = json.loads(position)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(ordering):
+            raise NotFound(self.invalid_cursor_message)
+
+        fields = [field.lstrip('-') for field in ordering]
+        lookups = ['lt' if field.startswith('-') else 'gt'
+                   for field in ordering]
+        after = Q()
+        for i, (field, lookup, value) in enumerate(
+                zip(fields, lookups, values)):
+            ties = dict(zip(fields[:i], values[:i]))
+            after |= Q(**ties, **{f'{field}__{lookup}': value})
+
+        return Q(**{f'{fields[0]}__{lookups[0]}e': values[0]}) & after
+
+    def _get_position_from_instance(self, instance, ordering):
+        """Return the values of every ordering field of a row or object."""
+        values = []
+        for field in ordering:
+            name = field.lstrip('-')
+            value = instance[name] if isinstance(instance, dict) \
+                else getattr(instance, name)
+            values.append(str(value))
+
+        return json.dumps(values, separators=(',', ':'))
+
+
+class RecipeAttrPagination(BaseCursorPagination):
+    """Paginate tags and ingredients by name, newest first on ties."""
+    ordering = ('-name', '-id')
+
+
+class RecipePagination(BaseCursorPagination):
+    """Paginate recipes, newest first unless the view orders them."""
+    ordering = ('-id',)
+
+    def get_ordering(self, request, queryset, view):
+        return view.get_ordering() or self.ordering
+
+
+class RecipeSearchPagination(PageNumberPagination):
+    """Paginate search results by page number, as they are ranked.
+
+    Ranks are computed per query, so there is no stable key for a cursor.
+    """
+    page_size = BaseCursorPagination.page_size
+    page_size_query_param = 'page_size'
+    max_page_size = BaseCursorPagination.max_page_size
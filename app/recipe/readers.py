@@ -0,0 +1,92 @@
+from core.models import Recipe
+from recipe.images import derivative_urls, thumbnail_urls
+from recipe.serializers import RecipeDetailSerializer, RecipeSerializer
+
+
+def readable_fields(serializer_class):
+    """Return the names of the fields serializer_class represents."""
+    return serializer_class().readable_fields()
+
+
+class RecipeReader:
+    """Read-only representation of recipes built from values() rows.
+
+    The output is identical to RecipeSerializer's, or with detail to
+    RecipeDetailSerializer's, without creating model instances or running
+    serializer fields for every recipe. Related objects are fetched with
+    one query per relation straight from the M2M tables and listed by ID,
+    as the serializers' prefetches list them. The fields, the columns they
+    are read from and the relations are those of the serializer.
+    """
+
+    def __init__(self, fields=None, detail=False, request=None):
+        serializer_class = RecipeDetailSerializer if detail \
+            else RecipeSerializer
+        self.serializer = serializer_class(context={'fields': fields})
+        self.fields = self.serializer.readable_fields()
+        self.detail = detail
+        self.request = request
+        self._price = serializer_class().fields['price'].to_representation
+
+    def columns(self):
+        """Return the columns the fields are read from."""
+        return self.serializer.columns()
+
+    def values(self, queryset, extra=()):
+        """Return queryset as rows of the columns the fields need."""
+        return queryset.prefetch_related(None).values(
+            *self.columns(), *extra
+        )
+
+    def _related(self, field, ids):
+        """Return the related IDs, or objects with detail, of each recipe."""
+        m2m_field = Recipe._meta.get_field(field)
+        through = m2m_field.remote_field.through
+        source = f'{m2m_field.m2m_field_name()}_id'
+        target = m2m_field.m2m_reverse_field_name()
+        links = through.objects.filter(
+            **{f'{source}__in': ids}
+        ).order_by(f'{target}_id')
+
+        related = {pk: [] for pk in ids}
+        if self.detail:
+            for recipe_id, pk, name in links.values_list(
+                    source, f'{target}_id', f'{target}__name'):
+                related[recipe_id].append({'id': pk, 'name': name})
+        else:
+            for recipe_id, pk in links.values_list(source, f'{target}_id'):
+                related[recipe_id].append(pk)
+
+        return related
+
+    def _getters(self, rows):
+        """Return (name, function of a row) pairs building each field."""
+        request = self.request
+        related = {
+            field: self._related(field, [row['id'] for row in rows])
+            for field in self.serializer.relations()
+        }
+        special = {
+            'price': lambda row: self._price(row['price']),
+            'thumbnail': lambda row: thumbnail_urls(
+                row['image_derivatives'], request
+            ),
+            'images': lambda row: derivative_urls(
+                row['image_derivatives'], request
+            ),
+        }
+        for field, by_recipe in related.items():
+            special[field] = lambda row, by_recipe=by_recipe: \
+                by_recipe[row['id']]
+
+        return [
+            (name, special.get(name, lambda row, name=name: row[name]))
+            for name in self.fields
+        ]
+
+    def represent(self, rows):
+        """Return the representations of rows, in order."""
+        rows = list(rows)
+        getters = self._getters(rows)
+
+        return [{name: get(row) for name, get in getters} for row in rows]
@@ -0,0 +1,87 @@
+from django.conf import settings
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchQuery, SearchRank, \
+    SearchVector, TrigramWordSimilarity
+from django.db import connections, transaction
+from django.db.models import Exists, F, FloatField, OuterRef, Q, Subquery, \
+    Value
+
+from core.models import Ingredient, Recipe, Tag
+
+
+def _names(model):
+    """Return a subquery of the names of a recipe's tags or ingredients."""
+    return Subquery(
+        model.objects.filter(recipe=OuterRef('pk')).values('recipe').annotate(
+            names=StringAgg('name', ' ')
+        ).values('names')
+    )
+
+
+def search_vector():
+    """Return the expression Recipe.search_vector is computed with.
+
+    Titles weigh more than tag and ingredient names.
+    """
+    config = settings.RECIPE_SEARCH_CONFIG
+
+    return (
+        SearchVector('title', config=config, weight='A')
+        + SearchVector(_names(Tag), config=config, weight='B')
+        + SearchVector(_names(Ingredient), config=config, weight='B')
+    )
+
+
+def is_postgresql(queryset):
+    """Return whether queryset runs on PostgreSQL."""
+    return connections[queryset.db].vendor == 'postgresql'
+
+
+def update_search_vectors(recipes):
+    """Recompute the search vectors of recipes in one query."""
+    if is_postgresql(recipes):
+        recipes.update(search_vector=search_vector())
+
+
+def schedule_search_update(recipe_ids):
+    """Update search vectors once the current transaction commits.
+
+    Tags and ingredients may be about to be unlinked or deleted, so the
+    vectors are computed from what is committed.
+    """
+    recipe_ids = list(recipe_ids)
+    if recipe_ids:
+        transaction.on_commit(lambda: update_search_vectors(
+            Recipe.objects.filter(pk__in=recipe_ids)
+        ))
+
+
+def search_recipes(queryset, terms):
+    """Filter recipes to those matching terms, annotated with a rank.
+
+    On PostgreSQL recipes match on the full-text search vector, or on
+    title trigrams so that typos still find something, and are ranked by
+    both. Other databases match every word anywhere in the title, tag or
+    ingredient names, without ranking.
+    """
+    if not is_postgresql(queryset):
+        for word in terms.split():
+            queryset = queryset.filter(
+                Q(title__icontains=word)
+                | Exists(Tag.objects.filter(
+                    recipe=OuterRef('pk'), name__icontains=word
+                ))
+                | Exists(Ingredient.objects.filter(
+                    recipe=OuterRef('pk'), name__icontains=word
+                ))
+            )
+        return queryset.annotate(rank=Value(0.0, output_field=FloatField()))
+
+    query = SearchQuery(terms, config=settings.RECIPE_SEARCH_CONFIG)
+
+    return queryset.filter(
+        Q(search_vector=query) | Q(title__trigram_word_similar=terms)
+    ).annotate(
+        rank=SearchRank(F('search_vector'), query)
+        + TrigramWordSimilarity(terms, 'title')
+    )
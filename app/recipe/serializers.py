@@ -1,8 +1,38 @@
+from django.db.models import Manager, Prefetch, prefetch_related_objects
+
 from rest_framework import serializers
 from core.models import Tag, Ingredient, Recipe
+from recipe.fields import UserPrimaryKeyRelatedField
+from recipe.images import derivative_urls, thumbnail_urls
+
+# Related objects of recipes, listed by ID in their representations.
+RELATIONS = ('ingredients', 'tags')
+
+
+class BaseRecipeAttrSerializer(serializers.ModelSerializer):
+    """Base serializer for user owned recipe attributes."""
+
+    def duplicate_name_message(self):
+        """Return the error of a name the user already has."""
+        return (f'A {self.Meta.model._meta.verbose_name} with this name '
+                f'already exists.')
+
+    def validate_name(self, value):
+        """Check the user doesn't already have an object with this name.
+
+        The user is the one making the request in the context. Without one
+        only the unique (user, name) constraint checks the name, as it
+        does for names created concurrently, see BaseRecipeAttr.
+        """
+        request = self.context.get('request')
+        if request is not None and self.Meta.model.objects.filter(
+                user=request.user, name=value).exists():
+            raise serializers.ValidationError(self.duplicate_name_message())
 
+        return value
 
-class TagSerializer(serializers.ModelSerializer):
+
+class TagSerializer(BaseRecipeAttrSerializer):
     """Serializer for Tag objects."""
 
     class Meta:
@@ -11,7 +41,7 @@ class TagSerializer(serializers.ModelSerializer):
         read_only_fields = ('id',)
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(BaseRecipeAttrSerializer):
     """Serializer for Ingredient objects."""
 
     class Meta:
@@ -20,30 +50,196 @@ class IngredientSerializer(serializers.ModelSerializer):
         read_only_fields = ('id',)
 
 
-class RecipeSerializer(serializers.ModelSerializer):
-    """Serializer for Recipe objects."""
-    ingredients = serializers.PrimaryKeyRelatedField(
+class SparseFieldsMixin:
+    """Serializer representing only the fields listed in its context.
+
+    A 'fields' context of None keeps every field. Write only fields are
+    always kept.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        fieldset = self.context.get('fields')
+        if fieldset is not None:
+            for name, field in list(self.fields.items()):
+                if name not in fieldset and not field.write_only:
+                    del self.fields[name]
+
+
+class RecipeListSerializer(serializers.ListSerializer):
+    """Serializer for many recipes, fetching related objects for all."""
+
+    def to_representation(self, data):
+        recipes = list(data.all() if isinstance(data, Manager) else data)
+        prefetch_related_objects(recipes, *self.child.related_prefetches())
+
+        return super().to_representation(recipes)
+
+
+class RecipeSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    """Serializer for Recipe objects.
+
+    Related objects are listed by ID, as recipe.readers lists them, so
+    create and update responses match the list and detail ones.
+    """
+    ingredients = UserPrimaryKeyRelatedField(
         many=True,
-        queryset=Ingredient.objects.all()
+        queryset=Ingredient.objects.all(),
+        required=False
     )
 
-    tags = serializers.PrimaryKeyRelatedField(
+    tags = UserPrimaryKeyRelatedField(
         many=True,
-        queryset=Tag.objects.all()
+        queryset=Tag.objects.all(),
+        required=False
+    )
+
+    ingredient_names = serializers.ListField(
+        child=serializers.CharField(max_length=255),
+        write_only=True,
+        required=False
     )
 
+    tag_names = serializers.ListField(
+        child=serializers.CharField(max_length=255),
+        write_only=True,
+        required=False
+    )
+
+    thumbnail = serializers.SerializerMethodField()
+    # Columns read by fields that aren't named after one. Related objects
+    # are read from their own tables, only their related_columns.
+    field_columns = {
+        'ingredients': (),
+        'tags': (),
+        'thumbnail': ('image_derivatives',),
+    }
+    related_columns = ('id',)
+
     class Meta:
         model = Recipe
         fields = ('id', 'title', 'ingredients', 'tags', 'time_minutes',
-                  'price', 'link'
+                  'price', 'link', 'thumbnail', 'ingredient_names',
+                  'tag_names'
                   )
         read_only_fields = ('id',)
+        list_serializer_class = RecipeListSerializer
+
+    def readable_fields(self):
+        """Return the names of the fields represented."""
+        return [name for name, field in self.fields.items()
+                if not field.write_only]
+
+    def columns(self):
+        """Return the recipe columns the represented fields are read from."""
+        columns = {'id'}
+        for name in self.readable_fields():
+            columns.update(self.field_columns.get(name, (name,)))
+
+        return columns
+
+    def relations(self):
+        """Return the names of the represented related objects."""
+        return [name for name in self.readable_fields()
+                if name in RELATIONS]
+
+    def related_prefetches(self):
+        """Return prefetches of the represented related objects by ID."""
+        prefetches = []
+        for name in self.relations():
+            model = Recipe._meta.get_field(name).related_model
+            prefetches.append(Prefetch(name, queryset=model.objects.only(
+                *self.related_columns
+            ).order_by('id')))
+
+        return prefetches
+
+    def to_representation(self, instance):
+        """Represent a recipe, fetching its related objects unless done."""
+        prefetch_related_objects([instance], *self.related_prefetches())
+
+        return super().to_representation(instance)
+
+    def get_thumbnail(self, obj):
+        """Return the URLs of the smallest image derivative by format."""
+        return thumbnail_urls(
+            obj.image_derivatives, self.context.get('request')
+        )
+
+    def _resolve_names(self, validated_data, user):
+        """Add the objects referenced by name to the ones referenced by ID.
+
+        Missing names are created for the user.
+        """
+        for field, names_field, model in (
+            ('ingredients', 'ingredient_names', Ingredient),
+            ('tags', 'tag_names', Tag),
+        ):
+            names = validated_data.pop(names_field, None)
+            if names is not None:
+                validated_data[field] = list(
+                    validated_data.get(field, [])
+                ) + model.objects.get_or_create_by_names(user, names)
+
+    def create(self, validated_data):
+        """Create a recipe, creating tags and ingredients named in it."""
+        self._resolve_names(validated_data, validated_data['user'])
+        return super().create(validated_data)
+
+    def update(self, instance, validated_data):
+        """Update a recipe, creating tags and ingredients named in it."""
+        self._resolve_names(validated_data, instance.user)
+        return super().update(instance, validated_data)
 
 
 class RecipeDetailSerializer(RecipeSerializer):
     """Serializer a recipe detail."""
     ingredients = IngredientSerializer(many=True, read_only=True)
     tags = TagSerializer(many=True, read_only=True)
+    images = serializers.SerializerMethodField()
+    field_columns = dict(RecipeSerializer.field_columns,
+                         images=('image_derivatives',))
+    related_columns = ('id', 'name')
+
+    class Meta(RecipeSerializer.Meta):
+        fields = RecipeSerializer.Meta.fields + ('images',)
+
+    def get_images(self, obj):
+        """Return the URLs of every image derivative by width and format."""
+        return derivative_urls(
+            obj.image_derivatives, self.context.get('request')
+        )
+
+
+class RecipeBulkItemSerializer(serializers.ModelSerializer):
+    """Serializer validating a single recipe of a bulk request.
+
+    Related IDs are only type checked here, they are resolved for the whole
+    request at once by recipe.bulk.
+    """
+    id = serializers.IntegerField(required=False)
+    ingredients = serializers.ListField(
+        child=serializers.IntegerField(),
+        required=False
+    )
+    tags = serializers.ListField(
+        child=serializers.IntegerField(),
+        required=False
+    )
+    ingredient_names = serializers.ListField(
+        child=serializers.CharField(max_length=255),
+        required=False
+    )
+    tag_names = serializers.ListField(
+        child=serializers.CharField(max_length=255),
+        required=False
+    )
+
+    class Meta:
+        model = Recipe
+        fields = ('id', 'title', 'ingredients', 'tags', 'time_minutes',
+                  'price', 'link', 'ingredient_names', 'tag_names'
+                  )
 
 
 class RecipeImageSerializer(serializers.ModelSerializer):
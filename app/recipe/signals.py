@@ -0,0 +1,148 @@
+import threading
+from contextlib import contextmanager
+
+from django.db.models.signals import m2m_changed, post_delete, post_save, \
+    pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from core.models import INGREDIENTS, RECIPES, TAGS, CollectionVersion, \
+    ImageBlob, Tag, Ingredient, Recipe
+from recipe.search import schedule_search_update, update_search_vectors
+
+_deferred = threading.local()
+
+
+@contextmanager
+def deferred_bumps():
+    """Bump each changed collection once when the block exits.
+
+    Bulk operations use this so that per object signals don't cost a
+    query each.
+    """
+    if getattr(_deferred, 'bumps', None) is not None:
+        yield
+        return
+
+    _deferred.bumps = set()
+    try:
+        yield
+        bumps, _deferred.bumps = _deferred.bumps, None
+        for user_id, collection in bumps:
+            CollectionVersion.objects.bump(user_id, collection)
+    finally:
+        _deferred.bumps = None
+
+
+def bump(user_id, collection):
+    """Bump a user's collection, or defer it inside deferred_bumps()."""
+    if getattr(_deferred, 'bumps', None) is not None:
+        _deferred.bumps.add((user_id, collection))
+    else:
+        CollectionVersion.objects.bump(user_id, collection)
+
+
+def touch_recipes(recipes):
+    """Mark recipes changed and bump the recipe collections they're in.
+
+    Their search vectors are updated too, as tag or ingredient names are
+    part of them.
+    """
+    rows = list(recipes.values_list('pk', 'user_id'))
+    Recipe.objects.filter(pk__in=[pk for pk, _user_id in rows]).update(
+        updated_at=timezone.now()
+    )
+    schedule_search_update(pk for pk, _user_id in rows)
+    for user_id in {user_id for _pk, user_id in rows}:
+        bump(user_id, RECIPES)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def recipe_changed(sender, instance, **kwargs):
+    """Bump the owner's recipe collection when a recipe changes."""
+    bump(instance.user_id, RECIPES)
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(sender, instance, **kwargs):
+    """Bump tags and ingredients, which may no longer be assigned."""
+    bump(instance.user_id, TAGS)
+    bump(instance.user_id, INGREDIENTS)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_title_changed(sender, instance, update_fields, **kwargs):
+    """Update the search vector of a saved recipe."""
+    if update_fields is None or 'title' in update_fields:
+        update_search_vectors(Recipe.objects.filter(pk=instance.pk))
+
+
+@receiver(pre_save, sender=Recipe)
+def recipe_image_loading(sender, instance, **kwargs):
+    """Look up the stored image of recipes loaded without it."""
+    if instance._loaded_image is None and \
+            'image' not in instance.get_deferred_fields():
+        instance._loaded_image = Recipe.objects.filter(
+            pk=instance.pk
+        ).values_list('image', flat=True).first()
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_image_changed(sender, instance, **kwargs):
+    """Move the recipe's reference from its old image to its new one."""
+    if 'image' in instance.get_deferred_fields():
+        return
+
+    old, new = instance._loaded_image or '', instance.image.name or ''
+    if old != new:
+        if new:
+            ImageBlob.objects.acquire(new)
+        if old:
+            ImageBlob.objects.release(old)
+        instance._loaded_image = new
+
+
+@receiver(pre_delete, sender=Recipe)
+def recipe_image_released(sender, instance, **kwargs):
+    """Drop the reference of a deleted recipe to its image."""
+    if instance.image:
+        ImageBlob.objects.release(instance.image.name)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def recipe_relations_changed(sender, instance, action, reverse, pk_set,
+                             **kwargs):
+    """Mark recipes changed when their tags or ingredients change.
+
+    Which tags or ingredients are assigned changes too.
+    """
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+
+    field = TAGS if sender is Recipe.tags.through else INGREDIENTS
+    if not reverse:
+        recipes = Recipe.objects.filter(pk=instance.pk)
+    elif pk_set:
+        recipes = Recipe.objects.filter(pk__in=pk_set)
+    else:
+        recipes = Recipe.objects.filter(**{field: instance})
+    touch_recipes(recipes)
+    bump(instance.user_id, field)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(pre_delete, sender=Tag)
+def tag_changed(sender, instance, **kwargs):
+    """Mark recipes changed when one of their tags is renamed or deleted."""
+    touch_recipes(Recipe.objects.filter(tags=instance))
+    bump(instance.user_id, TAGS)
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(pre_delete, sender=Ingredient)
+def ingredient_changed(sender, instance, **kwargs):
+    """Mark recipes changed when one of their ingredients changes."""
+    touch_recipes(Recipe.objects.filter(ingredients=instance))
+    bump(instance.user_id, INGREDIENTS)
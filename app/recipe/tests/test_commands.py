@@ -0,0 +1,162 @@
+import io
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from core.models import ImageBlob, Recipe
+
+
+class GcRecipeImagesTests(TestCase):
+    """Test garbage collecting recipe images."""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.addCleanup(shutil.rmtree, self.media_root)
+
+        self.user = get_user_model().objects.create_user(
+            'test@test.com',
+            'nakki'
+        )
+        self.storage = Recipe._meta.get_field('image').storage
+
+    def sample_recipe(self, content):
+        """Create a recipe with content as its image."""
+        recipe = Recipe.objects.create(
+            user=self.user, title='Sample recipe', time_minutes=10, price=5
+        )
+        recipe.image.save('photo.jpg', ContentFile(content))
+
+        return recipe
+
+    def age(self, name, seconds=7200):
+        """Make a stored file and its reference count look old."""
+        then = time.time() - seconds
+        os.utime(self.storage.path(name), (then, then))
+        ImageBlob.objects.filter(name=name).update(
+            updated_at=timezone.now() - timedelta(seconds=seconds)
+        )
+
+    def store(self, name, content=b'image'):
+        """Write a file straight to the image directory and age it."""
+        path = self.storage.path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as file:
+            file.write(content)
+        self.age(name)
+
+    def gc(self, *args):
+        """Run the command, returning its output."""
+        out = io.StringIO()
+        call_command('gc_recipe_images', *args, stdout=out)
+
+        return out.getvalue()
+
+    def test_unreferenced_image_deleted(self):
+        """Test replaced images are deleted and used ones kept."""
+        recipe = self.sample_recipe(b'old')
+        old_name = recipe.image.name
+        recipe.image.save('photo.jpg', ContentFile(b'new'))
+        self.age(old_name)
+        self.age(recipe.image.name)
+
+        out = self.gc()
+
+        self.assertIn('Deleted 1 unreferenced and 0 orphaned', out)
+        self.assertFalse(self.storage.exists(old_name))
+        self.assertFalse(ImageBlob.objects.filter(name=old_name).exists())
+        self.assertTrue(self.storage.exists(recipe.image.name))
+
+    def test_recently_released_image_kept(self):
+        """Test images released within the grace period are kept."""
+        recipe = self.sample_recipe(b'old')
+        old_name = recipe.image.name
+        recipe.image.save('photo.jpg', ContentFile(b'new'))
+
+        self.gc()
+
+        self.assertTrue(self.storage.exists(old_name))
+        self.assertEqual(ImageBlob.objects.get(name=old_name).ref_count, 0)
+
+    def test_reuploaded_image_kept(self):
+        """Test a file uploaded again after being released is kept."""
+        recipe = self.sample_recipe(b'old')
+        old_name = recipe.image.name
+        recipe.image.save('photo.jpg', ContentFile(b'new'))
+        self.age(old_name)
+        # Uploading the same content touches the stored file.
+        self.storage.save('uploads/recipe/again.jpg', ContentFile(b'old'))
+
+        self.gc()
+
+        self.assertTrue(self.storage.exists(old_name))
+
+    def test_orphaned_files_deleted(self):
+        """Test files without a reference count are swept."""
+        recipe = self.sample_recipe(b'image')
+        self.age(recipe.image.name)
+        self.store('uploads/recipe/ab/orphan.jpg')
+        self.store('uploads/recipe/derivatives/thumb-160.jpg')
+
+        with self.assertNumQueries(1 + 1):
+            out = self.gc()
+
+        self.assertIn('Deleted 0 unreferenced and 1 orphaned', out)
+        self.assertFalse(self.storage.exists('uploads/recipe/ab/orphan.jpg'))
+        self.assertTrue(self.storage.exists(recipe.image.name))
+        self.assertTrue(
+            self.storage.exists('uploads/recipe/derivatives/thumb-160.jpg')
+        )
+
+    def test_dry_run(self):
+        """Test a dry run reports files without deleting them."""
+        self.store('uploads/recipe/ab/orphan.jpg')
+
+        out = self.gc('--dry-run')
+
+        self.assertIn('Would delete 0 unreferenced and 1 orphaned', out)
+        self.assertTrue(self.storage.exists('uploads/recipe/ab/orphan.jpg'))
+
+    def test_batches(self):
+        """Test every batch is collected, a batch of queries at a time."""
+        for i in range(5):
+            self.store(f'uploads/recipe/ab/orphan{i}.jpg')
+            ImageBlob.objects.create(name=f'uploads/recipe/cd/{i}.jpg')
+            self.store(f'uploads/recipe/cd/{i}.jpg')
+            self.age(f'uploads/recipe/cd/{i}.jpg')
+
+        with self.assertNumQueries(3 * 3 + 1 + 3):
+            out = self.gc('--batch-size', '2')
+
+        self.assertIn('Deleted 5 unreferenced and 5 orphaned', out)
+        self.assertFalse(os.listdir(self.storage.path('uploads/recipe/ab')))
+
+    def test_peak_memory_bounded(self):
+        """Benchmark peak memory of sweeping many files in batches."""
+        directory = self.storage.path('uploads/recipe/ab')
+        os.makedirs(directory)
+        then = time.time() - 7200
+        for i in range(5000):
+            path = os.path.join(directory, f'{i:060d}.jpg')
+            open(path, 'wb').close()
+            os.utime(path, (then, then))
+
+        tracemalloc.start()
+        out = self.gc('--batch-size', '100')
+        _current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        self.assertIn('5000 orphaned', out)
+        # A batch of names, not all of them, is held at once.
+        self.assertLess(peak, 256 * 2 ** 10)
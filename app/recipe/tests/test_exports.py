@@ -0,0 +1,182 @@
+import csv
+import io
+import json
+import tracemalloc
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient
+
+from recipe.exports import export_ndjson
+
+EXPORT_URL = reverse('recipe:recipe-export')
+
+
+def sample_recipes(user, count):
+    """Create count recipes sharing a tag, numbered from 0."""
+    tag = Tag.objects.create(user=user, name='Shared')
+    recipes = Recipe.objects.bulk_create(
+        Recipe(user=user, title=f'Recipe {i}', time_minutes=i, price=i % 100)
+        for i in range(count)
+    )
+    Recipe.tags.through.objects.bulk_create(
+        Recipe.tags.through(recipe=recipe, tag=tag) for recipe in recipes
+    )
+
+    return recipes
+
+
+class RecipeExportApiTests(TestCase):
+    """Test exporting a user's recipes."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@test.com',
+            'nakki'
+        )
+        self.client.force_authenticate(self.user)
+
+        self.recipe = Recipe.objects.create(
+            user=self.user, title='Kebab, "with" sauce', time_minutes=10,
+            price='5.50', link='https://example.com/kebab',
+        )
+        self.recipe.tags.add(
+            Tag.objects.create(user=self.user, name='Street food'),
+            Tag.objects.create(user=self.user, name='Meat'),
+        )
+        self.recipe.ingredients.add(
+            Ingredient.objects.create(user=self.user, name='Kebab')
+        )
+        Ingredient.objects.create(user=self.user, name='Unused')
+        other = get_user_model().objects.create_user('other@test.com', 'pw')
+        Recipe.objects.create(user=other, title='Secret', time_minutes=1,
+                              price=1)
+        Tag.objects.create(user=other, name='Secret')
+
+    def export(self, **params):
+        res = self.client.get(EXPORT_URL, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res.streaming)
+
+        return res, b''.join(res.streaming_content).decode()
+
+    def test_export_ndjson(self):
+        """Test tags, ingredients and recipes are exported line by line."""
+        res, content = self.export()
+
+        self.assertEqual(res['Content-Type'], 'application/x-ndjson')
+        self.assertEqual(res['Content-Disposition'],
+                         'attachment; filename="recipes.ndjson"')
+        lines = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual(
+            [(line['type'], line.get('name')) for line in lines[:4]],
+            [('tag', 'Street food'), ('tag', 'Meat'),
+             ('ingredient', 'Kebab'), ('ingredient', 'Unused')],
+        )
+        self.assertEqual(lines[4:], [{
+            'type': 'recipe',
+            'id': self.recipe.id,
+            'title': 'Kebab, "with" sauce',
+            'time_minutes': 10,
+            'price': '5.50',
+            'link': 'https://example.com/kebab',
+            'tag_names': ['Street food', 'Meat'],
+            'ingredient_names': ['Kebab'],
+        }])
+
+    def test_export_csv(self):
+        res, content = self.export(export_format='csv')
+
+        self.assertEqual(res['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertEqual(list(csv.reader(io.StringIO(content))), [
+            ['id', 'title', 'time_minutes', 'price', 'link', 'tag_names',
+             'ingredient_names'],
+            [str(self.recipe.id), 'Kebab, "with" sauce', '10', '5.50',
+             'https://example.com/kebab', 'Street food;Meat', 'Kebab'],
+        ])
+
+    def test_export_empty_csv(self):
+        Recipe.objects.filter(user=self.user).delete()
+
+        res, content = self.export(export_format='csv')
+
+        self.assertEqual(content.splitlines(), [
+            'id,title,time_minutes,price,link,tag_names,ingredient_names'
+        ])
+
+    def test_invalid_format(self):
+        res = self.client.get(EXPORT_URL, {'export_format': 'xml'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('export_format', res.data)
+
+
+class RecipeExportChunkTests(TestCase):
+    """Test exports are read and written a chunk at a time."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@test.com',
+            'nakki'
+        )
+
+    def test_chunks(self):
+        """Test each chunk of recipes runs the same queries."""
+        sample_recipes(self.user, 25)
+
+        chunks = export_ndjson(self.user, chunk_size=10)
+        self.assertEqual(next(chunks).count(b'\n'), 1)
+        self.assertEqual(next(chunks).count(b'\n'), 10)
+        for lines in (10, 5):
+            # Tag and ingredient names of the chunk's recipes.
+            with self.assertNumQueries(2):
+                self.assertEqual(next(chunks).count(b'\n'), lines)
+        with self.assertRaises(StopIteration):
+            next(chunks)
+
+    def test_chunks_without_server_side_cursors(self):
+        """Test rows are paged by ID when server-side cursors are off."""
+        sample_recipes(self.user, 20)
+        expected = list(export_ndjson(self.user, chunk_size=10))
+
+        with patch.dict(connection.settings_dict,
+                        {'DISABLE_SERVER_SIDE_CURSORS': True}):
+            chunks = export_ndjson(self.user, chunk_size=10)
+            self.assertEqual(next(chunks), expected[0])
+            self.assertEqual(next(chunks), expected[1])
+            # The page, tag and ingredient names of the chunk's recipes.
+            with self.assertNumQueries(3):
+                self.assertEqual(next(chunks), expected[2])
+            # The last, empty page.
+            with self.assertNumQueries(1):
+                with self.assertRaises(StopIteration):
+                    next(chunks)
+
+    def peak_memory(self, count):
+        """Return the peak memory exporting count recipes takes."""
+        Recipe.objects.filter(user=self.user).delete()
+        Tag.objects.filter(user=self.user).delete()
+        sample_recipes(self.user, count)
+
+        tracemalloc.start()
+        try:
+            for chunk in export_ndjson(self.user, chunk_size=100):
+                pass
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    def test_memory_constant(self):
+        """Test memory use doesn't grow with the number of recipes."""
+        small = self.peak_memory(500)
+        large = self.peak_memory(5000)
+
+        self.assertLess(large, small * 1.5)
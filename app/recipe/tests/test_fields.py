@@ -0,0 +1,84 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from rest_framework.test import APIRequestFactory
+
+from core.models import Tag
+
+from recipe.serializers import RecipeSerializer
+
+
+class UserPrimaryKeyRelatedFieldTests(TestCase):
+    """Test validating related IDs against the requesting user."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@test.com',
+            'nakki'
+        )
+        self.request = APIRequestFactory().post('/')
+        self.request.user = self.user
+
+    def serializer(self, tag_ids):
+        """Return a recipe serializer for a payload with tag_ids."""
+        return RecipeSerializer(data={
+            'title': 'Sample recipe',
+            'time_minutes': 10,
+            'price': '5.00',
+            'tags': tag_ids,
+        }, context={'request': self.request})
+
+    def sample_tags(self, count, user=None):
+        """Create count tags and return their IDs."""
+        return [tag.id for tag in Tag.objects.bulk_create(
+            Tag(user=user or self.user, name=f'Tag {index}')
+            for index in range(count)
+        )]
+
+    def test_valid_ids_resolved(self):
+        """Test submitted IDs are resolved to objects in order."""
+        tag_ids = self.sample_tags(3)[::-1]
+        serializer = self.serializer(tag_ids)
+
+        self.assertTrue(serializer.is_valid())
+        self.assertEqual(
+            [tag.id for tag in serializer.validated_data['tags']], tag_ids
+        )
+
+    def test_other_users_ids_rejected(self):
+        """Test objects of another user can't be referenced."""
+        other = get_user_model().objects.create_user('o@test.com', 'nakki')
+        tag_ids = self.sample_tags(1, user=other)
+
+        serializer = self.serializer(tag_ids)
+
+        self.assertFalse(serializer.is_valid())
+        self.assertIn('tags', serializer.errors)
+
+    def test_all_missing_ids_reported(self):
+        """Test every missing ID is reported in one go."""
+        tag_ids = self.sample_tags(1) + [0, -1, 0]
+
+        serializer = self.serializer(tag_ids)
+
+        self.assertFalse(serializer.is_valid())
+        self.assertEqual(len(serializer.errors['tags']), 2)
+        self.assertIn('"0"', serializer.errors['tags'][0])
+        self.assertIn('"-1"', serializer.errors['tags'][1])
+
+    def test_incorrect_type_rejected(self):
+        """Test non integer IDs are rejected without a query."""
+        serializer = self.serializer(['nakki'])
+
+        with self.assertNumQueries(0):
+            self.assertFalse(serializer.is_valid())
+
+    def test_validation_query_count_independent_of_size(self):
+        """Benchmark validation runs one query for any number of IDs."""
+        for count in (1, 10, 500):
+            tag_ids = self.sample_tags(count)
+            serializer = self.serializer(tag_ids)
+
+            with self.assertNumQueries(1):
+                self.assertTrue(serializer.is_valid())
+            Tag.objects.all().delete()
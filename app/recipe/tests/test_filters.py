@@ -0,0 +1,182 @@
+import re
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+
+from core.models import Recipe, Tag, Ingredient
+
+from recipe.filters import MATCH_ALL, MATCH_ANY, filter_related
+
+
+def sample_recipe(user, title='Sample recipe'):
+    """Create and return a sample recipe."""
+    return Recipe.objects.create(
+        user=user, title=title, time_minutes=10, price=5.00
+    )
+
+
+def plan_shape(queryset):
+    """Return the query plan of queryset without costs, row counts or ids."""
+    return re.sub(r'\d+(\.\d+)?', 'N', queryset.explain())
+
+
+class FilterRelatedTests(TestCase):
+    """Test filtering recipes by their tags and ingredients."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@test.com',
+            'nakki'
+        )
+        self.tag1 = Tag.objects.create(user=self.user, name='Vegan')
+        self.tag2 = Tag.objects.create(user=self.user, name='Dessert')
+        self.both = sample_recipe(self.user, 'Both')
+        self.both.tags.add(self.tag1, self.tag2)
+        self.first = sample_recipe(self.user, 'First')
+        self.first.tags.add(self.tag1)
+        self.neither = sample_recipe(self.user, 'Neither')
+
+    def test_match_any_returns_each_recipe_once(self):
+        """Test recipes matching several tags aren't duplicated."""
+        recipes = filter_related(
+            Recipe.objects.all(), 'tags', [self.tag1.id, self.tag2.id],
+            MATCH_ANY,
+        )
+
+        self.assertEqual(
+            sorted(recipe.id for recipe in recipes),
+            sorted([self.both.id, self.first.id]),
+        )
+
+    def test_match_all(self):
+        """Test only recipes having every tag are returned."""
+        recipes = filter_related(
+            Recipe.objects.all(), 'tags', [self.tag1.id, self.tag2.id],
+            MATCH_ALL,
+        )
+
+        self.assertEqual(list(recipes), [self.both])
+
+    def test_match_all_ignores_repeated_ids(self):
+        """Test repeating an id doesn't make match all impossible."""
+        recipes = filter_related(
+            Recipe.objects.all(), 'tags', [self.tag2.id, self.tag2.id],
+            MATCH_ALL,
+        )
+
+        self.assertEqual(list(recipes), [self.both])
+
+    def test_filter_ingredients(self):
+        """Test the same filter works over ingredients."""
+        ingredient = Ingredient.objects.create(user=self.user, name='Salt')
+        self.neither.ingredients.add(ingredient)
+
+        recipes = filter_related(
+            Recipe.objects.all(), 'ingredients', [ingredient.id], MATCH_ALL,
+        )
+
+        self.assertEqual(list(recipes), [self.neither])
+
+
+class FilterRelatedPlanTests(TestCase):
+    """Benchmark the filter query plans against growing M2M tables."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@test.com',
+            'nakki'
+        )
+        self.tags = Tag.objects.bulk_create(
+            Tag(user=self.user, name=f'Tag {i}') for i in range(10)
+        )
+
+    def grow(self, count):
+        """Add count recipes, each linked to every tag."""
+        recipes = Recipe.objects.bulk_create(
+            Recipe(user=self.user, title=f'Recipe {i}', time_minutes=1,
+                   price=1)
+            for i in range(count)
+        )
+        Recipe.tags.through.objects.bulk_create(
+            Recipe.tags.through(recipe_id=recipe.id, tag_id=tag.id)
+            for recipe in recipes for tag in self.tags
+        )
+
+    def assertFlatPlan(self, mode):
+        """Assert the plan for mode doesn't change as the tables grow."""
+        tag_ids = [tag.id for tag in self.tags[:3]]
+
+        def queryset():
+            return filter_related(
+                Recipe.objects.filter(user=self.user), 'tags', tag_ids, mode
+            )
+
+        self.grow(10)
+        small = plan_shape(queryset())
+        self.grow(500)
+        large = plan_shape(queryset())
+
+        self.assertEqual(small, large)
+        self.assertNotIn('DISTINCT', queryset().query.__str__())
+
+    def test_match_any_plan_flat(self):
+        """Test the EXISTS plan is the same for small and large tables."""
+        self.assertFlatPlan(MATCH_ANY)
+
+    def test_match_all_plan_flat(self):
+        """Test the grouped plan is the same for small and large tables."""
+        self.assertFlatPlan(MATCH_ALL)
+
+
+class RecipeRangePlanTests(TestCase):
+    """Test time and price filters and orderings are served by indexes."""
+
+    def setUp(self):
+        users = [
+            get_user_model().objects.create_user(f'test{i}@test.com', 'x')
+            for i in range(5)
+        ]
+        self.user = users[0]
+        Recipe.objects.bulk_create(
+            Recipe(user=user, title=f'Recipe {i}', time_minutes=i % 120,
+                   price=i % 100)
+            for user in users for i in range(400)
+        )
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE;')
+
+    def assertIndexPlan(self, queryset, index):
+        """Assert queryset is read through index, without a sort."""
+        plan = queryset.explain()
+
+        self.assertIn(index, plan)
+        self.assertNotRegex(
+            plan, r'(?m)Seq Scan on core_recipe|SCAN core_recipe$'
+        )
+        self.assertNotRegex(plan, r'(?m)^\W*Sort\b|TEMP B-TREE')
+
+    def test_max_time_plan(self):
+        """Test filtering and ordering by time scans the time index."""
+        self.assertIndexPlan(
+            Recipe.objects.filter(
+                user=self.user, time_minutes__lte=10
+            ).order_by('time_minutes', 'id'),
+            'core_recipe_user_time_idx',
+        )
+
+    def test_price_range_plan(self):
+        """Test a price range scans the price index."""
+        self.assertIndexPlan(
+            Recipe.objects.filter(
+                user=self.user, price__gte=10, price__lte=20
+            ).order_by('-price', '-id'),
+            'core_recipe_user_price_idx',
+        )
+
+    def test_ordering_plan(self):
+        """Test ordering every recipe by price needs no sort."""
+        self.assertIndexPlan(
+            Recipe.objects.filter(user=self.user).order_by('price', 'id'),
+            'core_recipe_user_price_idx',
+        )
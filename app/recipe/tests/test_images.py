@@ -0,0 +1,236 @@
+import io
+import os
+import shutil
+import tempfile
+import threading
+import time
+from unittest.mock import patch
+
+from PIL import Image
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core.models import Recipe
+
+from recipe import images
+from recipe.images import generate_derivatives
+
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+def sample_image(width=2000, height=1000, fmt='JPEG'):
+    """Return the bytes of a solid image of the given size."""
+    buffer = io.BytesIO()
+    Image.new('RGB', (width, height), 'orange').save(buffer, fmt)
+
+    return buffer.getvalue()
+
+
+@override_settings(IMAGE_WORKERS=0, IMAGE_DERIVATIVE_WIDTHS=(160, 480))
+class ImageDerivativeTests(TestCase):
+    """Test generating resized copies of recipe images."""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.addCleanup(shutil.rmtree, self.media_root)
+
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@test.com',
+            'nakki'
+        )
+        self.client.force_authenticate(self.user)
+        self.recipe = Recipe.objects.create(
+            user=self.user, title='Sample recipe', time_minutes=10, price=5
+        )
+
+    def save_image(self, content):
+        """Store content as the recipe's image."""
+        self.recipe.image.save('photo.jpg', ContentFile(content))
+
+    def test_derivatives_generated(self):
+        """Test every width is written in every format."""
+        self.save_image(sample_image())
+
+        derivatives = generate_derivatives(
+            self.recipe.id, self.recipe.image.name
+        )
+
+        self.assertEqual(set(derivatives), {'160', '480'})
+        for width, formats in derivatives.items():
+            self.assertIn('jpg', formats)
+            with default_storage.open(formats['jpg']) as file:
+                self.assertEqual(Image.open(file).width, int(width))
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_derivatives, derivatives)
+
+    def test_small_image_not_upscaled(self):
+        """Test a small image only gets a thumbnail at its own size."""
+        self.save_image(sample_image(100, 50))
+
+        derivatives = generate_derivatives(
+            self.recipe.id, self.recipe.image.name
+        )
+
+        self.assertEqual(list(derivatives), ['160'])
+        with default_storage.open(derivatives['160']['jpg']) as file:
+            self.assertEqual(Image.open(file).size, (100, 50))
+
+    def test_replaced_image_discards_derivatives(self):
+        """Test derivatives of an image replaced meanwhile are dropped."""
+        self.save_image(sample_image())
+        old_name = self.recipe.image.name
+        self.save_image(sample_image(1000, 500))
+
+        derivatives = generate_derivatives(self.recipe.id, old_name)
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_derivatives, {})
+        for formats in derivatives.values():
+            for name in formats.values():
+                self.assertFalse(default_storage.exists(name))
+
+    def test_upload_generates_derivatives_after_commit(self):
+        """Test uploading an image schedules its derivatives."""
+        url = reverse('recipe:recipe-upload-image', args=[self.recipe.id])
+        upload = ContentFile(sample_image(), name='photo.jpg')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            res = self.client.post(url, {'image': upload}, format='multipart')
+
+        self.assertEqual(res.status_code, 200)
+        res = self.client.get(RECIPES_URL)
+        thumbnail = res.data['results'][0]['thumbnail']
+        self.assertTrue(thumbnail['jpg'].endswith('-160.jpg'))
+
+    def test_reupload_removes_stale_derivatives(self):
+        """Test replacing an image removes the old derivatives."""
+        url = reverse('recipe:recipe-upload-image', args=[self.recipe.id])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(url, {
+                'image': ContentFile(sample_image(), name='photo.jpg')
+            }, format='multipart')
+        self.recipe.refresh_from_db()
+        old = self.recipe.image_derivatives['160']['jpg']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(url, {
+                'image': ContentFile(sample_image(), name='photo.jpg')
+            }, format='multipart')
+
+        self.assertFalse(os.path.exists(os.path.join(self.media_root, old)))
+
+    def test_inline_failure_logged(self):
+        """Test failing to generate derivatives inline doesn't fail upload."""
+        url = reverse('recipe:recipe-upload-image', args=[self.recipe.id])
+        upload = ContentFile(sample_image(), name='photo.jpg')
+
+        with patch('recipe.images.generate_derivatives',
+                   side_effect=OSError('Disk full')), \
+                self.assertLogs('recipe.images', 'ERROR'), \
+                self.captureOnCommitCallbacks(execute=True):
+            res = self.client.post(url, {'image': upload}, format='multipart')
+
+        self.assertEqual(res.status_code, 200)
+
+    def test_deleted_recipe_derivatives_removed(self):
+        """Test deleting a recipe removes its derivatives after commit."""
+        self.save_image(sample_image())
+        names = images.derivative_names(generate_derivatives(
+            self.recipe.id, self.recipe.image.name
+        ))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(
+                reverse('recipe:recipe-detail', args=[self.recipe.id])
+            )
+
+        for name in names:
+            self.assertFalse(default_storage.exists(name))
+
+    def test_cleared_image_derivatives_removed(self):
+        """Test clearing an image removes its derivatives."""
+        self.save_image(sample_image())
+        stale = generate_derivatives(self.recipe.id, self.recipe.image.name)
+        self.recipe.image = None
+        self.recipe.save()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            images.schedule_derivatives(self.recipe, stale)
+
+        for name in images.derivative_names(stale):
+            self.assertFalse(default_storage.exists(name))
+
+    def test_failed_generation_removes_derivatives(self):
+        """Test failing removes the stale derivatives and any written."""
+        self.save_image(sample_image())
+        stale = generate_derivatives(self.recipe.id, self.recipe.image.name)
+        self.save_image(sample_image(1000, 500))
+        save = default_storage.save
+        saved = []
+
+        def save_then_fail(name, content):
+            if saved:
+                raise OSError('Disk full')
+            saved.append(save(name, content))
+            return saved[-1]
+
+        with patch.object(default_storage, 'save', save_then_fail), \
+                self.assertLogs('recipe.images', 'ERROR'), \
+                self.captureOnCommitCallbacks(execute=True):
+            images.schedule_derivatives(self.recipe, stale)
+
+        for name in images.derivative_names(stale) + saved:
+            self.assertFalse(default_storage.exists(name))
+
+    @override_settings(IMAGE_WORKERS=1)
+    def test_upload_handed_to_worker_pool(self):
+        """Test derivatives are generated off the request with workers."""
+        url = reverse('recipe:recipe-upload-image', args=[self.recipe.id])
+        upload = ContentFile(sample_image(), name='photo.jpg')
+
+        with patch('recipe.images._get_executor') as get_executor:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post(url, {'image': upload}, format='multipart')
+
+        get_executor.return_value.submit.assert_called_once()
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_derivatives, {})
+
+    @override_settings(IMAGE_WORKERS=1)
+    def test_shutdown_waits_for_pool(self):
+        """Test shutting down lets scheduled derivatives finish."""
+        finished = threading.Event()
+
+        def generate():
+            time.sleep(0.05)
+            finished.set()
+
+        images._get_executor().submit(generate)
+        images.shutdown_executor()
+
+        self.assertTrue(finished.is_set())
+        self.assertIsNone(images._executor)
+
+    def test_detail_lists_all_derivatives(self):
+        """Test the recipe detail includes every derivative URL."""
+        self.save_image(sample_image())
+        generate_derivatives(self.recipe.id, self.recipe.image.name)
+
+        res = self.client.get(
+            reverse('recipe:recipe-detail', args=[self.recipe.id])
+        )
+
+        self.assertEqual(set(res.data['images']), {'160', '480'})
+        self.assertTrue(
+            res.data['images']['480']['jpg'].startswith('http://testserver/')
+        )
@@ -0,0 +1,252 @@
+import gc
+import json
+import os
+import tempfile
+import tracemalloc
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient
+
+from recipe.exports import export_csv, export_ndjson
+from recipe.imports import import_recipes, read_ndjson
+
+IMPORT_URL = reverse('recipe:recipe-import')
+
+
+def ndjson(*records):
+    """Return records as NDJSON bytes."""
+    return b''.join(json.dumps(record).encode() + b'\n' for record in records)
+
+
+def recipe_lines(count):
+    """Yield count NDJSON recipe lines sharing a few tags."""
+    for i in range(count):
+        yield json.dumps({
+            'title': f'Recipe {i}', 'time_minutes': i % 90,
+            'price': f'{i % 100}.50', 'tag_names': [f'Tag {i % 5}'],
+        }).encode() + b'\n'
+
+
+class RecipeImportApiTests(TestCase):
+    """Test importing recipes through the API."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@test.com',
+            'nakki'
+        )
+        self.client.force_authenticate(self.user)
+
+    def post(self, body, content_type='application/x-ndjson'):
+        return self.client.post(IMPORT_URL, body, content_type=content_type)
+
+    def sample_export(self, export):
+        """Return another user's recipe book exported by export."""
+        other = get_user_model().objects.create_user('other@test.com', 'pw')
+        recipe = Recipe.objects.create(
+            user=other, title='Kebab', time_minutes=10, price='5.50',
+            link='https://example.com/kebab',
+        )
+        recipe.tags.add(Tag.objects.create(user=other, name='Street food'))
+        recipe.ingredients.add(
+            Ingredient.objects.create(user=other, name='Meat'),
+            Ingredient.objects.create(user=other, name='Bread'),
+        )
+        Tag.objects.create(user=other, name='Unused')
+
+        return b''.join(export(other))
+
+    def assertImported(self):
+        recipe = Recipe.objects.get(user=self.user)
+        self.assertEqual(
+            (recipe.title, recipe.time_minutes, str(recipe.price),
+             recipe.link),
+            ('Kebab', 10, '5.50', 'https://example.com/kebab'),
+        )
+        self.assertEqual([tag.name for tag in recipe.tags.all()],
+                         ['Street food'])
+        self.assertEqual(
+            sorted(ingredient.name for ingredient in recipe.ingredients.all()),
+            ['Bread', 'Meat'],
+        )
+
+    def test_import_ndjson_export(self):
+        """Test an NDJSON export is imported, unused tags included."""
+        res = self.post(self.sample_export(export_ndjson))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['created'], 1)
+        self.assertEqual(res.data['failed'], 0)
+        self.assertImported()
+        self.assertTrue(
+            Tag.objects.filter(user=self.user, name='Unused').exists()
+        )
+
+    def test_import_csv_export(self):
+        res = self.post(self.sample_export(export_csv), 'text/csv')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['created'], 1)
+        self.assertImported()
+
+    def test_csv_names_with_separators(self):
+        """Test names holding the separator or backslashes round-trip."""
+        names = ['Salt; pepper', 'C:\\', 'Fish;\\;chips', 'Two\nlines']
+        other = get_user_model().objects.create_user('other@test.com', 'pw')
+        recipe = Recipe.objects.create(
+            user=other, title='Kebab', time_minutes=10, price='5.50'
+        )
+        recipe.tags.add(*(Tag.objects.create(user=other, name=name)
+                          for name in names))
+
+        self.post(b''.join(export_csv(other)), 'text/csv')
+
+        recipe = Recipe.objects.get(user=self.user)
+        self.assertEqual(sorted(tag.name for tag in recipe.tags.all()),
+                         sorted(names))
+
+    def test_existing_names_reused(self):
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+
+        self.post(ndjson(
+            {'title': 'Salad', 'time_minutes': 5, 'price': '3.00',
+             'tag_names': ['Vegan', 'Vegan']},
+        ))
+
+        recipe = Recipe.objects.get(user=self.user)
+        self.assertEqual(list(recipe.tags.all()), [tag])
+
+    def test_errors_reported_by_line(self):
+        """Test invalid records are reported and the rest imported."""
+        body = ndjson(
+            {'title': 'Valid', 'time_minutes': 5, 'price': '3.00'},
+            {'time_minutes': 5, 'price': '3.00'},
+            {'type': 'menu', 'name': 'Dinner'},
+        ) + b'{"title": \n' + ndjson([1, 2], {'type': 'tag'})
+
+        res = self.post(body)
+
+        self.assertEqual(res.data['created'], 1)
+        self.assertEqual(res.data['failed'], 5)
+        errors = res.data['errors']
+        self.assertEqual([error['line'] for error in errors], [2, 3, 4, 5, 6])
+        self.assertIn('title', errors[0]['errors'])
+        self.assertIn('type', errors[1]['errors'])
+        self.assertTrue(errors[2]['errors'][0].startswith('Invalid JSON'))
+        self.assertEqual(errors[3]['errors'], ['Expected an object.'])
+        self.assertIn('name', errors[4]['errors'])
+
+    @override_settings(RECIPE_IMPORT_MAX_BYTES=1000)
+    def test_body_too_large(self):
+        """Test bodies over the limit are refused without importing."""
+        body = b''.join(recipe_lines(100))
+
+        res = self.post(body)
+
+        self.assertEqual(res.status_code,
+                         status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        self.assertIn('import_recipes', res.data['detail'])
+        self.assertFalse(Recipe.objects.exists())
+
+        res = self.post(body[:1000])
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_unsupported_media_type(self):
+        res = self.post(b'{}', 'application/json')
+
+        self.assertEqual(res.status_code,
+                         status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+
+
+class RecipeImportBatchTests(TestCase):
+    """Test imports are read and written a batch at a time."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@test.com',
+            'nakki'
+        )
+
+    def test_progress_per_batch(self):
+        reports = []
+
+        summary = import_recipes(
+            self.user, read_ndjson(recipe_lines(25)), batch_size=10,
+            progress=lambda summary: reports.append(summary['created']),
+        )
+
+        self.assertEqual(reports, [10, 20, 25])
+        self.assertEqual(summary['created'], 25)
+        self.assertEqual(Recipe.objects.filter(user=self.user).count(), 25)
+
+    def test_queries_per_batch_constant(self):
+        """Test a batch runs as many queries for 10 or 100 recipes."""
+        import_recipes(self.user, read_ndjson(recipe_lines(10)))
+
+        for count in (10, 100):
+            # Savepoints, tags, recipes, their tags and collection bumps.
+            with self.assertNumQueries(7):
+                import_recipes(self.user, read_ndjson(recipe_lines(count)))
+
+    def peak_memory(self, count):
+        """Return the peak memory importing count recipes takes.
+
+        Recipes refer to their image files and back, so garbage is
+        collected after every batch for the peak not to depend on when the
+        collector runs.
+        """
+        tracemalloc.start()
+        try:
+            import_recipes(
+                self.user, read_ndjson(recipe_lines(count)), batch_size=100,
+                progress=lambda summary: gc.collect(),
+            )
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    def test_memory_constant(self):
+        """Test memory use doesn't grow with the number of recipes."""
+        self.peak_memory(300)
+        small = self.peak_memory(300)
+        large = self.peak_memory(3000)
+
+        self.assertLess(large, small * 1.5)
+
+
+class ImportRecipesCommandTests(TestCase):
+    """Test the import_recipes command."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@test.com',
+            'nakki'
+        )
+        directory = tempfile.mkdtemp()
+        self.addCleanup(os.rmdir, directory)
+        self.path = os.path.join(directory, 'recipes.ndjson')
+        with open(self.path, 'wb') as file:
+            file.writelines(recipe_lines(25))
+        self.addCleanup(os.remove, self.path)
+
+    def test_import_file(self):
+        out = StringIO()
+
+        call_command('import_recipes', 'test@test.com', self.path,
+                     batch_size=10, stdout=out)
+
+        self.assertEqual(Recipe.objects.filter(user=self.user).count(), 25)
+        lines = out.getvalue().splitlines()
+        self.assertEqual(len(lines), 4)
+        self.assertIn('25 recipes imported', lines[2])
+        self.assertIn('Imported 25 recipes', lines[3])
@@ -0,0 +1,220 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from rest_framework.renderers import JSONRenderer
+from django.urls import reverse
+from rest_framework.test import APIClient, APIRequestFactory
+
+from core.models import Recipe, Tag, Ingredient
+from core.tests.benchmarks import benchmark, best_time, report, size
+
+from recipe.readers import RecipeReader
+from recipe.serializers import RecipeSerializer, RecipeDetailSerializer
+
+
+def sample_recipes(user, count):
+    """Create count recipes with shared tags and ingredients."""
+    tags = [Tag.objects.create(user=user, name=f'Tag {i}') for i in range(4)]
+    ingredients = [
+        Ingredient.objects.create(user=user, name=f'Ingredient {i}')
+        for i in range(4)
+    ]
+    recipes = Recipe.objects.bulk_create(
+        Recipe(
+            user=user,
+            title=f'Recipe {i}',
+            time_minutes=i % 90,
+            price=f'{i % 50}.{i % 100:02}',
+            link=f'https://example.com/{i}' if i % 2 else '',
+            image_derivatives={} if i % 3 else {
+                '640': {'jpg': f'derivatives/{i}-640.jpg'},
+                '160': {'jpg': f'derivatives/{i}-160.jpg',
+                        'webp': f'derivatives/{i}-160.webp'},
+            },
+        )
+        for i in range(count)
+    )
+    Recipe.tags.through.objects.bulk_create(
+        Recipe.tags.through(recipe=recipe, tag=tag)
+        for i, recipe in enumerate(recipes)
+        for tag in tags[i % 3:][::-1]
+    )
+    Recipe.ingredients.through.objects.bulk_create(
+        Recipe.ingredients.through(recipe=recipe, ingredient=ingredient)
+        for i, recipe in enumerate(recipes)
+        for ingredient in ingredients[:i % 5]
+    )
+
+
+def serialize(detail, request, fields=None):
+    """Return all recipes rendered by the serializers."""
+    serializer_class = RecipeDetailSerializer if detail else RecipeSerializer
+    serializer = serializer_class(
+        Recipe.objects.order_by('-id'), many=True,
+        context={'request': request, 'fields': fields}
+    )
+
+    return JSONRenderer().render(serializer.data)
+
+
+def read(detail, request, fields=None):
+    """Return all recipes rendered by a reader."""
+    reader = RecipeReader(fields=fields, detail=detail, request=request)
+    rows = reader.values(Recipe.objects.order_by('-id'))
+
+    return JSONRenderer().render(reader.represent(rows))
+
+
+class RecipeReaderTests(TestCase):
+    """Test recipes read from rows are represented as serialized."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@test.com',
+            'nakki'
+        )
+        sample_recipes(self.user, 30)
+        self.request = APIRequestFactory().get('/')
+
+    def test_list_identical_to_serializer(self):
+        """Test the list representation is byte for byte the same."""
+        for request in (None, self.request):
+            self.assertEqual(read(False, request), serialize(False, request))
+
+    def test_detail_identical_to_serializer(self):
+        """Test the detail representation is byte for byte the same."""
+        for request in (None, self.request):
+            self.assertEqual(read(True, request), serialize(True, request))
+
+    def test_fieldsets_identical_to_serializer(self):
+        """Test only the given fields are represented, as serialized."""
+        for fields in (['title', 'price'], ['tags', 'thumbnail'], []):
+            self.assertEqual(
+                read(False, self.request, fields),
+                serialize(False, self.request, fields),
+            )
+        self.assertEqual(
+            read(True, self.request, ['ingredients', 'images']),
+            serialize(True, self.request, ['ingredients', 'images']),
+        )
+
+    def test_relations_read_in_one_query_each(self):
+        """Test related objects are fetched per relation, not per recipe."""
+        reader = RecipeReader(detail=True)
+        rows = reader.values(Recipe.objects.all())
+
+        with self.assertNumQueries(3):
+            reader.represent(rows)
+
+    def test_unneeded_columns_not_selected(self):
+        """Test only the columns of the fields are selected."""
+        reader = RecipeReader(fields=['title'])
+
+        row = reader.values(Recipe.objects.all())[0]
+
+        self.assertEqual(set(row), {'id', 'title'})
+
+    def test_unneeded_relations_not_fetched(self):
+        """Test serializers fetch only the relations of their fields."""
+        serializer = RecipeSerializer(
+            Recipe.objects.all(), many=True,
+            context={'fields': ['title', 'thumbnail']},
+        )
+
+        self.assertEqual(serializer.child.columns(),
+                         {'id', 'title', 'image_derivatives'})
+        with self.assertNumQueries(1):
+            serializer.data
+
+
+class RecipeWriteResponseTests(TestCase):
+    """Test create and update responses are represented as lists are."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@test.com',
+            'nakki'
+        )
+        self.tags = [Tag.objects.create(user=self.user, name=f'Tag {i}')
+                     for i in range(3)]
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def assertListed(self, res):
+        """Assert res holds the recipe exactly as the list represents it."""
+        listed = self.client.get(reverse('recipe:recipe-list'))
+        self.assertEqual(
+            JSONRenderer().render(res.data),
+            JSONRenderer().render(listed.data['results'][0]),
+        )
+
+    def test_create_response(self):
+        """Test related objects given out of order are listed by ID."""
+        res = self.client.post(reverse('recipe:recipe-list'), {
+            'title': 'Kebab', 'time_minutes': 5, 'price': '5.00',
+            'tags': [tag.id for tag in reversed(self.tags)],
+            'ingredient_names': ['Salt', 'Garlic', 'Onion'],
+        }, format='json')
+
+        self.assertEqual(res.data['tags'], [tag.id for tag in self.tags])
+        self.assertListed(res)
+
+    def test_update_response(self):
+        """Test the response of an update lists the new related objects."""
+        recipe = Recipe.objects.create(
+            user=self.user, title='Kebab', time_minutes=5, price=5
+        )
+        recipe.tags.add(self.tags[0])
+
+        res = self.client.patch(
+            reverse('recipe:recipe-detail', args=[recipe.id]),
+            {'tags': [tag.id for tag in reversed(self.tags)]},
+            format='json',
+        )
+
+        self.assertEqual(res.data['tags'], [tag.id for tag in self.tags])
+        self.assertListed(res)
+
+    def test_serializer_queries(self):
+        """Test many recipes are serialized with a query per relation."""
+        Tag.objects.all().delete()
+        sample_recipes(self.user, 10)
+        serializer = RecipeSerializer(Recipe.objects.all(), many=True)
+
+        with self.assertNumQueries(3):
+            serializer.data
+
+
+@benchmark('RECIPE_READER_BENCHMARK_SIZE')
+class RecipeReaderBenchmarkTests(TestCase):
+    """Benchmark readers against the serializers.
+
+    The number of recipes is RECIPE_READER_BENCHMARK_SIZE.
+    """
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@test.com',
+            'nakki'
+        )
+        self.size = size('RECIPE_READER_BENCHMARK_SIZE')
+        sample_recipes(self.user, self.size)
+        self.request = APIRequestFactory().get('/')
+
+    def test_rows_per_second(self):
+        """Test readers represent more recipes per second than serializers."""
+        rates = {}
+        for detail, name in ((False, 'RecipeSerializer'),
+                             (True, 'RecipeDetailSerializer')):
+            rates[name] = (
+                self.size / best_time(serialize, detail, self.request,
+                                      repeat=1),
+                self.size / best_time(read, detail, self.request, repeat=1),
+            )
+        report(self, *(
+            f'{name}: {serializer_rate:.0f} rows/s, reader: '
+            f'{reader_rate:.0f} rows/s, {reader_rate / serializer_rate:.1f}x'
+            for name, (serializer_rate, reader_rate) in rates.items()
+        ))
+
+        for name, (serializer_rate, reader_rate) in rates.items():
+            self.assertGreater(reader_rate, serializer_rate, name)
@@ -4,17 +4,20 @@ import os
 from PIL import Image
 
 from django.contrib.auth import get_user_model
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from rest_framework import status
 from rest_framework.test import APIClient
 
-from core.models import Recipe, Tag, Ingredient
+from core.models import CollectionVersion, Recipe, Tag, Ingredient
 
 from recipe.serializers import RecipeSerializer, RecipeDetailSerializer
 
 RECIPES_URL = reverse('recipe:recipe-list')
+BULK_URL = reverse('recipe:recipe-bulk')
 
 
 def image_upload_url(recipe_id):
@@ -49,6 +52,29 @@ def sample_recipe(user, **params):
     return Recipe.objects.create(user=user, **defaults)
 
 
+def sample_full_recipe(user, index=0):
+    """Create and return a recipe with its own tags and ingredients."""
+    recipe = sample_recipe(user=user, title=f'Recipe {index}')
+    recipe.tags.add(
+        sample_tag(user=user, name=f'Tag {index}a'),
+        sample_tag(user=user, name=f'Tag {index}b'),
+    )
+    recipe.ingredients.add(
+        sample_ingredient(user=user, name=f'Ingredient {index}a'),
+        sample_ingredient(user=user, name=f'Ingredient {index}b'),
+    )
+
+    return recipe
+
+
+def count_queries(func, *args, **kwargs):
+    """Call func and return the number of queries it executed."""
+    with CaptureQueriesContext(connection) as ctx:
+        func(*args, **kwargs)
+
+    return len(ctx.captured_queries)
+
+
 class PublicRecipeApiTests(TestCase):
     """Test unauthenticated recipe API access."""
 
@@ -84,7 +110,7 @@ class PrivateRecipeApiTest(TestCase):
         serializer = RecipeSerializer(recipes, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_recipes_limited_to_user(self):
         """Test retrieving recipes for the user."""
@@ -101,8 +127,8 @@ class PrivateRecipeApiTest(TestCase):
         serializer = RecipeSerializer(recipes, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 1)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(len(res.data['results']), 1)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_view_recipe_detail(self):
         """Test viewing a recipe detail."""
@@ -152,6 +178,21 @@ class PrivateRecipeApiTest(TestCase):
         self.assertIn(tag1, tags)
         self.assertIn(tag2, tags)
 
+    def test_create_recipe_with_other_users_tag(self):
+        """Test a recipe can't be tagged with another user's tag."""
+        other = get_user_model().objects.create_user('o@test.com', 'nakki')
+        payload = {
+            'title': 'Avocado lime cheesecake',
+            'tags': [sample_tag(user=other).id],
+            'time_minutes': 60,
+            'price': 19.99
+        }
+
+        res = self.client.post(RECIPES_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Recipe.objects.exists())
+
     def test_create_recipe_with_ingredients(self):
         """Test creating recipe with ingredients."""
         ingredient1 = sample_ingredient(user=self.user, name='Beans')
@@ -172,6 +213,60 @@ class PrivateRecipeApiTest(TestCase):
         self.assertIn(ingredient1, ingredients)
         self.assertIn(ingredient2, ingredients)
 
+    def test_create_recipe_with_tag_names(self):
+        """Test tags referenced by name are reused or created."""
+        existing = sample_tag(user=self.user, name='Vegan')
+        other = get_user_model().objects.create_user('o@test.com', 'nakki')
+        sample_tag(user=other, name='Dessert')
+        payload = {
+            'title': 'Avocado lime cheesecake',
+            'tag_names': ['Vegan', 'Dessert'],
+            'time_minutes': 60,
+            'price': 19.99
+        }
+
+        res = self.client.post(RECIPES_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        recipe = Recipe.objects.get(id=res.data['id'])
+        self.assertEqual(
+            sorted(tag.name for tag in recipe.tags.all()),
+            ['Dessert', 'Vegan']
+        )
+        self.assertIn(existing, recipe.tags.all())
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 2)
+        self.assertNotIn('tag_names', res.data)
+
+    def test_create_recipe_with_ids_and_names(self):
+        """Test ingredients by ID and by name are combined."""
+        ingredient = sample_ingredient(user=self.user, name='Beans')
+        payload = {
+            'title': 'Nakit ja muussi',
+            'ingredients': [ingredient.id],
+            'ingredient_names': ['Nakki', 'Beans'],
+            'time_minutes': 15,
+            'price': 12.50
+        }
+
+        res = self.client.post(RECIPES_URL, payload, format='json')
+
+        recipe = Recipe.objects.get(id=res.data['id'])
+        self.assertEqual(
+            sorted(i.name for i in recipe.ingredients.all()),
+            ['Beans', 'Nakki']
+        )
+
+    def test_update_recipe_with_tag_names(self):
+        """Test tag names replace the tags of a recipe on update."""
+        recipe = sample_recipe(user=self.user)
+        recipe.tags.add(sample_tag(user=self.user, name='Old'))
+
+        self.client.patch(
+            detail_url(recipe.id), {'tag_names': ['New']}, format='json'
+        )
+
+        self.assertEqual([tag.name for tag in recipe.tags.all()], ['New'])
+
     def test_partial_update_recipe(self):
         """Test updating a recipe with patch."""
         recipe = sample_recipe(user=self.user)
@@ -211,6 +306,300 @@ class PrivateRecipeApiTest(TestCase):
         tags = recipe.tags.all()
         self.assertEqual(len(tags), 0)
 
+    def test_recipes_paginated(self):
+        """Test walking recipe pages returns every recipe exactly once."""
+        recipes = [sample_recipe(user=self.user) for _ in range(5)]
+
+        res = self.client.get(RECIPES_URL, {'page_size': 2})
+        ids = [item['id'] for item in res.data['results']]
+        self.assertIsNone(res.data['previous'])
+        while res.data['next']:
+            res = self.client.get(res.data['next'])
+            ids += [item['id'] for item in res.data['results']]
+
+        self.assertEqual(ids, [recipe.id for recipe in reversed(recipes)])
+
+    def test_recipes_paginated_with_filter(self):
+        """Test pagination keeps applying the tag filter."""
+        tag = sample_tag(user=self.user)
+        tagged = []
+        for _ in range(3):
+            recipe = sample_recipe(user=self.user)
+            recipe.tags.add(tag)
+            tagged.append(recipe)
+            sample_recipe(user=self.user)
+
+        res = self.client.get(RECIPES_URL, {'tags': tag.id, 'page_size': 2})
+        ids = [item['id'] for item in res.data['results']]
+        res = self.client.get(res.data['next'])
+        ids += [item['id'] for item in res.data['results']]
+
+        self.assertIsNone(res.data['next'])
+        self.assertEqual(ids, [recipe.id for recipe in reversed(tagged)])
+
+
+class RecipeRelatedFilterApiTests(TestCase):
+    """Test filtering recipes by tags and ingredients through the API."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@test.com',
+            'nakki'
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_filter_recipes_by_tags_no_duplicates(self):
+        """Test a recipe matching several filter tags is listed once."""
+        recipe = sample_recipe(user=self.user)
+        tag1 = sample_tag(user=self.user, name='Rasvanen')
+        tag2 = sample_tag(user=self.user, name='Kala')
+        recipe.tags.add(tag1, tag2)
+
+        res = self.client.get(RECIPES_URL, {'tags': f'{tag1.id},{tag2.id}'})
+
+        self.assertEqual(len(res.data['results']), 1)
+
+    def test_filter_recipes_by_all_tags(self):
+        """Test tags_mode=all returns only recipes with every tag."""
+        recipe1 = sample_recipe(user=self.user, title='Makkaraperunat')
+        recipe2 = sample_recipe(user=self.user, title='Lohta')
+        tag1 = sample_tag(user=self.user, name='Rasvanen')
+        tag2 = sample_tag(user=self.user, name='Kala')
+        recipe1.tags.add(tag1, tag2)
+        recipe2.tags.add(tag2)
+
+        res = self.client.get(
+            RECIPES_URL,
+            {'tags': f'{tag1.id},{tag2.id}', 'tags_mode': 'all'}
+        )
+
+        self.assertEqual(
+            res.data['results'], [RecipeSerializer(recipe1).data]
+        )
+
+    def test_filter_recipes_invalid_mode(self):
+        """Test an unknown match mode is rejected."""
+        tag = sample_tag(user=self.user)
+
+        res = self.client.get(
+            RECIPES_URL, {'tags': tag.id, 'tags_mode': 'some'}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_filter_recipes_invalid_ids(self):
+        """Test IDs that aren't integers are rejected."""
+        for params in ({'tags': 'abc'}, {'ingredients': '1,,2'}):
+            res = self.client.get(RECIPES_URL, params)
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn(list(params)[0], res.data)
+
+
+class RecipeRangeFilterApiTests(TestCase):
+    """Test filtering and ordering recipes by time and price."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@test.com',
+            'nakki'
+        )
+        self.client.force_authenticate(self.user)
+        self.quick = sample_recipe(self.user, time_minutes=5, price=12)
+        self.slow = sample_recipe(self.user, time_minutes=60, price=3)
+        self.medium = sample_recipe(self.user, time_minutes=20, price=7.5)
+
+    def list_ids(self, **params):
+        """Return the IDs of the recipes listed with params, page by page."""
+        res = self.client.get(RECIPES_URL, {'page_size': 2, **params})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        ids = [item['id'] for item in res.data['results']]
+        while res.data['next']:
+            res = self.client.get(res.data['next'])
+            ids += [item['id'] for item in res.data['results']]
+
+        return ids
+
+    def test_filter_max_time(self):
+        """Test only recipes taking at most max_time minutes are listed."""
+        ids = self.list_ids(max_time=20)
+
+        self.assertEqual(ids, [self.medium.id, self.quick.id])
+
+    def test_filter_price_range(self):
+        """Test min_price and max_price are inclusive."""
+        ids = self.list_ids(min_price='3', max_price='7.50')
+
+        self.assertEqual(ids, [self.medium.id, self.slow.id])
+
+    def test_order_by_time(self):
+        """Test pages follow the requested ordering."""
+        self.assertEqual(
+            self.list_ids(ordering='time_minutes'),
+            [self.quick.id, self.medium.id, self.slow.id],
+        )
+        self.assertEqual(
+            self.list_ids(ordering='-price'),
+            [self.quick.id, self.medium.id, self.slow.id],
+        )
+
+    def test_order_ties_broken_by_id(self):
+        """Test recipes with equal values are listed exactly once."""
+        same = [sample_recipe(self.user, time_minutes=20) for _ in range(3)]
+
+        ids = self.list_ids(ordering='-time_minutes', max_time=20)
+
+        self.assertEqual(
+            ids, [recipe.id for recipe in reversed(same)]
+            + [self.medium.id, self.quick.id]
+        )
+
+    def test_pages_of_ties_found_by_key(self):
+        """Test pages within long runs of ties are found without offsets."""
+        for i in range(9):
+            sample_recipe(self.user, time_minutes=20, price=i % 2)
+        expected = list(Recipe.objects.order_by('price', 'id').values_list(
+            'id', flat=True
+        ))
+
+        res = self.client.get(RECIPES_URL, {'page_size': 2,
+                                            'ordering': 'price'})
+        pages = [[item['id'] for item in res.data['results']]]
+        while res.data['next']:
+            with CaptureQueriesContext(connection) as queries:
+                res = self.client.get(res.data['next'])
+            self.assertNotIn('OFFSET', queries[-1]['sql'])
+            pages.append([item['id'] for item in res.data['results']])
+        self.assertEqual(sum(pages, []), expected)
+
+        back = []
+        while res.data['previous']:
+            res = self.client.get(res.data['previous'])
+            back.append([item['id'] for item in res.data['results']])
+        self.assertEqual(back, pages[-2::-1])
+
+    def test_invalid_cursor(self):
+        """Test a cursor not holding a position of the ordering is refused."""
+        res = self.client.get(RECIPES_URL, {'page_size': 2,
+                                            'ordering': 'price'})
+        url = res.data['next'].replace('ordering=price', 'ordering=id')
+
+        res = self.client.get(url)
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_invalid_parameters(self):
+        """Test invalid filter and ordering values are rejected."""
+        for params in ({'max_time': 'soon'}, {'max_time': -1},
+                       {'min_price': 'cheap'}, {'ordering': 'title'}):
+            res = self.client.get(RECIPES_URL, params)
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn(list(params)[0], res.data)
+
+
+class RecipeSparseFieldsetTests(TestCase):
+    """Test picking the recipe fields to return."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@test.com',
+            'nakki'
+        )
+        self.client.force_authenticate(self.user)
+        self.recipe = sample_full_recipe(user=self.user)
+
+    def get_with_queries(self, url, params):
+        """Return the response to a GET and the SQL it ran."""
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(url, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        return res, [query['sql'] for query in ctx.captured_queries]
+
+    def test_list_fields(self):
+        """Test only the requested fields are selected and returned."""
+        res, queries = self.get_with_queries(
+            RECIPES_URL, {'fields': 'title,id'}
+        )
+
+        self.assertEqual(res.data['results'],
+                         [{'id': self.recipe.id, 'title': 'Recipe 0'}])
+        recipe_query = queries[-1]
+        self.assertIn('"title"', recipe_query)
+        self.assertNotIn('"link"', recipe_query)
+        self.assertNotIn('core_tag', ' '.join(queries))
+
+    def test_list_exclude(self):
+        """Test excluded relations aren't fetched."""
+        full_count = count_queries(self.client.get, RECIPES_URL)
+
+        res, queries = self.get_with_queries(
+            RECIPES_URL, {'exclude': 'tags,ingredients,thumbnail'}
+        )
+
+        item = res.data['results'][0]
+        self.assertEqual(
+            list(item), ['id', 'title', 'time_minutes', 'price', 'link']
+        )
+        self.assertEqual(len(queries), full_count - 2)
+        self.assertNotIn('"image_derivatives"', queries[-1])
+
+    def test_list_tags_only_selects_tag_ids(self):
+        """Test listed tags are fetched without their names."""
+        res, queries = self.get_with_queries(RECIPES_URL, {'fields': 'tags'})
+
+        self.assertEqual(len(res.data['results'][0]['tags']), 2)
+        tag_query = next(sql for sql in queries if 'core_recipe_tags' in sql)
+        self.assertNotIn('"name"', tag_query)
+
+    def test_fields_paginated_in_requested_order(self):
+        """Test the ordering field is loaded even if not returned."""
+        cheap = sample_recipe(user=self.user, title='Cheap', price=1)
+        pricy = sample_recipe(user=self.user, title='Pricy', price=99)
+
+        res = self.client.get(
+            RECIPES_URL,
+            {'fields': 'title', 'ordering': 'price', 'page_size': 1}
+        )
+        titles = [res.data['results'][0]['title']]
+        while res.data['next']:
+            res = self.client.get(res.data['next'])
+            titles += [item['title'] for item in res.data['results']]
+
+        self.assertEqual(titles, [cheap.title, 'Recipe 0', pricy.title])
+
+    def test_detail_fields(self):
+        """Test the detail view returns only the requested fields."""
+        res, queries = self.get_with_queries(
+            detail_url(self.recipe.id), {'fields': 'title,images'}
+        )
+
+        self.assertEqual(res.data, {'title': 'Recipe 0', 'images': {}})
+        self.assertNotIn('core_tag', ' '.join(queries))
+
+    def test_unknown_field(self):
+        """Test unknown or write only fields are rejected."""
+        for params in ({'fields': 'title,secret'},
+                       {'exclude': 'tag_names'}):
+            res = self.client.get(RECIPES_URL, params)
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn('fields', res.data)
+
+    def test_fields_ignored_when_writing(self):
+        """Test fields doesn't trim the response to a create."""
+        res = self.client.post(
+            f'{RECIPES_URL}?fields=title',
+            {'title': 'New', 'time_minutes': 1, 'price': '1.00'},
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertIn('price', res.data)
+
 
 class RecipeImageUploadTests(TestCase):
 
@@ -266,9 +655,9 @@ class RecipeImageUploadTests(TestCase):
         serializer2 = RecipeSerializer(recipe2)
         serializer3 = RecipeSerializer(recipe3)
 
-        self.assertIn(serializer1.data, res.data)
-        self.assertIn(serializer2.data, res.data)
-        self.assertNotIn(serializer3.data, res.data)
+        self.assertIn(serializer1.data, res.data['results'])
+        self.assertIn(serializer2.data, res.data['results'])
+        self.assertNotIn(serializer3.data, res.data['results'])
 
     def test_filter_recipes_by_ingredients(self):
         """Test returning recipes with specific ingredients."""
@@ -289,6 +678,339 @@ class RecipeImageUploadTests(TestCase):
         serializer2 = RecipeSerializer(recipe2)
         serializer3 = RecipeSerializer(recipe3)
 
-        self.assertIn(serializer1.data, res.data)
-        self.assertIn(serializer2.data, res.data)
-        self.assertNotIn(serializer3.data, res.data)
+        self.assertIn(serializer1.data, res.data['results'])
+        self.assertIn(serializer2.data, res.data['results'])
+        self.assertNotIn(serializer3.data, res.data['results'])
+
+
+class RecipeQueryCountTests(TestCase):
+    """Test that recipe endpoints run a constant number of queries."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@test.com',
+            'nakki'
+        )
+        self.client.force_authenticate(self.user)
+
+    def assertConstantQueries(self, func, *args, grow_by=10, **kwargs):
+        """Assert func runs as many queries after adding more recipes."""
+        sample_full_recipe(user=self.user, index=0)
+        before = count_queries(func, *args, **kwargs)
+
+        for index in range(1, grow_by + 1):
+            sample_full_recipe(user=self.user, index=index)
+        after = count_queries(func, *args, **kwargs)
+
+        self.assertEqual(before, after)
+
+    def test_list_query_count_constant(self):
+        """Test listing recipes doesn't run a query per recipe."""
+        self.assertConstantQueries(self.client.get, RECIPES_URL)
+
+    def test_list_filtered_query_count_constant(self):
+        """Test filtered listing doesn't run a query per recipe."""
+        tag = sample_tag(user=self.user, name='Shared')
+        self.assertConstantQueries(
+            self.client.get, RECIPES_URL, {'tags': str(tag.id)}
+        )
+
+    def test_retrieve_query_count(self):
+        """Test the detail view fetches related objects in bulk."""
+        recipe = sample_full_recipe(user=self.user)
+
+        # ETag lookup, recipe, tags and ingredients.
+        with self.assertNumQueries(4):
+            res = self.client.get(detail_url(recipe.id))
+
+        self.assertEqual(len(res.data['tags']), 2)
+        self.assertEqual(len(res.data['ingredients']), 2)
+
+
+class RecipeBulkApiTests(TestCase):
+    """Test the bulk recipe endpoint."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@test.com',
+            'nakki'
+        )
+        self.client.force_authenticate(self.user)
+        self.tag = sample_tag(user=self.user)
+        self.ingredient = sample_ingredient(user=self.user)
+
+    def payload(self, count):
+        """Return a bulk create payload of count recipes."""
+        return [{
+            'title': f'Recipe {index}',
+            'time_minutes': 10,
+            'price': '5.00',
+            'tags': [self.tag.id],
+            'ingredients': [self.ingredient.id],
+        } for index in range(count)]
+
+    def test_bulk_create(self):
+        """Test creating recipes with tags and ingredients in bulk."""
+        res = self.client.post(BULK_URL, self.payload(3), format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        ids = [result['id'] for result in res.data['results']]
+        recipes = Recipe.objects.filter(user=self.user, id__in=ids)
+        self.assertEqual(recipes.count(), 3)
+        for recipe in recipes:
+            self.assertEqual(list(recipe.tags.all()), [self.tag])
+            self.assertEqual(
+                list(recipe.ingredients.all()), [self.ingredient]
+            )
+
+    def test_bulk_create_query_count_constant(self):
+        """Test bulk create runs the same queries for 2 or 50 recipes."""
+        self.client.post(BULK_URL, self.payload(1), format='json')
+        small = count_queries(
+            self.client.post, BULK_URL, self.payload(2), format='json'
+        )
+        large = count_queries(
+            self.client.post, BULK_URL, self.payload(50), format='json'
+        )
+
+        self.assertEqual(small, large)
+        self.assertEqual(Recipe.objects.count(), 53)
+
+    def test_bulk_create_reports_invalid_items(self):
+        """Test invalid items are reported while valid ones are created."""
+        other = get_user_model().objects.create_user('o@test.com', 'nakki')
+        payload = self.payload(3)
+        del payload[0]['title']
+        payload[2]['tags'] = [sample_tag(user=other).id]
+
+        res = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_207_MULTI_STATUS)
+        results = res.data['results']
+        self.assertEqual(
+            [result['status'] for result in results], [400, 201, 400]
+        )
+        self.assertIn('title', results[0]['errors'])
+        self.assertIn('tags', results[2]['errors'])
+        self.assertEqual(Recipe.objects.count(), 1)
+
+    def test_bulk_create_with_names(self):
+        """Test names across bulk items are resolved together."""
+        payload = self.payload(2)
+        payload[0]['tag_names'] = ['Shared', 'First']
+        payload[1]['tag_names'] = ['Shared']
+
+        res = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        first, second = [Recipe.objects.get(id=result['id'])
+                         for result in res.data['results']]
+        self.assertEqual(
+            sorted(tag.name for tag in first.tags.all()),
+            ['First', 'Kebab ranarit', 'Shared']
+        )
+        self.assertEqual(
+            sorted(tag.name for tag in second.tags.all()),
+            ['Kebab ranarit', 'Shared']
+        )
+
+    def test_names_of_failed_items_not_created(self):
+        """Test items rejected by create or update don't create names."""
+        other = get_user_model().objects.create_user('o@test.com', 'nakki')
+        payload = self.payload(1)
+        payload[0]['tags'] = [sample_tag(user=other).id]
+        payload[0]['tag_names'] = ['Created']
+
+        res = self.client.post(BULK_URL, payload, format='json')
+        self.assertEqual(res.data['results'][0]['status'], 400)
+        res = self.client.patch(BULK_URL, [
+            {'id': 0, 'tag_names': ['Updated']},
+            {'id': sample_recipe(user=other).id,
+             'ingredient_names': ['Updated']},
+        ], format='json')
+        self.assertEqual(
+            [result['status'] for result in res.data['results']], [404, 404]
+        )
+
+        self.assertFalse(Tag.objects.filter(
+            name__in=['Created', 'Updated']
+        ).exists())
+        self.assertFalse(Ingredient.objects.filter(name='Updated').exists())
+
+    def test_bulk_create_requires_list(self):
+        """Test the payload must be a list."""
+        res = self.client.post(BULK_URL, self.payload(1)[0], format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_update(self):
+        """Test updating fields and relations of recipes in bulk."""
+        recipe1 = sample_recipe(user=self.user)
+        recipe1.tags.add(self.tag)
+        recipe2 = sample_recipe(user=self.user)
+        new_tag = sample_tag(user=self.user, name='New')
+
+        res = self.client.patch(BULK_URL, [
+            {'id': recipe1.id, 'title': 'Changed', 'tags': [new_tag.id]},
+            {'id': recipe2.id, 'time_minutes': 99},
+            {'id': 0, 'title': 'Missing'},
+        ], format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual(
+            [result['status'] for result in res.data['results']],
+            [200, 200, 404]
+        )
+        recipe1.refresh_from_db()
+        recipe2.refresh_from_db()
+        self.assertEqual(recipe1.title, 'Changed')
+        self.assertEqual(list(recipe1.tags.all()), [new_tag])
+        self.assertEqual(recipe2.time_minutes, 99)
+
+    def test_bulk_update_other_users_recipe(self):
+        """Test recipes of other users can't be updated."""
+        other = get_user_model().objects.create_user('o@test.com', 'nakki')
+        recipe = sample_recipe(user=other)
+
+        res = self.client.patch(
+            BULK_URL, [{'id': recipe.id, 'title': 'Mine'}], format='json'
+        )
+
+        self.assertEqual(res.data['results'][0]['status'], 404)
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.title, 'Sample recipe')
+
+    def test_bulk_delete(self):
+        """Test deleting recipes in bulk."""
+        other = get_user_model().objects.create_user('o@test.com', 'nakki')
+        recipe1 = sample_recipe(user=self.user)
+        recipe2 = sample_recipe(user=other)
+
+        res = self.client.delete(
+            BULK_URL, [recipe1.id, recipe2.id, 'x'], format='json'
+        )
+
+        self.assertEqual(
+            [result['status'] for result in res.data['results']],
+            [204, 404, 400]
+        )
+        self.assertFalse(Recipe.objects.filter(id=recipe1.id).exists())
+        self.assertTrue(Recipe.objects.filter(id=recipe2.id).exists())
+
+
+class RecipeConditionalGetTests(TestCase):
+    """Test ETag and Last-Modified handling of the recipe API."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@test.com',
+            'nakki'
+        )
+        self.client.force_authenticate(self.user)
+        self.recipe = sample_recipe(user=self.user)
+
+    def assertNotModified(self, url, *args, **headers):
+        """Assert a conditional GET of url is answered with 304."""
+        res = self.client.get(url, *args, **headers)
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def assertModified(self, url, *args, **headers):
+        """Assert a conditional GET of url is answered with 200."""
+        res = self.client.get(url, *args, **headers)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_list_not_modified(self):
+        """Test an unchanged list is answered with 304 and one query."""
+        etag = self.client.get(RECIPES_URL)['ETag']
+
+        with self.assertNumQueries(1):
+            self.assertNotModified(RECIPES_URL, HTTP_IF_NONE_MATCH=etag)
+
+    def test_list_modified_by_create(self):
+        """Test creating a recipe changes the list ETag."""
+        etag = self.client.get(RECIPES_URL)['ETag']
+        sample_recipe(user=self.user)
+
+        self.assertModified(RECIPES_URL, HTTP_IF_NONE_MATCH=etag)
+
+    def test_list_modified_by_bulk_delete(self):
+        """Test deleting recipes in bulk changes the list ETag."""
+        etag = self.client.get(RECIPES_URL)['ETag']
+        self.client.delete(BULK_URL, [self.recipe.id], format='json')
+
+        self.assertModified(RECIPES_URL, HTTP_IF_NONE_MATCH=etag)
+
+    def test_list_etag_depends_on_query(self):
+        """Test different filters of the list have different ETags."""
+        tag = sample_tag(user=self.user)
+        etag = self.client.get(RECIPES_URL)['ETag']
+
+        self.assertModified(
+            RECIPES_URL, {'tags': tag.id}, HTTP_IF_NONE_MATCH=etag
+        )
+
+    def test_list_of_new_user_read_only(self):
+        """Test listing a never changed collection writes nothing."""
+        other = get_user_model().objects.create_user('o@test.com', 'nakki')
+        self.client.force_authenticate(other)
+
+        with CaptureQueriesContext(connection) as queries:
+            etag = self.client.get(RECIPES_URL)['ETag']
+
+        self.assertTrue(all(query['sql'].startswith('SELECT')
+                            for query in queries))
+        self.assertFalse(CollectionVersion.objects.filter(user=other).exists())
+        self.assertNotModified(RECIPES_URL, HTTP_IF_NONE_MATCH=etag)
+        sample_recipe(user=other)
+        self.assertModified(RECIPES_URL, HTTP_IF_NONE_MATCH=etag)
+
+    def test_list_etag_per_user(self):
+        """Test another user's list isn't matched by this user's ETag."""
+        etag = self.client.get(RECIPES_URL)['ETag']
+        other = get_user_model().objects.create_user('o@test.com', 'nakki')
+        self.client.force_authenticate(other)
+
+        self.assertModified(RECIPES_URL, HTTP_IF_NONE_MATCH=etag)
+
+    def test_detail_not_modified(self):
+        """Test an unchanged recipe is answered with 304."""
+        url = detail_url(self.recipe.id)
+        res = self.client.get(url)
+
+        self.assertNotModified(url, HTTP_IF_NONE_MATCH=res['ETag'])
+        self.assertNotModified(
+            url, HTTP_IF_MODIFIED_SINCE=res['Last-Modified']
+        )
+
+    def test_detail_modified_by_new_tag(self):
+        """Test adding a tag to a recipe changes its ETag."""
+        url = detail_url(self.recipe.id)
+        etag = self.client.get(url)['ETag']
+
+        self.recipe.tags.add(sample_tag(user=self.user))
+
+        self.assertModified(url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_detail_modified_by_tag_rename(self):
+        """Test renaming a tag of a recipe changes its ETag."""
+        tag = sample_tag(user=self.user)
+        self.recipe.tags.add(tag)
+        url = detail_url(self.recipe.id)
+        etag = self.client.get(url)['ETag']
+
+        tag.name = 'Renamed'
+        tag.save()
+
+        self.assertModified(url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_detail_of_other_user_not_found(self):
+        """Test conditional headers don't reveal other users' recipes."""
+        other = get_user_model().objects.create_user('o@test.com', 'nakki')
+        recipe = sample_recipe(user=other)
+
+        res = self.client.get(detail_url(recipe.id), HTTP_IF_NONE_MATCH='*')
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,223 @@
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient
+from core.tests.benchmarks import benchmark, best_time, report, size
+
+from recipe.search import search_recipes, update_search_vectors
+
+RECIPES_URL = reverse('recipe:recipe-list')
+
+postgresql_only = skipUnless(
+    connection.vendor == 'postgresql', 'Full-text search needs PostgreSQL.'
+)
+
+
+def sample_recipe(user, title='Sample recipe'):
+    """Create and return a sample recipe."""
+    return Recipe.objects.create(
+        user=user, title=title, time_minutes=10, price=5.00
+    )
+
+
+class RecipeSearchApiTests(TestCase):
+    """Test searching recipes through the API."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@test.com',
+            'nakki'
+        )
+        self.client.force_authenticate(self.user)
+        self.soup = sample_recipe(self.user, 'Salmon soup')
+        self.pasta = sample_recipe(self.user, 'Creamy pasta')
+        self.pasta.tags.add(Tag.objects.create(user=self.user, name='Dinner'))
+        self.pie = sample_recipe(self.user, 'Blueberry pie')
+        self.pie.ingredients.add(
+            Ingredient.objects.create(user=self.user, name='Butter')
+        )
+
+    def search(self, terms, **params):
+        """Return the titles of recipes found by a search for terms."""
+        res = self.client.get(RECIPES_URL, {'search': terms, **params})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        return [recipe['title'] for recipe in res.data['results']]
+
+    def test_search_title(self):
+        """Test recipes are found by their title."""
+        self.assertEqual(self.search('soup'), ['Salmon soup'])
+
+    def test_search_tag_and_ingredient_names(self):
+        """Test recipes are found by their tag and ingredient names."""
+        self.assertEqual(self.search('dinner'), ['Creamy pasta'])
+        self.assertEqual(self.search('butter'), ['Blueberry pie'])
+
+    def test_search_matches_every_word(self):
+        """Test every word must match the recipe somewhere."""
+        self.assertEqual(self.search('blueberry butter'), ['Blueberry pie'])
+        self.assertEqual(self.search('blueberry dinner'), [])
+
+    def test_search_own_recipes_only(self):
+        """Test other users' recipes aren't found."""
+        other = get_user_model().objects.create_user('other@test.com', 'x')
+        sample_recipe(other, 'Salmon soup')
+
+        self.assertEqual(self.search('soup'), ['Salmon soup'])
+
+    def test_search_paginated_by_page_number(self):
+        """Test ranked results are paginated by page number."""
+        for i in range(3):
+            sample_recipe(self.user, f'Fish soup {i}')
+
+        res = self.client.get(
+            RECIPES_URL, {'search': 'soup', 'page_size': 3, 'page': 2}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['count'], 4)
+        self.assertEqual(len(res.data['results']), 1)
+        self.assertIsNotNone(res.data['previous'])
+
+    def test_blank_search_lists_everything(self):
+        """Test a blank search is ignored."""
+        res = self.client.get(RECIPES_URL, {'search': ' '})
+
+        self.assertEqual(len(res.data['results']), 3)
+        self.assertIn('next', res.data)
+        self.assertNotIn('count', res.data)
+
+    def test_search_ignored_outside_lists(self):
+        """Test a recipe is found by ID whatever the search parameter."""
+        url = reverse('recipe:recipe-detail', args=[self.soup.id])
+        params = '?search=pasta'
+
+        res = self.client.get(url + params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        res = self.client.patch(url + params, {'title': 'Fish soup'})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        res = self.client.delete(url + params)
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+
+
+@postgresql_only
+class RecipeFullTextSearchTests(TestCase):
+    """Test PostgreSQL full-text search and its search vectors."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@test.com',
+            'nakki'
+        )
+
+    def search(self, terms):
+        """Return the titles of recipes matching terms, best first."""
+        return list(search_recipes(
+            Recipe.objects.filter(user=self.user), terms
+        ).order_by('-rank', '-id').values_list('title', flat=True))
+
+    def test_title_ranked_above_tags(self):
+        """Test a match in the title ranks above one in a tag name."""
+        tagged = sample_recipe(self.user, 'Pasta')
+        tagged.tags.add(Tag.objects.create(user=self.user, name='Soup'))
+        sample_recipe(self.user, 'Soup')
+
+        self.assertEqual(self.search('soup'), ['Soup', 'Pasta'])
+
+    def test_stemming(self):
+        """Test words match in their other forms."""
+        sample_recipe(self.user, 'Grilled potatoes')
+
+        self.assertEqual(self.search('potato'), ['Grilled potatoes'])
+
+    def test_typo_found_by_trigrams(self):
+        """Test a misspelled title is found."""
+        sample_recipe(self.user, 'Bolognese')
+
+        self.assertEqual(self.search('bolognse'), ['Bolognese'])
+
+    def test_vector_follows_changes(self):
+        """Test vectors change with titles, tags and ingredients."""
+        recipe = sample_recipe(self.user, 'Pasta')
+        tag = Tag.objects.create(user=self.user, name='Dinner')
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.tags.add(tag)
+        self.assertEqual(self.search('dinner'), ['Pasta'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            tag.name = 'Supper'
+            tag.save()
+        self.assertEqual(self.search('supper'), ['Pasta'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            tag.delete()
+        self.assertEqual(self.search('supper'), [])
+
+        recipe.title = 'Lasagne'
+        recipe.save()
+        self.assertEqual(self.search('lasagne'), ['Lasagne'])
+
+
+@postgresql_only
+@benchmark('RECIPE_SEARCH_BENCHMARK_SIZE')
+class RecipeSearchBenchmarkTests(TestCase):
+    """Benchmark search over RECIPE_SEARCH_BENCHMARK_SIZE synthetic recipes."""
+    words = ('salmon', 'pasta', 'creamy', 'spicy', 'soup', 'pie', 'roast',
+             'garlic', 'lemon', 'curry', 'potato', 'mushroom', 'baked')
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(
+            'test@test.com',
+            'nakki'
+        )
+        count = len(cls.words)
+        Recipe.objects.bulk_create(
+            Recipe(
+                user=cls.user, time_minutes=10, price=5,
+                title=f'{cls.words[i % count]} {cls.words[i * 7 % count]} '
+                      f'{cls.words[i * 5 % count]} {i}',
+            )
+            for i in range(size('RECIPE_SEARCH_BENCHMARK_SIZE'))
+        )
+        sample_recipe(cls.user, 'Saffron risotto')
+        update_search_vectors(Recipe.objects.all())
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE core_recipe;')
+
+    def page(self, terms):
+        """Return the titles of the first page of a search for terms."""
+        queryset = search_recipes(
+            Recipe.objects.filter(user=self.user), terms
+        ).order_by('-rank', '-id')
+
+        return list(queryset.values_list('title', flat=True)[:50])
+
+    def test_search_uses_indexes(self):
+        """Test searching scans the GIN indexes, not the whole table."""
+        queryset = search_recipes(Recipe.objects.all(), 'risotto')
+
+        plan = queryset.explain()
+
+        self.assertIn('core_recipe_search_idx', plan)
+        self.assertIn('core_recipe_title_trgm_idx', plan)
+        self.assertNotIn('Seq Scan on core_recipe', plan)
+
+    def test_search_page(self):
+        """Test first pages are found among the whole corpus, and how fast."""
+        searches = ('risotto', 'risoto', 'creamy soup', 'garlic')
+
+        report(self, *(
+            f'{terms!r}: {best_time(self.page, terms) * 1000:.1f} ms'
+            for terms in searches
+        ))
+
+        self.assertEqual(self.page('risoto'), ['Saffron risotto'])
@@ -1,4 +1,7 @@
+from unittest.mock import patch
+
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.urls import reverse
 from django.test import TestCase
 
@@ -6,9 +9,11 @@ from rest_framework import status
 from rest_framework.test import APIClient
 
 from core.models import Tag, Recipe
+from recipe.cache import response_cache
 from recipe.serializers import TagSerializer
 
 TAG_URL = reverse('recipe:tag-list')
+CACHE_STATS_URL = reverse('recipe:cache-stats')
 
 
 class PublicTagsApiTests(TestCase):
@@ -28,6 +33,7 @@ class PrivateTagsApiTests(TestCase):
     """Test the authorized user tags API."""
 
     def setUp(self):
+        cache.clear()
         self.user = get_user_model().objects.create_user(
             'foobar@appelsiini.fi',
             'bo-ol-o-wo-ar'
@@ -46,7 +52,7 @@ class PrivateTagsApiTests(TestCase):
         serializer = TagSerializer(tags, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_tags_limited_to_user(self):
         """Test that tags returned are for the user."""
@@ -60,8 +66,8 @@ class PrivateTagsApiTests(TestCase):
         res = self.client.get(TAG_URL)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 1)
-        self.assertEqual(res.data[0]['name'], tag.name)
+        self.assertEqual(len(res.data['results']), 1)
+        self.assertEqual(res.data['results'][0]['name'], tag.name)
 
     def test_create_tags_successful(self):
         """Test that tag creation works."""
@@ -97,8 +103,8 @@ class PrivateTagsApiTests(TestCase):
         res = self.client.get(TAG_URL, {'assigned_only': 1})
         serializer = TagSerializer(tag1)
         serializer2 = TagSerializer(tag2)
-        self.assertIn(serializer.data, res.data)
-        self.assertNotIn(serializer2.data, res.data)
+        self.assertIn(serializer.data, res.data['results'])
+        self.assertNotIn(serializer2.data, res.data['results'])
 
     def test_retrieve_tags_assigned_unique(self):
         """Test filtering tags by assigned returns unique items."""
@@ -121,4 +127,139 @@ class PrivateTagsApiTests(TestCase):
 
         res = self.client.get(TAG_URL, {'assigned_only': 1})
 
-        self.assertEqual(len(res.data), 1)
+        self.assertEqual(len(res.data['results']), 1)
+
+    def test_tags_paginated(self):
+        """Test walking tag pages returns every tag once, by name."""
+        for name in ('Breakfast', 'Lunch', 'Dinner', 'Snack'):
+            Tag.objects.create(user=self.user, name=name)
+
+        res = self.client.get(TAG_URL, {'page_size': 1})
+        names = [item['name'] for item in res.data['results']]
+        while res.data['next']:
+            res = self.client.get(res.data['next'])
+            names += [item['name'] for item in res.data['results']]
+
+        self.assertEqual(names, ['Snack', 'Lunch', 'Dinner', 'Breakfast'])
+
+    def test_create_tag_duplicate_name(self):
+        """Test creating a tag with a name the user already has fails."""
+        Tag.objects.create(user=self.user, name='Vegan')
+
+        res = self.client.post(TAG_URL, {'name': 'Vegan'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_create_tag_duplicate_name_race(self):
+        """Test a name created after validation is rejected as a duplicate."""
+        Tag.objects.create(user=self.user, name='Vegan')
+
+        with patch.object(TagSerializer, 'validate_name',
+                          lambda self, value: value):
+            res = self.client.post(TAG_URL, {'name': 'Vegan'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data['name'],
+                         ['A tag with this name already exists.'])
+        self.assertEqual(Tag.objects.filter(name='Vegan').count(), 1)
+
+    def test_validate_name_without_request(self):
+        """Test names are validated without a request to tell the user."""
+        serializer = TagSerializer(data={'name': 'Vegan'})
+
+        self.assertTrue(serializer.is_valid())
+
+
+class TagsResponseCacheTests(TestCase):
+    """Test caching of tag list responses."""
+
+    def setUp(self):
+        cache.clear()
+        response_cache.reset_stats()
+        self.user = get_user_model().objects.create_user(
+            'foobar@appelsiini.fi',
+            'bo-ol-o-wo-ar'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.tag = Tag.objects.create(user=self.user, name='Vegan')
+
+    def sample_recipe(self):
+        """Create and return a sample recipe."""
+        return Recipe.objects.create(
+            title='Pancakes', time_minutes=20, price=3.00, user=self.user
+        )
+
+    def test_repeated_list_served_from_cache(self):
+        """Test an unchanged list only costs the version lookup."""
+        first = self.client.get(TAG_URL)
+
+        with self.assertNumQueries(1):
+            second = self.client.get(TAG_URL)
+
+        self.assertEqual(first.data, second.data)
+        self.assertEqual(
+            response_cache.stats()['TagViewSet'], {'hits': 1, 'misses': 1}
+        )
+
+    def test_cache_invalidated_by_new_tag(self):
+        """Test creating a tag shows up in the next list."""
+        self.client.get(TAG_URL)
+        self.client.post(TAG_URL, {'name': 'Dessert'})
+
+        res = self.client.get(TAG_URL)
+
+        self.assertEqual(len(res.data['results']), 2)
+
+    def test_cache_invalidated_by_tag_delete(self):
+        """Test deleting a tag removes it from the next list."""
+        self.client.get(TAG_URL)
+        self.tag.delete()
+
+        res = self.client.get(TAG_URL)
+
+        self.assertEqual(res.data['results'], [])
+
+    def test_assigned_only_invalidated_by_assignment(self):
+        """Test assigning a tag to a recipe shows up in assigned_only."""
+        recipe = self.sample_recipe()
+        self.client.get(TAG_URL, {'assigned_only': 1})
+
+        recipe.tags.add(self.tag)
+        res = self.client.get(TAG_URL, {'assigned_only': 1})
+
+        self.assertEqual(len(res.data['results']), 1)
+
+    def test_assigned_only_invalidated_by_recipe_delete(self):
+        """Test deleting the only recipe of a tag unassigns it."""
+        recipe = self.sample_recipe()
+        recipe.tags.add(self.tag)
+        self.client.get(TAG_URL, {'assigned_only': 1})
+
+        recipe.delete()
+        res = self.client.get(TAG_URL, {'assigned_only': 1})
+
+        self.assertEqual(res.data['results'], [])
+
+    def test_cache_per_user(self):
+        """Test users don't see each other's cached lists."""
+        self.client.get(TAG_URL)
+        other = get_user_model().objects.create_user('o@test.com', 'nakki')
+        self.client.force_authenticate(other)
+
+        res = self.client.get(TAG_URL)
+
+        self.assertEqual(res.data['results'], [])
+
+    def test_cache_stats_admin_only(self):
+        """Test cache stats are only available to staff."""
+        res = self.client.get(CACHE_STATS_URL)
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.user.is_staff = True
+        self.user.save()
+        self.client.get(TAG_URL)
+        res = self.client.get(CACHE_STATS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['TagViewSet']['misses'], 1)
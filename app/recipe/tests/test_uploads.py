@@ -0,0 +1,210 @@
+import io
+import os
+import struct
+import tempfile
+import tracemalloc
+import zlib
+
+from PIL import Image
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadhandler import StopUpload
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe
+
+from recipe.uploads import INVALID_IMAGE, RecipeImageUploadHandler, \
+    strip_jpeg_metadata
+
+
+def png_chunk(chunk_type, data):
+    """Return a PNG chunk of chunk_type holding data."""
+    crc = zlib.crc32(chunk_type + data)
+    return struct.pack('>I', len(data)) + chunk_type + data + \
+        struct.pack('>I', crc)
+
+
+def png_header(width, height):
+    """Return the start of a PNG claiming to be width by height."""
+    ihdr = struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+    return b'\x89PNG\r\n\x1a\n' + png_chunk(b'IHDR', ihdr) + \
+        png_chunk(b'IDAT', b'')
+
+
+def jpeg_with_exif(orientation=1, size=(40, 20)):
+    """Return the bytes of a JPEG carrying EXIF metadata."""
+    image = Image.new('RGB', size, 'orange')
+    exif = Image.Exif()
+    exif[0x0112] = orientation
+    exif[0x010F] = 'Camera maker'
+    buffer = io.BytesIO()
+    image.save(buffer, 'JPEG', exif=exif.tobytes())
+
+    return buffer.getvalue()
+
+
+def stream(handler, content, chunk_size=64 * 2 ** 10):
+    """Feed content to handler the way Django's multipart parser does."""
+    handler.new_file('image', 'photo.jpg', 'image/jpeg', len(content))
+    for start in range(0, len(content), chunk_size):
+        handler.receive_data_chunk(content[start:start + chunk_size], start)
+
+    return handler.file_complete(len(content))
+
+
+class RecipeImageUploadHandlerTests(TestCase):
+    """Test the streaming recipe image upload handler."""
+
+    def test_valid_image_accepted(self):
+        """Test a valid image comes through as a file on disk."""
+        uploaded = stream(RecipeImageUploadHandler(), jpeg_with_exif())
+
+        self.assertTrue(os.path.exists(uploaded.temporary_file_path()))
+        with Image.open(uploaded) as image:
+            self.assertEqual(image.size, (40, 20))
+
+    @override_settings(IMAGE_UPLOAD_MAX_PIXELS=100 * 100)
+    def test_too_many_pixels_rejected_from_header(self):
+        """Test an image is rejected from its header alone."""
+        handler = RecipeImageUploadHandler()
+        handler.new_file('image', 'bomb.png', 'image/png', None)
+
+        with self.assertRaises(StopUpload):
+            handler.receive_data_chunk(png_header(5000, 5000), 0)
+        self.assertIn('5000x5000', handler.error)
+
+    @override_settings(IMAGE_UPLOAD_MAX_BYTES=1000)
+    def test_too_many_bytes_rejected(self):
+        """Test an upload is stopped once it passes the size limit."""
+        handler = RecipeImageUploadHandler()
+        handler.new_file('image', 'photo.png', 'image/png', None)
+        handler.receive_data_chunk(png_header(10, 10), 0)
+
+        with self.assertRaises(StopUpload):
+            handler.receive_data_chunk(b'\x00' * 1000, 100)
+
+    @override_settings(IMAGE_UPLOAD_HEADER_BYTES=1024)
+    def test_non_image_rejected_early(self):
+        """Test data that isn't an image is rejected after the header."""
+        handler = RecipeImageUploadHandler()
+        handler.new_file('image', 'photo.jpg', 'image/jpeg', None)
+
+        with self.assertRaises(StopUpload):
+            handler.receive_data_chunk(b'nakki' * 1000, 0)
+
+    def test_exif_stripped_without_reencoding(self):
+        """Test EXIF is removed while the image data is copied as is."""
+        content = jpeg_with_exif()
+
+        uploaded = stream(RecipeImageUploadHandler(), content)
+
+        data = uploaded.read()
+        self.assertNotIn(b'Exif', data)
+        self.assertNotIn(b'Camera maker', data)
+        scan = content.index(b'\xff\xda')
+        self.assertEqual(data[data.index(b'\xff\xda'):], content[scan:])
+
+    def test_rotated_image_reencoded_upright(self):
+        """Test an image needing rotation is rotated and loses its EXIF."""
+        uploaded = stream(
+            RecipeImageUploadHandler(), jpeg_with_exif(orientation=6)
+        )
+
+        with Image.open(uploaded) as image:
+            self.assertEqual(image.size, (20, 40))
+            self.assertNotIn(0x010F, image.getexif())
+
+    def test_png_metadata_stripped(self):
+        """Test textual PNG chunks are removed."""
+        image = Image.new('RGB', (10, 10))
+        buffer = io.BytesIO()
+        image.save(buffer, 'PNG')
+        content = buffer.getvalue()
+        text = png_chunk(b'tEXt', b'Author\x00Nakki')
+        content = content[:33] + text + content[33:]
+
+        uploaded = stream(RecipeImageUploadHandler(), content)
+
+        data = uploaded.read()
+        self.assertNotIn(b'Nakki', data)
+        self.assertEqual(data, content.replace(text, b''))
+
+    def test_strip_jpeg_rejects_corrupt_file(self):
+        """Test a file that isn't a JPEG can't be stripped."""
+        with self.assertRaises(ValueError):
+            strip_jpeg_metadata(io.BytesIO(b'nakki'), io.BytesIO())
+
+    def test_peak_memory_bounded(self):
+        """Benchmark peak memory of streaming a large upload to disk."""
+        with tempfile.TemporaryFile() as source:
+            noise = Image.effect_noise((3000, 2000), 64).convert('RGB')
+            noise.save(source, 'JPEG', quality=95)
+            size = source.tell()
+            source.seek(0)
+            del noise
+
+            handler = RecipeImageUploadHandler()
+            handler.new_file('image', 'photo.jpg', 'image/jpeg', size)
+            tracemalloc.start()
+            start = 0
+            while chunk := source.read(handler.chunk_size):
+                handler.receive_data_chunk(chunk, start)
+                start += len(chunk)
+            uploaded = handler.file_complete(size)
+            _current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            uploaded.close()
+
+        # A few chunks and the header, however large the upload is.
+        self.assertGreater(size, 2 * 2 ** 20)
+        self.assertLess(peak, 1 * 2 ** 20)
+
+
+class RecipeImageUploadApiTests(TestCase):
+    """Test uploads through the recipe image endpoint."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@test.com',
+            'nakki'
+        )
+        self.client.force_authenticate(self.user)
+        self.recipe = Recipe.objects.create(
+            user=self.user, title='Sample recipe', time_minutes=10, price=5
+        )
+        self.url = reverse('recipe:recipe-upload-image', args=[self.recipe.id])
+
+    @override_settings(IMAGE_UPLOAD_MAX_PIXELS=100 * 100)
+    def test_oversize_image_rejected(self):
+        """Test the endpoint reports images with too many pixels."""
+        upload = io.BytesIO(png_header(5000, 5000) + b'\x00' * 100)
+        upload.name = 'bomb.png'
+
+        res = self.client.post(self.url, {'image': upload}, format='multipart')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('5000x5000', res.data['image'][0])
+        self.recipe.refresh_from_db()
+        self.assertFalse(self.recipe.image)
+
+    def test_corrupt_image_rejected_when_complete(self):
+        """Test a file found corrupt once complete is reported."""
+        # The header is valid, the chunk after it is cut short.
+        upload = io.BytesIO(png_header(10, 10) +
+                            struct.pack('>I4s', 1000, b'IDAT') + b'\x00' * 10)
+        upload.name = 'photo.png'
+
+        res = self.client.post(
+            self.url, {'image': upload, 'title': 'Ignored'},
+            format='multipart'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data['image'][0], INVALID_IMAGE)
+        self.recipe.refresh_from_db()
+        self.assertFalse(self.recipe.image)
@@ -0,0 +1,192 @@
+import io
+import shutil
+import struct
+
+from PIL import Image, ImageOps
+
+from django.conf import settings
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.core.files.uploadhandler import StopUpload, \
+    TemporaryFileUploadHandler
+
+COPY_CHUNK_SIZE = 64 * 2 ** 10
+
+EXIF_ORIENTATION = 0x0112
+# APP1 segments carrying EXIF or XMP metadata.
+JPEG_METADATA_PREFIXES = (b'Exif\x00\x00', b'http://ns.adobe.com/xap/1.0/\x00')
+# Markers without a length field.
+JPEG_STANDALONE_MARKERS = {0x01, 0xD8} | set(range(0xD0, 0xD8))
+JPEG_SOS = 0xDA
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+PNG_METADATA_CHUNKS = {b'eXIf', b'tEXt', b'zTXt', b'iTXt', b'tIME'}
+
+INVALID_IMAGE = ('Upload a valid image. The file you uploaded was either '
+                 'not an image or a corrupted image.')
+
+
+def _copy(src, dst, length=None):
+    """Copy length bytes, or the rest, of src to dst a chunk at a time."""
+    if length is None:
+        shutil.copyfileobj(src, dst, COPY_CHUNK_SIZE)
+        return
+    while length > 0:
+        chunk = src.read(min(length, COPY_CHUNK_SIZE))
+        if not chunk:
+            raise ValueError('Unexpected end of file.')
+        dst.write(chunk)
+        length -= len(chunk)
+
+
+def strip_jpeg_metadata(src, dst):
+    """Copy a JPEG without its EXIF and XMP segments, not re-encoding it."""
+    if src.read(2) != b'\xff\xd8':
+        raise ValueError('Not a JPEG file.')
+    dst.write(b'\xff\xd8')
+
+    while True:
+        marker = src.read(2)
+        while marker[1:] == b'\xff':  # Fill bytes before a marker.
+            marker = marker[1:] + src.read(1)
+        if len(marker) < 2 or marker[0] != 0xFF:
+            raise ValueError('Corrupt JPEG marker.')
+        if marker[1] in JPEG_STANDALONE_MARKERS:
+            dst.write(marker)
+            continue
+        if marker[1] == JPEG_SOS:
+            dst.write(marker)
+            _copy(src, dst)
+            return
+
+        length_bytes = src.read(2)
+        length, = struct.unpack('>H', length_bytes)
+        payload = src.read(length - 2)
+        if marker[1] == 0xE1 and payload.startswith(JPEG_METADATA_PREFIXES):
+            continue
+        dst.write(marker + length_bytes + payload)
+
+
+def strip_png_metadata(src, dst):
+    """Copy a PNG without its textual and EXIF chunks."""
+    if src.read(8) != PNG_SIGNATURE:
+        raise ValueError('Not a PNG file.')
+    dst.write(PNG_SIGNATURE)
+
+    while True:
+        head = src.read(8)
+        if len(head) < 8:
+            return
+        length, chunk_type = struct.unpack('>I4s', head)
+        if chunk_type in PNG_METADATA_CHUNKS:
+            src.seek(length + 4, io.SEEK_CUR)
+            continue
+        dst.write(head)
+        _copy(src, dst, length + 4)
+        if chunk_type == b'IEND':
+            return
+
+
+class RecipeImageUploadHandler(TemporaryFileUploadHandler):
+    """Upload handler streaming images to disk with early rejection.
+
+    The image header is parsed as soon as enough of it has arrived, so
+    uploads that are too large, have too many pixels or aren't images are
+    rejected before the rest is written to disk. The rest of the body is
+    still read, and discarded, so the response can be sent on the same
+    connection. Nothing is decoded while uploading. Once complete, EXIF
+    metadata is stripped by copying the file without it where possible,
+    only re-encoding images that need rotating.
+    """
+    chunk_size = COPY_CHUNK_SIZE
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.error = None
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.header = bytearray()
+        self.image_format = None
+        self.orientation = 1
+
+    def reject(self, message):
+        """Stop the upload, keeping message for the response.
+
+        Django's multipart parser reads the rest of the body without
+        storing or parsing it, and the upload leaves no files.
+        """
+        self.error = message
+        raise StopUpload(connection_reset=False)
+
+    def _orientation(self, image):
+        """Return the EXIF orientation of image without decoding it."""
+        if image.format == 'PNG':
+            # Pillow's PNG getexif() loads the pixels, so parse the chunk.
+            exif = Image.Exif()
+            if 'exif' in image.info:
+                exif.load(image.info['exif'])
+        else:
+            exif = image.getexif()
+
+        return exif.get(EXIF_ORIENTATION, 1)
+
+    def check_header(self, complete=False):
+        """Identify the image from the bytes received so far."""
+        try:
+            with Image.open(io.BytesIO(self.header)) as image:
+                width, height = image.size
+                self.image_format = image.format
+                self.orientation = self._orientation(image)
+        except Image.DecompressionBombError:
+            self.reject('Image is too large.')
+        except Exception:
+            header_limit = settings.IMAGE_UPLOAD_HEADER_BYTES
+            if complete or len(self.header) >= header_limit:
+                self.reject(INVALID_IMAGE)
+            return
+
+        if max(width, height) > settings.IMAGE_UPLOAD_MAX_DIMENSION or \
+                width * height > settings.IMAGE_UPLOAD_MAX_PIXELS:
+            self.reject(f'Image is too large ({width}x{height} pixels).')
+
+    def receive_data_chunk(self, raw_data, start):
+        if start + len(raw_data) > settings.IMAGE_UPLOAD_MAX_BYTES:
+            self.reject(f'File is larger than '
+                        f'{settings.IMAGE_UPLOAD_MAX_BYTES} bytes.')
+        if self.image_format is None:
+            needed = settings.IMAGE_UPLOAD_HEADER_BYTES - len(self.header)
+            self.header += raw_data[:needed]
+            self.check_header()
+        super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        if self.image_format is None:
+            self.check_header(complete=True)
+        self.file.seek(0)
+
+        stripped = TemporaryUploadedFile(
+            self.file_name, self.content_type, 0, self.charset,
+            self.content_type_extra
+        )
+        try:
+            if self.orientation not in (None, 1):
+                # Rotating needs the pixels, so only here is it re-encoded.
+                with Image.open(self.file) as image:
+                    ImageOps.exif_transpose(image).save(
+                        stripped, self.image_format, exif=b''
+                    )
+            elif self.image_format == 'JPEG':
+                strip_jpeg_metadata(self.file, stripped)
+            elif self.image_format == 'PNG':
+                strip_png_metadata(self.file, stripped)
+            else:
+                _copy(self.file, stripped)
+        except (ValueError, struct.error, OSError):
+            stripped.close()
+            self.reject(INVALID_IMAGE)
+        finally:
+            self.file.close()
+
+        self.file = stripped
+        self.file.size = self.file.tell()
+        self.file.seek(0)
+        return self.file
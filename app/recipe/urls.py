@@ -11,5 +11,9 @@ router.register('recipes', views.RecipeViewSet)
 app_name = 'recipe'
 
 urlpatterns = [
-    path('', include(router.urls))
+    path('', include(router.urls)),
+    path('cache-stats/', views.ResponseCacheStatsView.as_view(),
+         name='cache-stats'),
+    path('routing-stats/', views.RoutingStatsView.as_view(),
+         name='routing-stats'),
 ]
@@ -1,19 +1,39 @@
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.http import Http404, StreamingHttpResponse
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework import viewsets, mixins, status
-from rest_framework.authentication import TokenAuthentication
-from rest_framework.permissions import IsAuthenticated
+from rest_framework import viewsets, mixins, serializers as fields, status
+from rest_framework.exceptions import UnsupportedMediaType, \
+    ValidationError
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.views import APIView
 
 from core.models import Tag, Ingredient, Recipe
-from recipe import serializers
+from core.routers import routing_stats
+from user.authentication import CachedTokenAuthentication
+from recipe import bulk, conditional, exports, images, imports, \
+    serializers
+from recipe.cache import response_cache
+from recipe.filters import MATCH_ANY, MATCH_MODES, filter_related
+from recipe.pagination import RecipeAttrPagination, RecipePagination, \
+    RecipeSearchPagination
+from recipe.readers import RecipeReader, readable_fields
+from recipe.search import search_recipes
+from recipe.signals import TAGS, INGREDIENTS
+from recipe.uploads import RecipeImageUploadHandler
 
 
 class BaseRecipeAttr(viewsets.GenericViewSet,
                      mixins.ListModelMixin,
                      mixins.CreateModelMixin):
     """Base viewset for user owned recipe attributes."""
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
+    pagination_class = RecipeAttrPagination
 
     def get_queryset(self):
         """Return objects only for the current authenticated user."""
@@ -27,35 +47,200 @@ class BaseRecipeAttr(viewsets.GenericViewSet,
 
         return queryset.filter(
             user=self.request.user
-        ).order_by('-name').distinct()
+        ).order_by('-name', '-id').distinct()
+
+    def list(self, request, *args, **kwargs):
+        """List objects, reusing responses until the collection changes."""
+        view_name = type(self).__name__
+        key = response_cache.key(request, view_name, self.collection)
+        data = response_cache.get(key, view_name)
+        if data is not None:
+            return Response(data)
+
+        # Tags and ingredients are represented by their columns as is.
+        page = self.paginate_queryset(
+            self.filter_queryset(self.get_queryset()).values(
+                *self.get_serializer_class().Meta.fields
+            )
+        )
+        response = self.get_paginated_response(page)
+        response_cache.set(key, response.data)
+        return response
 
     def perform_create(self, serializer):
-        """Create a new tag."""
-        serializer.save(user=self.request.user)
+        """Create a new tag.
+
+        A name created by a concurrent request after it was validated
+        breaks the unique (user, name) constraint, reported the same as a
+        name found by validation.
+        """
+        try:
+            with transaction.atomic():
+                serializer.save(user=self.request.user)
+        except IntegrityError:
+            raise ValidationError(
+                {'name': [serializer.duplicate_name_message()]}
+            )
 
 
 class TagViewSet(BaseRecipeAttr):
     """Manage tags in the database."""
     queryset = Tag.objects.all()
     serializer_class = serializers.TagSerializer
+    collection = TAGS
 
 
 class IngredientViewSet(BaseRecipeAttr):
     """Manage ingredients in the database."""
     queryset = Ingredient.objects.all()
     serializer_class = serializers.IngredientSerializer
+    collection = INGREDIENTS
+
 
+class ResponseCacheStatsView(APIView):
+    """Report response cache hits and misses of this worker process."""
+    authentication_classes = (CachedTokenAuthentication,)
+    permission_classes = (IsAdminUser,)
 
+    def get(self, request):
+        """Return hit and miss counts by view."""
+        return Response(response_cache.stats())
+
+
+class RoutingStatsView(APIView):
+    """Report database routing decisions of this worker process."""
+    authentication_classes = (CachedTokenAuthentication,)
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request):
+        """Return request, read, write and pin counts."""
+        return Response(routing_stats.stats())
+
+
+@method_decorator(condition(
+    etag_func=conditional.recipe_list_etag,
+    last_modified_func=conditional.recipe_list_last_modified,
+), name='list')
+@method_decorator(condition(
+    etag_func=conditional.recipe_detail_etag,
+    last_modified_func=conditional.recipe_detail_last_modified,
+), name='retrieve')
 class RecipeViewSet(viewsets.ModelViewSet):
     """Manage recipes in the database."""
-    queryset = Recipe.objects.all()
+    queryset = Recipe.objects.defer('search_vector')
     serializer_class = serializers.RecipeSerializer
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
+    pagination_class = RecipePagination
+    # Actions taking fields and exclude parameters.
+    sparse_actions = ('list', 'retrieve')
+    bulk_max_items = 1000
+    # Export formats by the export_format parameter.
+    export_formats = {
+        'ndjson': (exports.export_ndjson, 'application/x-ndjson'),
+        'csv': (exports.export_csv, 'text/csv; charset=utf-8'),
+    }
+    # Readers of imported recipes by media type.
+    import_readers = {
+        'application/x-ndjson': imports.read_ndjson,
+        'text/csv': imports.read_csv,
+    }
+    # Orderings by the ordering parameter, each served by an index on
+    # (user, field, id) scanned in one direction.
+    orderings = {
+        'id': ('id',),
+        '-id': ('-id',),
+        'time_minutes': ('time_minutes', 'id'),
+        '-time_minutes': ('-time_minutes', '-id'),
+        'price': ('price', 'id'),
+        '-price': ('-price', '-id'),
+    }
+    range_filters = (
+        ('max_time', 'time_minutes__lte', fields.IntegerField(min_value=0)),
+        ('min_price', 'price__gte', fields.DecimalField(
+            max_digits=5, decimal_places=2)),
+        ('max_price', 'price__lte', fields.DecimalField(
+            max_digits=5, decimal_places=2)),
+    )
+
+    def _params_to_ints(self, param):
+        """Return the comma separated IDs in param as integers."""
+        try:
+            return [int(str_id)
+                    for str_id in self.request.query_params[param].split(',')]
+        except ValueError:
+            raise ValidationError(
+                {param: 'Must be a comma separated list of IDs.'}
+            )
 
-    def _params_to_ints(self, qs):
-        """Convert a list of string IDs to a list of integers."""
-        return [int(str_id) for str_id in qs.split(',')]
+    def _params_to_mode(self, param):
+        """Return the any/all match mode requested in param."""
+        mode = self.request.query_params.get(param, MATCH_ANY)
+        if mode not in MATCH_MODES:
+            raise ValidationError(
+                {param: f'Must be one of: {", ".join(MATCH_MODES)}.'}
+            )
+
+        return mode
+
+    def _param_to_value(self, param, field):
+        """Return param validated by a serializer field, or None if unset."""
+        value = self.request.query_params.get(param)
+        if value is None:
+            return None
+        try:
+            return field.run_validation(value)
+        except ValidationError as error:
+            raise ValidationError({param: error.detail})
+
+    def get_ordering(self):
+        """Return the fields recipes are ordered by."""
+        ordering = self.request.query_params.get('ordering')
+        if ordering is None:
+            return None
+        if ordering not in self.orderings:
+            raise ValidationError(
+                {'ordering': f'Must be one of: {", ".join(self.orderings)}.'}
+            )
+
+        return self.orderings[ordering]
+
+    def _params_to_names(self, param):
+        """Return the comma separated names in param."""
+        value = self.request.query_params.get(param, '')
+        return [name.strip() for name in value.split(',') if name.strip()]
+
+    def get_fieldset(self):
+        """Return the names of the fields to represent, None for all.
+
+        They are taken from the fields and exclude parameters.
+        """
+        if self.action not in self.sparse_actions:
+            return None
+        if not hasattr(self, '_fieldset'):
+            self._fieldset = None
+            fields, exclude = map(self._params_to_names, ('fields', 'exclude'))
+            if fields or exclude:
+                readable = readable_fields(self.get_serializer_class())
+                unknown = set(fields + exclude) - set(readable)
+                if unknown:
+                    raise ValidationError({'fields': (
+                        f'Unknown fields: {", ".join(sorted(unknown))}. '
+                        f'Must be some of: {", ".join(readable)}.'
+                    )})
+                self._fieldset = [
+                    name for name in readable
+                    if (not fields or name in fields) and name not in exclude
+                ]
+
+        return self._fieldset
+
+    def get_serializer_context(self):
+        """Pass the fields to represent on to the serializer."""
+        context = super().get_serializer_context()
+        context['fields'] = self.get_fieldset()
+
+        return context
 
     def get_queryset(self):
         """Retrieve the recipes for the authenticated user."""
@@ -63,13 +248,54 @@ class RecipeViewSet(viewsets.ModelViewSet):
         ingredients = self.request.query_params.get('ingredients')
         queryset = self.queryset
         if tags:
-            tag_ids = self._params_to_ints(tags)
-            queryset = queryset.filter(tags__id__in=tag_ids)
+            tag_ids = self._params_to_ints('tags')
+            queryset = filter_related(
+                queryset, 'tags', tag_ids, self._params_to_mode('tags_mode')
+            )
         if ingredients:
-            ingredient_ids = self._params_to_ints(ingredients)
-            queryset = queryset.filter(ingredients__id__in=ingredient_ids)
+            ingredient_ids = self._params_to_ints('ingredients')
+            queryset = filter_related(
+                queryset, 'ingredients', ingredient_ids,
+                self._params_to_mode('ingredients_mode')
+            )
+
+        for param, lookup, field in self.range_filters:
+            value = self._param_to_value(param, field)
+            if value is not None:
+                queryset = queryset.filter(**{lookup: value})
+
+        queryset = queryset.filter(user=self.request.user).order_by('-id')
+        if self.search_terms:
+            queryset = search_recipes(
+                queryset, self.search_terms
+            ).order_by('-rank', '-id')
+        ordering = self.get_ordering()
+        if ordering:
+            queryset = queryset.order_by(*ordering)
+
+        return queryset
 
-        return queryset.filter(user=self.request.user)
+    @property
+    def search_terms(self):
+        """Return the terms recipes are searched for, if any.
+
+        Only lists are searched, other actions ignore the parameter.
+        """
+        if self.action != 'list':
+            return ''
+
+        return self.request.query_params.get('search', '').strip()
+
+    @property
+    def paginator(self):
+        """Return the paginator, by page number for ranked search results."""
+        if not hasattr(self, '_paginator'):
+            if self.search_terms:
+                self._paginator = RecipeSearchPagination()
+            else:
+                self._paginator = self.pagination_class()
+
+        return self._paginator
 
     def get_serializer_class(self):
         """Return appropriate serializer class."""
@@ -80,6 +306,40 @@ class RecipeViewSet(viewsets.ModelViewSet):
 
         return self.serializer_class
 
+    def get_reader(self):
+        """Return the reader representing recipes for this action."""
+        return RecipeReader(
+            fields=self.get_fieldset(),
+            detail=self.action == 'retrieve',
+            request=self.request,
+        )
+
+    def list(self, request, *args, **kwargs):
+        """List recipes, represented straight from database rows."""
+        reader = self.get_reader()
+        # Cursors are read from the rows, so the ordering columns are too.
+        ordering = [name.lstrip('-') for name in self.get_ordering() or ()]
+        page = self.paginate_queryset(reader.values(
+            self.filter_queryset(self.get_queryset()), ordering
+        ))
+
+        return self.get_paginated_response(reader.represent(page))
+
+    def retrieve(self, request, *args, **kwargs):
+        """Return a recipe, represented straight from its database row."""
+        reader = self.get_reader()
+        try:
+            rows = reader.values(self.filter_queryset(
+                self.get_queryset()
+            ).filter(pk=self.kwargs['pk']))
+            data = reader.represent(rows)
+        except (TypeError, ValueError):
+            data = None
+        if not data:
+            raise Http404('No recipe matches the given query.')
+
+        return Response(data[0])
+
     def perform_create(self, serializer):
         """Create a new recipe."""
         serializer.save(user=self.request.user)
@@ -87,14 +347,23 @@ class RecipeViewSet(viewsets.ModelViewSet):
     @action(methods=['POST'], detail=True, url_path='upload-image')
     def upload_image(self, request, pk=None):
         """Upload an image to a recipe."""
+        upload_handler = RecipeImageUploadHandler(request._request)
+        request._request.upload_handlers = [upload_handler]
         recipe = self.get_object()
         serializer = self.get_serializer(
             recipe,
             data=request.data
         )
+        if upload_handler.error:
+            return Response(
+                {'image': [upload_handler.error]},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
         if serializer.is_valid():
-            serializer.save()
+            stale = recipe.image_derivatives
+            serializer.save(image_derivatives={})
+            images.schedule_derivatives(recipe, stale)
             return Response(
                 serializer.data,
                 status=status.HTTP_200_OK
@@ -104,3 +373,97 @@ class RecipeViewSet(viewsets.ModelViewSet):
             serializer.errors,
             status=status.HTTP_400_BAD_REQUEST
         )
+
+    @action(methods=['POST', 'PATCH', 'DELETE'], detail=False)
+    def bulk(self, request):
+        """Create, update or delete many recipes in one request.
+
+        POST and PATCH take a list of recipes, DELETE a list of recipe IDs.
+        Each item gets its own result, valid items are written even when
+        others fail.
+        """
+        items = request.data
+        if not isinstance(items, list):
+            return Response(
+                {'non_field_errors': ['Expected a list of items.']},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(items) > self.bulk_max_items:
+            return Response(
+                {'non_field_errors': [
+                    f'At most {self.bulk_max_items} items are allowed.'
+                ]},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if request.method == 'POST':
+            results = bulk.bulk_create(request.user, items)
+            success = status.HTTP_201_CREATED
+        elif request.method == 'PATCH':
+            results = bulk.bulk_update(request.user, items)
+            success = status.HTTP_200_OK
+        else:
+            results = bulk.bulk_delete(request.user, items)
+            success = status.HTTP_200_OK
+
+        failed = any('errors' in result for result in results)
+        return Response(
+            {'results': results},
+            status=status.HTTP_207_MULTI_STATUS if failed else success
+        )
+
+    @action(methods=['GET'], detail=False)
+    def export(self, request):
+        """Stream all of the user's recipes as NDJSON or CSV.
+
+        NDJSON includes the user's tags and ingredients too. Rows are read
+        and written a chunk at a time, so exporting any number of recipes
+        takes the same memory.
+        """
+        export_format = request.query_params.get('export_format', 'ndjson')
+        if export_format not in self.export_formats:
+            raise ValidationError({'export_format': (
+                f'Must be one of: {", ".join(self.export_formats)}.'
+            )})
+        export, content_type = self.export_formats[export_format]
+
+        response = StreamingHttpResponse(
+            export(request.user), content_type=content_type
+        )
+        response['Content-Disposition'] = \
+            f'attachment; filename="recipes.{export_format}"'
+        return response
+
+    @action(methods=['POST'], detail=False, url_path='import',
+            url_name='import')
+    def import_recipes(self, request):
+        """Import recipes from an NDJSON or CSV request body.
+
+        The body is read straight from the request stream a batch at a
+        time, instead of being parsed whole. It's imported within the
+        request, so bodies over RECIPE_IMPORT_MAX_BYTES are refused with
+        413 rather than risk the server timing the request out; the
+        import_recipes management command imports larger files.
+        """
+        media_type = request.content_type.split(';')[0].strip().lower()
+        if media_type not in self.import_readers:
+            raise UnsupportedMediaType(media_type)
+        try:
+            length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            length = 0
+        if length > settings.RECIPE_IMPORT_MAX_BYTES:
+            return Response(
+                {'detail': (
+                    f'Imports are limited to '
+                    f'{settings.RECIPE_IMPORT_MAX_BYTES} bytes. Import '
+                    f'larger files with the import_recipes management '
+                    f'command.'
+                )},
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+            )
+
+        summary = imports.import_recipes(
+            request.user, self.import_readers[media_type](request.stream or ())
+        )
+        return Response(summary, status=status.HTTP_200_OK)
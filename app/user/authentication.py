@@ -0,0 +1,188 @@
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from core.routers import read_alias, reads_from
+
+
+class LRUCache:
+    """Thread safe least recently used cache with a time to live."""
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return the cached value for key, or None if missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+
+            return value
+
+    def set(self, key, value):
+        """Cache value for key, evicting the least recently used entry."""
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        """Remove key from the cache."""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def delete_where(self, predicate):
+        """Remove every entry whose value matches predicate."""
+        with self._lock:
+            for key, (value, _expires) in list(self._entries.items()):
+                if predicate(value):
+                    del self._entries[key]
+
+    def clear(self):
+        """Remove every entry."""
+        with self._lock:
+            self._entries.clear()
+
+
+class TokenCache:
+    """Cache of token keys to their (user, token) pair.
+
+    Given a shared Django cache alias, tokens are cached there alone, so a
+    token deleted or a user changed in one worker is dropped for all of
+    them at once. Otherwise tokens are cached in an in-process LRU, which
+    only the process making the change can invalidate; it is meant for a
+    single process, others keep accepting the token for up to the TTL.
+    """
+
+    def __init__(self, max_size, ttl, shared_alias=None):
+        self.local = LRUCache(max_size, ttl)
+        self.ttl = ttl
+        self.shared_alias = shared_alias
+
+    @property
+    def shared(self):
+        """Return the shared cache, or None if it isn't configured."""
+        if self.shared_alias is None:
+            return None
+
+        return caches[self.shared_alias]
+
+    def _shared_key(self, key):
+        """Return the shared cache key for a token, without the token."""
+        return 'auth-token:' + hashlib.sha256(key.encode()).hexdigest()
+
+    def get(self, key):
+        """Return the cached (user, token) pair for key, or None."""
+        if self.shared is not None:
+            return self.shared.get(self._shared_key(key))
+
+        return self.local.get(key)
+
+    def set(self, key, credentials):
+        """Cache the (user, token) pair for key."""
+        if self.shared is not None:
+            self.shared.set(self._shared_key(key), credentials, self.ttl)
+        else:
+            self.local.set(key, credentials)
+
+    def delete(self, key):
+        """Remove key from the cache."""
+        if self.shared is not None:
+            self.shared.delete(self._shared_key(key))
+        else:
+            self.local.delete(key)
+
+    def delete_user(self, user_id):
+        """Remove every cached token belonging to a user."""
+        if self.shared is not None:
+            keys = Token.objects.filter(user_id=user_id).values_list(
+                'key', flat=True
+            )
+            self.shared.delete_many([self._shared_key(key) for key in keys])
+        else:
+            self.local.delete_where(lambda credentials: (
+                credentials[0].pk == user_id
+            ))
+
+    def clear(self):
+        """Empty the in-process LRU."""
+        self.local.clear()
+
+
+token_cache = TokenCache(
+    max_size=getattr(settings, 'TOKEN_AUTH_CACHE_SIZE', 10000),
+    ttl=getattr(settings, 'TOKEN_AUTH_CACHE_TTL', 5),
+    shared_alias=getattr(settings, 'TOKEN_AUTH_SHARED_CACHE', None),
+)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Token authentication that caches token to user lookups.
+
+    Signing up and getting a token don't pin the anonymous client to the
+    primary, see core/routers.py, so a new token may not have reached the
+    replica its first requests read from. Tokens a replica doesn't accept
+    are looked up again on the primary.
+    """
+    cache = token_cache
+
+    def lookup_credentials(self, key):
+        """Return the (user, token) pair of key read from the database."""
+        try:
+            return super().authenticate_credentials(key)
+        except exceptions.AuthenticationFailed:
+            if read_alias() == DEFAULT_DB_ALIAS:
+                raise
+        with reads_from(DEFAULT_DB_ALIAS):
+            return super().authenticate_credentials(key)
+
+    def authenticate_credentials(self, key):
+        credentials = self.cache.get(key)
+        if credentials is None:
+            credentials = self.lookup_credentials(key)
+            self.cache.set(key, credentials)
+
+        user, token = credentials
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed(
+                _('User inactive or deleted.')
+            )
+
+        # Views may modify request.user, so don't hand out the cached one.
+        return copy.copy(user), token
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    """Stop accepting a token as soon as it is deleted."""
+    token_cache.delete(instance.key)
+
+
+@receiver(post_save, sender=get_user_model())
+def invalidate_user_tokens(sender, instance, **kwargs):
+    """Drop cached users when they change, e.g. being deactivated."""
+    token_cache.delete_user(instance.pk)
@@ -0,0 +1,156 @@
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from user.authentication import LRUCache, TokenCache, token_cache
+
+ME_URL = reverse('user:me')
+TAG_URL = reverse('recipe:tag-list')
+
+
+class LRUCacheTests(TestCase):
+    """Test the in-process LRU cache."""
+
+    def test_evicts_least_recently_used(self):
+        """Test the oldest untouched entry is evicted when full."""
+        lru = LRUCache(max_size=2, ttl=60)
+        lru.set('a', 1)
+        lru.set('b', 2)
+        lru.get('a')
+        lru.set('c', 3)
+
+        self.assertEqual(lru.get('a'), 1)
+        self.assertIsNone(lru.get('b'))
+        self.assertEqual(lru.get('c'), 3)
+
+    def test_entries_expire(self):
+        """Test entries are dropped once their TTL has passed."""
+        lru = LRUCache(max_size=2, ttl=60)
+        with patch('time.monotonic', return_value=100):
+            lru.set('a', 1)
+        with patch('time.monotonic', return_value=161):
+            self.assertIsNone(lru.get('a'))
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    """Test authenticating with cached tokens."""
+
+    def setUp(self):
+        token_cache.clear()
+        self.user = get_user_model().objects.create_user(
+            'test@test.com',
+            'nakki',
+            name='Test'
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def tearDown(self):
+        token_cache.clear()
+
+    def test_cached_token_skips_auth_query(self):
+        """Test a warm token authenticates without touching the database."""
+        self.client.get(TAG_URL)
+
+        # Only the tag list query is left.
+        with self.assertNumQueries(1):
+            res = self.client.get(TAG_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_invalid_token_rejected(self):
+        """Test an unknown token is still rejected."""
+        self.client.credentials(HTTP_AUTHORIZATION='Token nope')
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deleted_token_rejected(self):
+        """Test a cached token stops working once deleted."""
+        self.client.get(ME_URL)
+        self.token.delete()
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_rejected(self):
+        """Test a cached token stops working when its user is deactivated."""
+        self.client.get(ME_URL)
+        self.user.is_active = False
+        self.user.save()
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_updated_user_not_stale(self):
+        """Test changes to the user are visible through a cached token."""
+        self.client.get(ME_URL)
+        self.client.patch(ME_URL, {'name': 'Changed'})
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.data['name'], 'Changed')
+
+
+class SharedTokenCacheTests(TestCase):
+    """Test the shared cache, as used by two workers."""
+
+    def setUp(self):
+        self.cache = TokenCache(max_size=10, ttl=60, shared_alias='default')
+        self.other = TokenCache(max_size=10, ttl=60, shared_alias='default')
+        self.user = get_user_model().objects.create_user(
+            'test@test.com',
+            'nakki'
+        )
+        self.token = Token.objects.create(user=self.user)
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_token_cached_by_other_worker_found(self):
+        """Test a token cached by another worker is found."""
+        self.other.set(self.token.key, (self.user, self.token))
+
+        user, token = self.cache.get(self.token.key)
+
+        self.assertEqual(user, self.user)
+
+    def test_local_tier_skipped(self):
+        """Test tokens aren't kept in process, out of other workers' reach."""
+        self.cache.set(self.token.key, (self.user, self.token))
+        self.cache.get(self.token.key)
+
+        self.assertIsNone(self.cache.local.get(self.token.key))
+
+    def test_shared_key_hides_token(self):
+        """Test the token itself isn't used as the shared cache key."""
+        self.cache.set(self.token.key, (self.user, self.token))
+
+        self.assertIsNone(cache.get(self.token.key))
+
+    def test_deleted_by_other_worker(self):
+        """Test a token deleted by another worker is dropped at once."""
+        self.cache.set(self.token.key, (self.user, self.token))
+
+        self.other.delete(self.token.key)
+
+        self.assertIsNone(self.cache.get(self.token.key))
+
+    def test_user_changed_by_other_worker(self):
+        """Test a user changed by another worker is dropped at once."""
+        self.cache.set(self.token.key, (self.user, self.token))
+
+        self.other.delete_user(self.user.pk)
+
+        self.assertIsNone(self.cache.get(self.token.key))